@@ -0,0 +1,357 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import metrics
+from watchdog.events import FileSystemEventHandler
+from database_handler import DatabaseHandler
+from storage_backends import build_insert_query
+from tail_reader import detect_compression
+from pipeline import Block
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BufferKey = Tuple[str, Tuple[str, ...]]
+
+class AsyncDatabasePool:
+    """异步写库接口"""
+
+    async def insert_rows(self, table: str, columns: Tuple[str, ...], rows: List[Tuple[Any, ...]]) -> int:
+        raise NotImplementedError
+
+    async def maintain(self) -> None:
+        """主循环每秒调用一次的维护任务"""
+        pass
+
+    async def close(self) -> None:
+        pass
+
+class ExecutorDatabasePool(AsyncDatabasePool):
+    """没有异步驱动时, 把同步 DatabaseHandler 放到与连接池等大的线程池中执行"""
+
+    def __init__(self, db_config: Dict[str, Any]):
+        self.db_handler = DatabaseHandler(db_config)
+        self._executor = ThreadPoolExecutor(
+            max_workers=db_config.get("pool", {}).get("max_size", db_config.get("pool_size", 5)),
+            thread_name_prefix="db-writer"
+        )
+
+    async def insert_rows(self, table, columns, rows) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.db_handler.write_batch, table, columns, rows)
+
+    async def maintain(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.db_handler.spill is not None and self.db_handler.spill.pending():
+            await loop.run_in_executor(self._executor, self.db_handler.replay_spill)
+        await loop.run_in_executor(self._executor, self.db_handler.prune_connections)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.db_handler.close()
+
+class AiomysqlPool(AsyncDatabasePool):
+    def __init__(self, db_config: Dict[str, Any]):
+        self.db_config = db_config
+        self.pool = None
+
+    async def connect(self) -> None:
+        pool_config = self.db_config.get('pool', {})
+        self.pool = await aiomysql.create_pool(
+            host=self.db_config['host'],
+            port=self.db_config['port'],
+            user=self.db_config['user'],
+            password=self.db_config['password'],
+            db=self.db_config['database'],
+            minsize=pool_config.get('min_size', 1),
+            maxsize=pool_config.get('max_size', self.db_config.get('pool_size', 5)),
+            pool_recycle=int(pool_config.get('max_lifetime', 3600))
+        )
+
+    async def insert_rows(self, table, columns, rows) -> int:
+        if not rows:
+            return 0
+        retry = self.db_config.get('retry')
+        attempts = retry['max_attempts'] if retry else 1
+        delay = retry['delay'] if retry else 0
+        for attempt in range(1, attempts + 1):
+            try:
+                return await self._insert(table, columns, rows)
+            except (aiomysql.OperationalError, aiomysql.InterfaceError, ConnectionError, TimeoutError):
+                if attempt >= attempts:
+                    raise
+                logger.warning(f"Database write failed (attempt {attempt}/{attempts}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                delay *= retry['backoff']
+
+    async def _insert(self, table, columns, rows) -> int:
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            metrics.POOL_WAIT.observe(time.perf_counter() - started)
+            started = time.perf_counter()
+            async with conn.cursor() as cursor:
+                # aiomysql 同样会把 INSERT 的 executemany 改写为多 VALUES 语句
+                verb = 'INSERT IGNORE' if self.db_config.get('ignore_duplicates', False) else 'INSERT'
+                await cursor.executemany(build_insert_query(table, columns, '%s', verb), rows)
+            await conn.commit()
+        metrics.DB_LATENCY.observe(time.perf_counter() - started)
+        metrics.ROWS_INSERTED.labels(table).inc(len(rows))
+        metrics.BATCH_ROWS.observe(len(rows))
+        return len(rows)
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+async def create_async_pool(db_config: Dict[str, Any], driver: str = "auto") -> AsyncDatabasePool:
+    if driver == "aiomysql" or (driver == "auto" and aiomysql is not None):
+        if aiomysql is None:
+            raise RuntimeError("async.driver is aiomysql but aiomysql is not installed")
+        pool = AiomysqlPool(db_config)
+        await pool.connect()
+        return pool
+    return ExecutorDatabasePool(db_config)
+
+class AsyncEventBridge(FileSystemEventHandler):
+    """把观察者线程里的文件事件转交给事件循环"""
+
+    def __init__(self, engine: "AsyncIngestEngine", loop: asyncio.AbstractEventLoop):
+        self.engine = engine
+        self.loop = loop
+
+    def on_created(self, event):
+        if not event.is_directory:
+            metrics.EVENTS.labels("created").inc()
+            self.loop.call_soon_threadsafe(self.engine.created, event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            metrics.EVENTS.labels("modified").inc()
+            self.loop.call_soon_threadsafe(self.engine.notify, event.src_path)
+
+    def on_deleted(self, event):
+        metrics.EVENTS.labels("deleted").inc()
+        handler = self.engine.handler
+        forget = handler.forget_directory if event.is_directory else handler.forget
+        self.loop.call_soon_threadsafe(forget, event.src_path)
+
+    def on_moved(self, event):
+        metrics.EVENTS.labels("moved").inc()
+        if event.is_directory:
+            self.loop.call_soon_threadsafe(self.engine.handler.forget_directory, event.src_path)
+        else:
+            self.loop.call_soon_threadsafe(self.engine.moved, event.src_path, event.dest_path)
+
+class AsyncIngestEngine:
+    """基于 asyncio 的采集引擎
+
+    同一路径的多次事件在排队期间合并为一次; 文件读取与解析在小线程池中按有限字节区间进行,
+    写库按 (表, 列) 缓冲成批, 在途的写库批次数量受 max_inflight 限制。
+    不同批次可能并发提交, 因此不保证同一张表内的插入顺序。
+    检查点由 handler.offsets 在批次写完后推进, 读出但未写入的区间不会被记为已读。
+    """
+
+    def __init__(self, handler, pool: AsyncDatabasePool, batch_size: int = 1000,
+                 flush_interval: float = 1.0, max_inflight: int = 16, workers: int = 8,
+                 io_workers: int = 4, read_bytes: int = 4194304, sizer=None):
+        self.handler = handler
+        self.pool = pool
+        self.batch_size = batch_size
+        # 可选的 BatchSizer, 按提交耗时调整每张表的批量
+        self.sizer = sizer
+        self.flush_interval = flush_interval
+        self.read_bytes = read_bytes
+        self.workers = workers
+        self._io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="async-io")
+        self._queue: Optional[asyncio.Queue] = None
+        self._scheduled = set()
+        # 路径 -> [锁, 使用中的协程数], 无人使用时移除
+        self._path_locks: Dict[str, List[Any]] = {}
+        self._buffers: Dict[BufferKey, List[Tuple[Any, ...]]] = {}
+        # 与缓冲对应的偏移标记, 批次写完后交给 handler.offsets
+        self._blocks: Dict[BufferKey, List[Block]] = {}
+        self._first_added: Dict[BufferKey, float] = {}
+        self._inflight = asyncio.Semaphore(max_inflight)
+        self._write_tasks = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def event_bridge(self, loop: asyncio.AbstractEventLoop) -> AsyncEventBridge:
+        return AsyncEventBridge(self, loop)
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._flusher()))
+
+    def notify(self, file_path: str) -> None:
+        if file_path in self._scheduled:
+            return
+        self._scheduled.add(file_path)
+        self._queue.put_nowait(file_path)
+
+    def created(self, file_path: str) -> None:
+        self.handler.note_created(file_path)
+        self.notify(file_path)
+
+    def moved(self, src_path: str, dest_path: str) -> None:
+        if self.handler.forget_moved(src_path, dest_path):
+            self.notify(dest_path)
+
+    def resume(self) -> None:
+        self.handler.checkpoints.prune_missing()
+        for file_path in self.handler.checkpoints.paths():
+            self.notify(file_path)
+
+    async def drain(self) -> None:
+        """等待已排队的文件处理完, 并写出所有缓冲"""
+        await self._queue.join()
+        await self.add_rollups(force=True)
+        await self.settle()
+
+    async def settle(self) -> None:
+        """写出所有缓冲并等待在途批次完成, 保存检查点前调用"""
+        await self.flush()
+        if self._write_tasks:
+            await asyncio.gather(*self._write_tasks)
+
+    async def close(self) -> None:
+        await self.drain()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._io.shutdown(wait=True)
+        self.handler.checkpoints.flush()
+        await self.pool.close()
+
+    async def flush(self, max_age: Optional[float] = None) -> None:
+        now = time.monotonic()
+        keys = [key for key, first in self._first_added.items()
+                if max_age is None or now - first >= max_age]
+        for key in keys:
+            await self._submit(key)
+
+    async def add_rollups(self, force: bool = False) -> None:
+        for table, columns, rows in self.handler.drain_rollups(force):
+            await self._add(table, columns, rows)
+
+    async def handle_path(self, file_path: str) -> None:
+        configs = self.handler.match_parsers(file_path)
+        if not configs:
+            return
+
+        entry = self._path_locks.get(file_path)
+        if entry is None:
+            entry = self._path_locks[file_path] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._read_path(file_path, configs)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._path_locks[file_path]
+
+    async def _read_path(self, file_path: str, configs) -> None:
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(self._io, self.handler.claim, file_path):
+            return
+        stat_result, start = await loop.run_in_executor(self._io, self._start_offset, file_path)
+        # 解压流每次都要从头定位, 压缩归档一次读完, 不按字节区间分段
+        step = None if await loop.run_in_executor(self._io, detect_compression, file_path) else self.read_bytes
+        offsets = self.handler.offsets
+        while True:
+            batches, position = await loop.run_in_executor(
+                self._io, self._read_range, file_path, configs, start,
+                start + step if step is not None else None
+            )
+            if position == start:
+                break
+            self.handler.mark_read(file_path, stat_result, position)
+            block = offsets.mark(file_path, position, len(batches))
+            for config, rows in batches:
+                await self._add(config["table"], config["columns"], rows, block)
+            if step is None:
+                break
+            start = position
+
+    def _start_offset(self, file_path: str):
+        start = self.handler.checkpoints.resolve(file_path)
+        stat_result = os.stat(file_path)
+        return stat_result, self.handler.unread_offset(file_path, stat_result, start)
+
+    def _read_range(self, file_path: str, configs, start: int, end: Optional[int]):
+        batches = []
+        position = start
+        for config, rows, position in self.handler.iter_batches(file_path, configs, start, end):
+            if rows:
+                batches.append((config, rows))
+        return batches, position
+
+    async def _add(self, table: str, columns: Tuple[str, ...], rows: List[Tuple[Any, ...]],
+                   block: Optional[Block] = None) -> None:
+        key = (table, columns)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = []
+            self._blocks[key] = []
+            self._first_added[key] = time.monotonic()
+        buffer.extend(rows)
+        if block is not None:
+            self._blocks[key].append(block)
+        if len(buffer) >= (self.sizer.size(table) if self.sizer is not None else self.batch_size):
+            await self._submit(key)
+
+    async def _submit(self, key: BufferKey) -> None:
+        rows = self._buffers.pop(key, None)
+        blocks = self._blocks.pop(key, [])
+        self._first_added.pop(key, None)
+        if not rows:
+            self.handler.offsets.settle(blocks)
+            return
+        # 在途批次达到上限时在这里等待, 背压传回读取协程
+        await self._inflight.acquire()
+        task = asyncio.create_task(self._write(key, rows, blocks))
+        self._write_tasks.add(task)
+        task.add_done_callback(self._write_tasks.discard)
+
+    async def _write(self, key: BufferKey, rows: List[Tuple[Any, ...]], blocks: List[Block]) -> None:
+        table, columns = key
+        try:
+            started = time.perf_counter()
+            written = await self.pool.insert_rows(table, columns, rows)
+            if self.sizer is not None and written:
+                self.sizer.observe(table, written, time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} rows into {table}: {str(e)}")
+            # 写入失败的区间不推进检查点, 重新启动后从失败处重读
+            self.handler.offsets.settle(blocks, failed=True)
+        else:
+            self.handler.offsets.settle(blocks)
+        finally:
+            self._inflight.release()
+
+    async def _worker(self) -> None:
+        while True:
+            file_path = await self._queue.get()
+            self._scheduled.discard(file_path)
+            try:
+                await self.handle_path(file_path)
+            except Exception as e:
+                logger.error(f"Error processing file {file_path}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _flusher(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.flush_interval, 1.0) / 2)
+            await self.add_rollups()
+            await self.flush(max_age=self.flush_interval)
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+from tail_reader import TailReader
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BufferKey = Tuple[str, Tuple[str, ...]]
+
+class Backfill:
+    """补录 watch_directory 中已存在的文件
+
+    按修改时间从旧到新、以有限并发逐个文件读取, 大批量直接交给 db_handler.write_batch,
+    每批写入后推进检查点。补录期间文件被占用, 同一文件的实时事件延后到补录结束再从检查点读取,
+    因此切换到实时跟踪时既不会漏读也不会重复。
+    """
+
+    def __init__(self, handler, workers: int = 4, batch_size: int = 20000, read_size: int = 1048576):
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        # 独立的读取器, 不占用实时跟踪的句柄缓存
+        self.reader = TailReader(
+            chunk_size=read_size,
+            max_line_bytes=handler.tail_reader.max_line_bytes,
+            encoding=handler.tail_reader.encoding,
+            max_open_files=0
+        )
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self.files = 0
+        self.rows = 0
+        self.bytes = 0
+        self.duration = 0.0
+
+    @classmethod
+    def from_config(cls, handler, config: Dict[str, Any]) -> "Backfill":
+        backfill_config = config.get("backfill", {})
+        return cls(
+            handler,
+            workers=backfill_config.get("workers", 4),
+            batch_size=backfill_config.get("batch_size", 20000),
+            read_size=backfill_config.get("read_size", 1048576)
+        )
+
+    def scan(self) -> List[str]:
+        """列出目录中匹配任一 file_pattern 的文件, 旧文件优先"""
+        root = self.handler.config["watch_directory"]
+        if self.handler.config.get("recursive", False):
+            paths = (os.path.join(directory, name) for directory, _, names in os.walk(root) for name in names)
+        else:
+            paths = (entry.path for entry in os.scandir(root) if entry.is_file())
+        found = []
+        for file_path in paths:
+            if not self.handler.match_parsers(file_path):
+                continue
+            try:
+                found.append((os.path.getmtime(file_path), file_path))
+            except OSError:
+                continue
+        return [file_path for _, file_path in sorted(found)]
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="backfill", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"files": self.files, "rows": self.rows, "bytes": self.bytes, "duration": round(self.duration, 3)}
+
+    def run(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        paths = self.scan()
+        logger.info(f"Backfilling {len(paths)} files with {self.workers} workers")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as executor:
+            for file_path, result in zip(paths, executor.map(self._backfill_file_safe, paths)):
+                if result:
+                    logger.debug(f"Backfilled {result[0]} rows from {file_path}")
+        self.duration = time.monotonic() - started
+        logger.info(f"Backfill finished: {self.stats()}")
+        return self.stats()
+
+    def _backfill_file_safe(self, file_path: str) -> Optional[Tuple[int, int]]:
+        if self._stop_event.is_set():
+            return None
+        try:
+            return self.backfill_file(file_path)
+        except Exception as e:
+            logger.error(f"Error backfilling {file_path}: {str(e)}")
+            return None
+
+    def backfill_file(self, file_path: str) -> Tuple[int, int]:
+        """补录单个文件, 返回 (写入行数, 读取字节数)"""
+        handler = self.handler
+        configs = handler.match_parsers(file_path)
+        handler.lock_path(file_path)
+        try:
+            # 分片模式下跳过分配给其他节点的文件
+            if not handler.claim(file_path):
+                return 0, 0
+            start = handler.checkpoints.resolve(file_path)
+            chunk_end = start
+            buffers: Dict[BufferKey, List[Tuple[Any, ...]]] = {}
+            buffered = written = 0
+            for config, rows, position in handler.iter_batches(file_path, configs, start, reader=self.reader):
+                # 偏移变化说明上一块的所有解析配置都已产出, 只在块边界写库和推进检查点
+                if position != chunk_end:
+                    if buffered >= self.batch_size or self._stop_event.is_set():
+                        written += self._write(buffers)
+                        buffers, buffered = {}, 0
+                        handler.checkpoints.update(file_path, chunk_end)
+                        if self._stop_event.is_set():
+                            break
+                    chunk_end = position
+                if rows:
+                    buffers.setdefault((config["table"], config["columns"]), []).extend(rows)
+                    buffered += len(rows)
+            else:
+                written += self._write(buffers)
+                if chunk_end != start:
+                    handler.checkpoints.update(file_path, chunk_end)
+            if handler.checkpoints.flush_due():
+                handler.checkpoints.flush()
+        finally:
+            handler.unlock_path(file_path)
+
+        with self._stats_lock:
+            self.files += 1
+            self.rows += written
+            self.bytes += chunk_end - start
+        return written, chunk_end - start
+
+    def _write(self, buffers: Dict[BufferKey, List[Tuple[Any, ...]]]) -> int:
+        written = 0
+        for (table, columns), rows in buffers.items():
+            written += self.handler.db_handler.write_batch(table, columns, rows)
+        return written
@@ -0,0 +1,171 @@
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+from pipeline import Block, OffsetTracker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BufferKey = Tuple[str, Tuple[str, ...]]
+
+class BatchSizer:
+    """按每张表观察到的提交耗时调整每批行数
+
+    满批提交快于目标耗时的一半时批量增大四分之一, 超过目标耗时时减半;
+    增长慢、收缩快, 数据库变慢时能迅速减小单个事务。
+    """
+
+    def __init__(self, initial: int = 1000, min_size: int = 100, max_size: int = 20000,
+                 target_latency: float = 0.5):
+        self.initial = max(min_size, min(initial, max_size))
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def size(self, table: str) -> int:
+        return self._sizes.get(table, self.initial)
+
+    def observe(self, table: str, rows: int, seconds: float) -> None:
+        with self._lock:
+            current = self._sizes.get(table, self.initial)
+            if seconds > self.target_latency:
+                size = max(self.min_size, current // 2)
+            elif rows >= current and seconds < self.target_latency / 2:
+                # 定时写出的不满批次说明不了数据库还能承受多大的批量
+                size = min(self.max_size, current + max(current // 4, 1))
+            else:
+                return
+            if size != current:
+                self._sizes[table] = size
+                logger.debug(f"Batch size for {table}: {current} -> {size} ({seconds:.3f}s for {rows} rows)")
+
+    def sizes(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._sizes)
+
+def create_batch_sizer(db_config: Dict[str, Any]) -> Optional[BatchSizer]:
+    adaptive = db_config.get("adaptive_batch", {})
+    if not adaptive.get("enabled", False):
+        return None
+    return BatchSizer(
+        initial=db_config.get("batch_size", 1000),
+        min_size=adaptive.get("min_size", 100),
+        max_size=adaptive.get("max_size", 20000),
+        target_latency=adaptive.get("target_latency", 0.5)
+    )
+
+class BatchWriter:
+    """按 (表, 列) 缓冲元组行, 达到行数上限或最长等待时间后批量写入数据库
+
+    随行加入的偏移标记在所在批次写完后交给 offsets, 写入失败的文件不再推进检查点。
+    """
+
+    def __init__(self, db_handler, batch_size: int = 1000, flush_interval: float = 1.0,
+                 sizer: Optional[BatchSizer] = None, offsets: Optional[OffsetTracker] = None):
+        self.db_handler = db_handler
+        self.batch_size = batch_size
+        # 开启自适应批量时每张表的批量由 sizer 决定
+        self.sizer = sizer
+        self.offsets = offsets
+        self.flush_interval = flush_interval
+        self._buffers: Dict[BufferKey, List[Tuple[Any, ...]]] = {}
+        self._blocks: Dict[BufferKey, List[Block]] = {}
+        self._first_added: Dict[BufferKey, float] = {}
+        self._lock = threading.Lock()
+        # 写库串行化, 保证同一张表的批次按加入顺序落库
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="batch-writer", daemon=True)
+            self._thread.start()
+
+    def add(self, table: str, columns: Tuple[str, ...], row: Tuple[Any, ...]) -> None:
+        self.add_many(table, columns, [row])
+
+    def add_many(self, table: str, columns: Tuple[str, ...], rows: List[Tuple[Any, ...]],
+                 block: Optional[Block] = None) -> None:
+        key = (table, columns)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = []
+                self._blocks[key] = []
+                self._first_added[key] = time.monotonic()
+            buffer.extend(rows)
+            if block is not None:
+                self._blocks[key].append(block)
+            full = len(buffer) >= self._limit(table)
+        if full:
+            self._flush_keys([key])
+
+    def flush(self, table: Optional[str] = None) -> int:
+        """写出指定表(默认全部表)的缓冲, 返回写入行数"""
+        with self._lock:
+            keys = [key for key in self._buffers if table is None or key[0] == table]
+        return self._flush_keys(keys)
+
+    def flush_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, first in self._first_added.items()
+                       if now - first >= self.flush_interval]
+        return self._flush_keys(expired)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(rows) for rows in self._buffers.values())
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _flush_keys(self, keys: List[BufferKey]) -> int:
+        written = 0
+        with self._write_lock:
+            for key in keys:
+                with self._lock:
+                    rows = self._buffers.pop(key, None) or []
+                    blocks = self._blocks.pop(key, [])
+                    self._first_added.pop(key, None)
+                # 一次加入的行数可能超过批量, 按当前批量分批写出; 每批写完后批量可能已被调整
+                failed = False
+                start = 0
+                while start < len(rows):
+                    size = self._limit(key[0])
+                    batch = rows[start:start + size]
+                    try:
+                        written += self._write(key, batch)
+                    except Exception as e:
+                        logger.error(f"Error flushing {len(batch)} rows into {key[0]}: {str(e)}")
+                        failed = True
+                    start += size
+                if self.offsets is not None and blocks:
+                    self.offsets.settle(blocks, failed=failed)
+        return written
+
+    def _limit(self, table: str) -> int:
+        return self.sizer.size(table) if self.sizer is not None else self.batch_size
+
+    def _write(self, key: BufferKey, rows: List[Tuple[Any, ...]]) -> int:
+        table, columns = key
+        # 重试与转存由 db_handler 负责, 行既未入库也未转存时抛出异常
+        started = time.perf_counter()
+        written = self.db_handler.write_batch(table, columns, rows)
+        if self.sizer is not None and written:
+            self.sizer.observe(table, written, time.perf_counter() - started)
+        logger.debug(f"Flushed {written} rows into {table}")
+        return written
+
+    def _run(self) -> None:
+        tick = min(self.flush_interval, 1.0) / 2
+        while not self._stop_event.wait(tick):
+            self.flush_expired()
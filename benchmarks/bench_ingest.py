@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import logging
+logging.disable(logging.INFO)
+
+from watchdog.observers import Observer
+from log_parser import LogParser
+from database_handler import DatabaseHandler
+from watchdog_to_db import LogFileHandler
+from log_generator import generate_lines, append_at_rate
+
+TABLE = "bench_logs"
+
+LOG_CONFIG = {
+    "file_pattern": "bench.*\\.log",
+    "table": TABLE,
+    "field_mappings": [
+        {"source_field": "timestamp", "target_field": "log_time", "type": "datetime"},
+        {"source_field": "level", "target_field": "severity", "type": "string"},
+        {"source_field": "user", "target_field": "user_id", "type": "int"},
+        {"source_field": "latency", "target_field": "duration", "type": "float"},
+        {"source_field": "message", "target_field": "content", "type": "string"},
+        {"source_field": "sent", "target_field": "sent_at", "type": "float"}
+    ]
+}
+
+CREATE_TABLE = (f"CREATE TABLE {TABLE} (log_time TIMESTAMP, severity TEXT, user_id INTEGER, "
+                f"duration REAL, content TEXT, sent_at REAL)")
+
+class LatencyRecorder:
+    """记录入库行数以及每行从写入文件到入库的延迟"""
+
+    def __init__(self):
+        self.rows = 0
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def record(self, columns, rows):
+        now = time.time()
+        sent_index = columns.index("sent_at") if "sent_at" in columns else None
+        with self.lock:
+            self.rows += len(rows)
+            if sent_index is not None:
+                self.latencies.extend(now - row[sent_index] for row in rows if row[sent_index])
+
+class FakeSink(LatencyRecorder):
+    """内存写库替身"""
+
+    def write_batch(self, table, columns, rows):
+        self.record(columns, rows)
+        return len(rows)
+
+    insert_rows = write_batch
+
+    def replay_spill(self):
+        return 0
+
+    def close(self):
+        pass
+
+class SQLiteSink(LatencyRecorder, DatabaseHandler):
+    """真实 SQLite 写库, 提交成功后记录延迟"""
+
+    def __init__(self, config):
+        LatencyRecorder.__init__(self)
+        DatabaseHandler.__init__(self, config)
+
+    def insert_rows(self, table, columns, rows):
+        written = DatabaseHandler.insert_rows(self, table, columns, rows)
+        self.record(columns, rows)
+        return written
+
+def percentiles(samples):
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000
+    return {"p50_ms": round(pick(0.50), 3), "p99_ms": round(pick(0.99), 3)}
+
+def handler_config(tmp_dir, **overrides):
+    config = {
+        "database": {"type": "sqlite", "path": os.path.join(tmp_dir, "bench.db"),
+                     "batch_size": overrides.pop("batch_size", 1000),
+                     "flush_interval": overrides.pop("flush_interval", 1.0)},
+        "watch_directory": tmp_dir,
+        "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+        "coalesce": {"enabled": overrides.pop("coalesce", False)},
+        "log_files": [LOG_CONFIG]
+    }
+    config.update(overrides)
+    return config
+
+def make_sink(kind, tmp_dir):
+    if kind == "fake":
+        return FakeSink()
+    db = SQLiteSink({"type": "sqlite", "path": os.path.join(tmp_dir, "bench.db")})
+    with db.get_connection() as conn:
+        conn.execute(CREATE_TABLE)
+        conn.commit()
+    return db
+
+def bench_parse_line(fmt, lines, repeat):
+    parser = LogParser(LOG_CONFIG)
+    data = generate_lines(lines, fmt)
+    best = None
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for line in data:
+            parser.parse_line(line)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    # 单独一轮逐行计时, 避免计时开销影响吞吐数字
+    for line in data[:10000]:
+        started = time.perf_counter()
+        parser.parse_line(line)
+        samples.append(time.perf_counter() - started)
+    return {"scenario": f"parse_line_{fmt}", "lines": lines,
+            "lines_per_sec": round(lines / best), **percentiles(samples)}
+
+def bench_process_file(fmt, lines, sink_kind, chunks):
+    """把文件分成 chunks 次追加, 每次追加后调用一次 _process_file 并写出缓冲"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.log")
+        data = generate_lines(lines, fmt)
+        sink = make_sink(sink_kind, tmp_dir)
+        handler = LogFileHandler(handler_config(tmp_dir), db_handler=sink)
+        step = max(lines // chunks, 1)
+        samples = []
+        total = 0.0
+        for begin in range(0, lines, step):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(data[begin:begin + step]) + "\n")
+            started = time.perf_counter()
+            handler._process_path(path)
+            handler.batch_writer.flush()
+            elapsed = time.perf_counter() - started
+            samples.append(elapsed)
+            total += elapsed
+        handler.close()
+    return {"scenario": f"process_file_{fmt}_{sink_kind}", "lines": lines,
+            "lines_per_sec": round(lines / total), **percentiles(samples)}
+
+def bench_db_path(rows, batch_size):
+    """直接测批量写库: 每批 batch_size 行写入 SQLite"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_sink("sqlite", tmp_dir)
+        parser = LogParser(LOG_CONFIG)
+        batch = [parser.parse_row(line) for line in generate_lines(batch_size, "json")]
+        samples = []
+        for _ in range(max(rows // batch_size, 1)):
+            started = time.perf_counter()
+            db.insert_rows(TABLE, parser.columns, batch)
+            samples.append(time.perf_counter() - started)
+        db.close()
+    written = len(samples) * batch_size
+    return {"scenario": f"db_insert_sqlite_batch{batch_size}", "lines": written,
+            "lines_per_sec": round(written / sum(samples)), **percentiles(samples)}
+
+def bench_sustained(fmt, rate, duration, sink_kind, flush_interval):
+    """真实 watchdog 观察者 + 持续追加, 统计写入文件到入库的端到端延迟"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.log")
+        open(path, "w").close()
+        sink = make_sink(sink_kind, tmp_dir)
+        handler = LogFileHandler(
+            handler_config(tmp_dir, coalesce=True, flush_interval=flush_interval), db_handler=sink
+        )
+        observer = Observer()
+        observer.schedule(handler, tmp_dir, recursive=False)
+        handler.start()
+        observer.start()
+        started = time.monotonic()
+        written = append_at_rate(path, rate, duration, fmt)
+        deadline = time.monotonic() + max(flush_interval * 4, 5)
+        while sink.rows < written and time.monotonic() < deadline:
+            time.sleep(0.05)
+        elapsed = time.monotonic() - started
+        observer.stop()
+        observer.join()
+        handler.close()
+        inserted, latencies = sink.rows, sink.latencies
+    return {"scenario": f"sustained_{fmt}_{sink_kind}", "rate": rate, "duration": duration,
+            "lines": written, "rows_inserted": inserted,
+            "lines_per_sec": round(inserted / elapsed), **percentiles(latencies)}
+
+SCENARIOS = ["parse_line", "process_file", "db", "sustained"]
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="解析与写库吞吐基准, 结果以 JSON 输出")
+    arg_parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    arg_parser.add_argument("--formats", nargs="+", choices=["json", "kv"], default=["json", "kv"])
+    arg_parser.add_argument("--lines", type=int, default=100000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--sink", choices=["fake", "sqlite"], default="fake")
+    arg_parser.add_argument("--chunks", type=int, default=100, help="process_file 场景的追加次数")
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    arg_parser.add_argument("--rate", type=int, default=5000, help="sustained 场景每秒追加行数")
+    arg_parser.add_argument("--duration", type=float, default=5.0)
+    arg_parser.add_argument("--flush-interval", type=float, default=0.2)
+    arg_parser.add_argument("--output", help="同时写入该 JSON 文件")
+    args = arg_parser.parse_args()
+
+    results = []
+    for fmt in args.formats:
+        if "parse_line" in args.scenarios:
+            results.append(bench_parse_line(fmt, args.lines, args.repeat))
+        if "process_file" in args.scenarios:
+            results.append(bench_process_file(fmt, args.lines, args.sink, args.chunks))
+        if "sustained" in args.scenarios:
+            results.append(bench_sustained(fmt, args.rate, args.duration, args.sink, args.flush_interval))
+    if "db" in args.scenarios:
+        results.append(bench_db_path(args.lines, args.batch_size))
+
+    report = {
+        "python": sys.version.split()[0],
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+if __name__ == "__main__":
+    main()
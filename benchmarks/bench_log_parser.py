@@ -0,0 +1,71 @@
+import os
+import re
+import sys
+import time
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_parser import LogParser
+
+LOG_CONFIG = {
+    "file_pattern": "app\\.log",
+    "table": "app_logs",
+    "field_mappings": [
+        {"source_field": "timestamp", "target_field": "log_time", "type": "string"},
+        {"source_field": "level", "target_field": "severity", "type": "string"},
+        {"source_field": "message", "target_field": "content", "type": "string"},
+        {"source_field": "user", "target_field": "user_id", "type": "int"},
+        {"source_field": "latency", "target_field": "duration", "type": "float"}
+    ]
+}
+
+def legacy_parse_text_log(field_mappings, line):
+    """改造前的逐字段 re.search 实现, 作为对照"""
+    result = {}
+    for field_mapping in field_mappings:
+        source_field = field_mapping["source_field"]
+        match = re.search(f"{source_field}=([^\\s]+)", line)
+        if match:
+            result[source_field] = match.group(1)
+    return result if result else {"raw_message": line.strip()}
+
+def make_lines(count):
+    return [
+        f"timestamp=2024-01-01T10:00:{i % 60:02d} level=INFO user={i} latency=0.{i % 1000:03d} "
+        f"message=request_{i} path=/api/v1/items"
+        for i in range(count)
+    ]
+
+def measure(func, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="key=value 解析微基准")
+    arg_parser.add_argument("--lines", type=int, default=50000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    parser = LogParser(LOG_CONFIG)
+    lines = make_lines(args.lines)
+    legacy = measure(lambda line: legacy_parse_text_log(LOG_CONFIG["field_mappings"], line), lines, args.repeat)
+    compiled = measure(parser._parse_text_log, lines, args.repeat)
+
+    print(json.dumps({
+        "benchmark": "parse_text_log",
+        "lines": args.lines,
+        "legacy_lines_per_sec": round(legacy),
+        "compiled_lines_per_sec": round(compiled),
+        "speedup": round(compiled / legacy, 2)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+LEVELS = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR"]
+
+def make_line(seq, fmt="json", size=0, sent_at=None, rng=random):
+    """生成一行日志; size 为附加载荷的字节数, sent_at 用来测端到端延迟"""
+    timestamp = (datetime(2024, 1, 1) + timedelta(milliseconds=seq)).strftime("%Y-%m-%dT%H:%M:%S")
+    fields = {
+        "timestamp": timestamp,
+        "level": rng.choice(LEVELS),
+        "user": rng.randint(1, 100000),
+        "latency": round(rng.random(), 4),
+        "message": f"request_{seq}" + ("x" * size),
+        "sent": sent_at if sent_at is not None else 0.0
+    }
+    if fmt == "json":
+        return json.dumps(fields)
+    if fmt == "kv":
+        return " ".join(f"{key}={value}" for key, value in fields.items())
+    raise ValueError(f"Unsupported format: {fmt}")
+
+def generate_lines(count, fmt="json", size=0, seed=0):
+    rng = random.Random(seed)
+    return [make_line(i, fmt, size, rng=rng) for i in range(count)]
+
+def write_log(path, count, fmt="json", size=0, seed=0):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in generate_lines(count, fmt, size, seed):
+            f.write(line + "\n")
+    return os.path.getsize(path)
+
+def append_at_rate(path, rate, duration, fmt="json", size=0, seed=0, tick=0.01):
+    """以每秒 rate 行的速度持续追加 duration 秒, 每行带写入时间, 返回写入行数"""
+    rng = random.Random(seed)
+    written = 0
+    started = time.monotonic()
+    with open(path, "a", encoding="utf-8") as f:
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= duration:
+                break
+            target = int(min(elapsed + tick, duration) * rate)
+            if target > written:
+                f.write("".join(
+                    make_line(seq, fmt, size, sent_at=time.time(), rng=rng) + "\n"
+                    for seq in range(written, target)
+                ))
+                f.flush()
+                written = target
+            time.sleep(tick)
+    return written
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="生成合成日志")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--lines", type=int, default=100000)
+    arg_parser.add_argument("--format", choices=["json", "kv"], default="json")
+    arg_parser.add_argument("--size", type=int, default=0, help="每行附加载荷字节数")
+    arg_parser.add_argument("--rate", type=int, default=0, help="大于 0 时按该速率持续追加")
+    arg_parser.add_argument("--duration", type=float, default=10.0)
+    args = arg_parser.parse_args()
+
+    if args.rate:
+        written = append_at_rate(args.path, args.rate, args.duration, args.format, args.size)
+        print(json.dumps({"path": args.path, "lines": written}))
+    else:
+        size = write_log(args.path, args.lines, args.format, args.size)
+        print(json.dumps({"path": args.path, "lines": args.lines, "bytes": size}))
+
+if __name__ == "__main__":
+    sys.exit(main())
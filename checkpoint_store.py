@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional
+import logging
+from tail_reader import detect_compression
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class CheckpointStore:
+    """持久化的文件读取偏移, 以 (device, inode) 为键
+
+    每条记录保存偏移量和文件头部指纹, 用于识别截断、轮转以及 inode 被复用的情况。
+    偏移只在内存中更新, 由 flush() 按批原子地写回磁盘。
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0, fingerprint_bytes: int = 1024):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fingerprint_bytes = fingerprint_bytes
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._path_keys: Dict[str, str] = {}
+        # 本进程内已核对过指纹的键, 之后的事件只需比较文件大小
+        self._verified = set()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.load()
+
+    @staticmethod
+    def _key(stat_result: os.stat_result) -> str:
+        return f"{stat_result.st_dev}:{stat_result.st_ino}"
+
+    def _fingerprint(self, file_path: str, size: int) -> Optional[str]:
+        try:
+            with open(file_path, 'rb') as f:
+                head = f.read(size)
+        except OSError:
+            return None
+        if len(head) < size:
+            return None
+        return hashlib.blake2b(head, digest_size=16).hexdigest()
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading checkpoints from {self.path}: {str(e)}")
+            return
+        with self._lock:
+            self._entries = entries
+            self._path_keys = {entry["path"]: key for key, entry in entries.items()}
+        logger.info(f"Loaded {len(entries)} checkpoints from {self.path}")
+
+    def paths(self):
+        with self._lock:
+            return list(self._path_keys)
+
+    def resolve(self, file_path: str) -> int:
+        """返回文件应当继续读取的偏移, 遇到截断、轮转或 inode 复用时从 0 开始"""
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return 0
+        key = self._key(stat_result)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            previous_key = self._path_keys.get(file_path)
+            if previous_key is not None and previous_key != key:
+                # 同一路径对应了新的 inode: 原文件已被轮转
+                logger.info(f"Rotation detected for {file_path}")
+                self._entries.pop(previous_key, None)
+                self._dirty = True
+
+            if entry is None:
+                self._entries[key] = {"path": file_path, "offset": 0, "fingerprint": None, "fingerprint_size": 0}
+                self._path_keys[file_path] = key
+                self._verified.add(key)
+                self._dirty = True
+                return 0
+
+            if entry["path"] != file_path:
+                self._path_keys.pop(entry["path"], None)
+                entry["path"] = file_path
+                self._dirty = True
+            self._path_keys[file_path] = key
+
+            offset = entry["offset"]
+            fingerprint_size = entry.get("fingerprint_size", 0)
+            fingerprint = None if key in self._verified else entry.get("fingerprint")
+            self._verified.add(key)
+
+        # 压缩归档的偏移是解压后的位置, 可以大于文件大小
+        if stat_result.st_size < offset and detect_compression(file_path) is None:
+            logger.info(f"Truncation detected for {file_path}")
+            self.update(file_path, 0, reset=True)
+            return 0
+        if fingerprint and self._fingerprint(file_path, fingerprint_size) != fingerprint:
+            logger.info(f"Content changed for {file_path}, reading from start")
+            self.update(file_path, 0, reset=True)
+            return 0
+        return offset
+
+    def tracked(self, file_path: str) -> bool:
+        with self._lock:
+            return file_path in self._path_keys
+
+    def inherit(self, file_path: str, source_path: str) -> None:
+        """新文件沿用另一个文件的偏移, 用于压缩后的归档接续原文件的读取位置"""
+        offset = self.offset(source_path)
+        self.resolve(file_path)
+        self.update(file_path, offset)
+
+    def offset(self, file_path: str) -> int:
+        """内存中记录的偏移, 不做轮转和截断检查"""
+        with self._lock:
+            entry = self._entries.get(self._path_keys.get(file_path))
+            return entry["offset"] if entry is not None else 0
+
+    def entry_key(self, file_path: str) -> Optional[str]:
+        """路径当前对应的记录键"""
+        with self._lock:
+            return self._path_keys.get(file_path)
+
+    def update(self, file_path: str, offset: int, reset: bool = False) -> None:
+        with self._lock:
+            self._set(self._path_keys.get(file_path), offset, reset)
+
+    def update_entry(self, key: str, offset: int) -> None:
+        """按记录键更新偏移; 文件改名或同名文件重建后仍写到取得该键时的文件"""
+        with self._lock:
+            self._set(key, offset)
+
+    def _set(self, key: Optional[str], offset: int, reset: bool = False) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry["offset"] = offset
+        if reset:
+            entry["fingerprint"] = None
+            entry["fingerprint_size"] = 0
+        self._dirty = True
+
+    def move(self, src_path: str, dest_path: str) -> None:
+        """文件改名后把偏移记录迁移到新路径"""
+        with self._lock:
+            key = self._path_keys.pop(src_path, None)
+            if key is None:
+                return
+            previous_key = self._path_keys.get(dest_path)
+            if previous_key is not None and previous_key != key:
+                # 改名覆盖了另一个已跟踪的文件
+                self._entries.pop(previous_key, None)
+                self._verified.discard(previous_key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            self._path_keys[dest_path] = key
+            entry["path"] = dest_path
+            self._dirty = True
+
+    def remove(self, file_path: str) -> None:
+        with self._lock:
+            key = self._path_keys.pop(file_path, None)
+            if key is not None:
+                self._entries.pop(key, None)
+                self._verified.discard(key)
+                self._dirty = True
+
+    def prune_missing(self) -> None:
+        for file_path in self.paths():
+            if not os.path.exists(file_path):
+                self.remove(file_path)
+
+    def flush_due(self) -> bool:
+        return self._dirty and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self) -> None:
+        """把当前偏移原子地写入磁盘: 先写临时文件并 fsync, 再 rename 覆盖"""
+        with self._lock:
+            if not self._dirty:
+                return
+            pending = [(key, entry["path"], entry["offset"], entry.get("fingerprint_size", 0))
+                       for key, entry in self._entries.items()]
+            self._dirty = False
+
+        # 头部指纹在写盘时补齐, 不占用逐行处理路径
+        for key, file_path, offset, fingerprint_size in pending:
+            size = min(self.fingerprint_bytes, offset)
+            if size <= fingerprint_size:
+                continue
+            fingerprint = self._fingerprint(file_path, size)
+            if fingerprint is None:
+                continue
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry["offset"] >= size:
+                    entry["fingerprint"] = fingerprint
+                    entry["fingerprint_size"] = size
+
+        with self._lock:
+            snapshot = json.dumps(self._entries)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.checkpoints-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error saving checkpoints to {self.path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._last_flush = time.monotonic()
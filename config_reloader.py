@@ -0,0 +1,65 @@
+import json
+import os
+from typing import Any, Dict, Optional, Set, Tuple
+import logging
+from config_validator import ConfigValidationError, ConfigValidator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 运行中可以替换的配置; 其余部分(数据库、流水线等)修改后需要重启
+RELOADABLE_SECTIONS = {'log_files', 'parsing'}
+# 改变时需要重新登记观察者
+WATCH_SECTIONS = {'watch_directory', 'recursive'}
+
+class ConfigReloader:
+    """监视配置文件, 内容变化且通过校验后返回新配置
+
+    按 (inode, 修改时间, 大小) 判断文件是否变化, 编辑器先写临时文件再改名替换也能发现。
+    读取或校验失败(包括校验过程中的任何异常)时保留当前配置, 直到文件再次变化。
+    """
+
+    def __init__(self, config_path: str, config: Dict[str, Any]):
+        self.config_path = config_path
+        self.config = config
+        self.reloads = 0
+        self.failures = 0
+        self._signature = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat_result = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+
+    def poll(self) -> Optional[Tuple[Dict[str, Any], Set[str]]]:
+        """文件变化且新配置有效时返回 (新配置, 变化的顶层配置项), 否则返回 None"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            ConfigValidator.validate_config(config)
+        except (OSError, ValueError, ConfigValidationError) as e:
+            self.failures += 1
+            logger.error(f"Ignoring invalid config {self.config_path}: {str(e)}")
+            return None
+        except Exception as e:
+            # 校验器没有预料到的内容也不能让监视循环退出
+            self.failures += 1
+            logger.exception(f"Ignoring config {self.config_path} that failed validation: {str(e)}")
+            return None
+
+        changed = {key for key in set(self.config) | set(config) if self.config.get(key) != config.get(key)}
+        if not changed:
+            return None
+        restart = changed - RELOADABLE_SECTIONS - WATCH_SECTIONS
+        if restart:
+            logger.warning(f"Changes to {sorted(restart)} take effect after a restart")
+        self.config = config
+        self.reloads += 1
+        logger.info(f"Config {self.config_path} changed: {sorted(changed)}")
+        return config, changed
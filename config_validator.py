@@ -1,6 +1,8 @@
 from typing import Dict, Any, Set
 import re
 import os
+from record_hash import HASH_ALGORITHMS
+from processing_stage import AGGREGATE_OPS, FILTER_OPS
 
 class ConfigValidationError(Exception):
     """配置验证错误异常"""
@@ -10,6 +12,8 @@ class ConfigValidator:
     """配置验证器类"""
     
     VALID_FIELD_TYPES: Set[str] = {'string', 'int', 'float', 'datetime', 'bool'}
+    VALID_DATABASE_TYPES: Set[str] = {'mysql', 'postgresql', 'postgres', 'sqlite'}
+    VALID_LOG_FORMATS: Set[str] = {'auto', 'json', 'kv', 'regex'}
 
     @staticmethod
     def validate_database_config(config: Dict[str, Any]) -> None:
@@ -17,23 +21,91 @@ class ConfigValidator:
         if not isinstance(config, dict):
             raise ConfigValidationError("Database configuration must be a dictionary")
 
-        # 验证必需的数据库字段
-        required_fields = {'host', 'port', 'user', 'password', 'database'}
-        missing_fields = required_fields - set(config.keys())
-        if missing_fields:
-            raise ConfigValidationError(f"Missing required database fields: {missing_fields}")
-
-        # 验证字段类型和值
-        if not isinstance(config['port'], int):
-            raise ConfigValidationError("Database port must be an integer")
-        if config['port'] < 1 or config['port'] > 65535:
-            raise ConfigValidationError("Database port must be between 1 and 65535")
-        
-        for str_field in ['host', 'user', 'password', 'database']:
-            if not isinstance(config[str_field], str):
-                raise ConfigValidationError(f"Database {str_field} must be a string")
-            if not config[str_field]:
-                raise ConfigValidationError(f"Database {str_field} cannot be empty")
+        # 验证数据库类型
+        db_type = config.get('type', 'mysql')
+        if db_type not in ConfigValidator.VALID_DATABASE_TYPES:
+            raise ConfigValidationError(
+                f"Invalid database type: {db_type}. "
+                f"Must be one of: {ConfigValidator.VALID_DATABASE_TYPES}"
+            )
+
+        if db_type == 'sqlite':
+            # SQLite 只需要数据库文件路径
+            if 'path' not in config:
+                raise ConfigValidationError("Missing required database fields: {'path'}")
+            if not isinstance(config['path'], str) or not config['path']:
+                raise ConfigValidationError("Database path must be a non-empty string")
+        else:
+            # 验证必需的数据库字段
+            required_fields = {'host', 'port', 'user', 'password', 'database'}
+            missing_fields = required_fields - set(config.keys())
+            if missing_fields:
+                raise ConfigValidationError(f"Missing required database fields: {missing_fields}")
+
+            # 验证字段类型和值
+            if not isinstance(config['port'], int):
+                raise ConfigValidationError("Database port must be an integer")
+            if config['port'] < 1 or config['port'] > 65535:
+                raise ConfigValidationError("Database port must be between 1 and 65535")
+            
+            for str_field in ['host', 'user', 'password', 'database']:
+                if not isinstance(config[str_field], str):
+                    raise ConfigValidationError(f"Database {str_field} must be a string")
+                if not config[str_field]:
+                    raise ConfigValidationError(f"Database {str_field} cannot be empty")
+
+        if 'load_data_threshold' in config:
+            if not isinstance(config['load_data_threshold'], int) or config['load_data_threshold'] < 0:
+                raise ConfigValidationError("load_data_threshold must be a non-negative integer")
+
+        if 'ignore_duplicates' in config and not isinstance(config['ignore_duplicates'], bool):
+            raise ConfigValidationError("ignore_duplicates must be a boolean")
+
+        if 'pool_size' in config:
+            if not isinstance(config['pool_size'], int) or config['pool_size'] < 1:
+                raise ConfigValidationError("pool_size must be a positive integer")
+
+        # 验证连接池配置
+        if 'pool' in config:
+            pool = config['pool']
+            if not isinstance(pool, dict):
+                raise ConfigValidationError("Pool configuration must be a dictionary")
+            for key in ('min_size', 'max_size'):
+                if key in pool and (not isinstance(pool[key], int) or isinstance(pool[key], bool) or pool[key] < 0):
+                    raise ConfigValidationError(f"pool.{key} must be a non-negative integer")
+            if pool.get('max_size', config.get('pool_size', 5)) < 1:
+                raise ConfigValidationError("pool.max_size must be a positive integer")
+            if pool.get('min_size', 1) > pool.get('max_size', config.get('pool_size', 5)):
+                raise ConfigValidationError("pool.min_size cannot exceed pool.max_size")
+            for key in ('checkout_timeout', 'max_lifetime', 'health_check_interval', 'max_idle'):
+                if key in pool:
+                    if not isinstance(pool[key], (int, float)) or isinstance(pool[key], bool) or pool[key] <= 0:
+                        raise ConfigValidationError(f"pool.{key} must be a positive number")
+
+        # 验证自适应批量配置
+        if 'adaptive_batch' in config:
+            adaptive = config['adaptive_batch']
+            if not isinstance(adaptive, dict):
+                raise ConfigValidationError("adaptive_batch configuration must be a dictionary")
+            if 'enabled' in adaptive and not isinstance(adaptive['enabled'], bool):
+                raise ConfigValidationError("adaptive_batch.enabled must be a boolean")
+            for key in ('min_size', 'max_size'):
+                if key in adaptive and (not isinstance(adaptive[key], int) or isinstance(adaptive[key], bool) or adaptive[key] < 1):
+                    raise ConfigValidationError(f"adaptive_batch.{key} must be a positive integer")
+            if adaptive.get('min_size', 100) > adaptive.get('max_size', 20000):
+                raise ConfigValidationError("adaptive_batch.min_size cannot exceed adaptive_batch.max_size")
+            if 'target_latency' in adaptive:
+                latency = adaptive['target_latency']
+                if not isinstance(latency, (int, float)) or isinstance(latency, bool) or latency <= 0:
+                    raise ConfigValidationError("adaptive_batch.target_latency must be a positive number")
+
+        # 验证批量写入配置
+        if 'batch_size' in config:
+            if not isinstance(config['batch_size'], int) or config['batch_size'] < 1:
+                raise ConfigValidationError("batch_size must be a positive integer")
+        if 'flush_interval' in config:
+            if not isinstance(config['flush_interval'], (int, float)) or config['flush_interval'] <= 0:
+                raise ConfigValidationError("flush_interval must be a positive number")
 
         # 验证重试配置
         if 'retry' in config:
@@ -70,6 +142,28 @@ class ConfigValidator:
                 raise ConfigValidationError("retention_days must be a positive integer")
             if not isinstance(cleanup['interval_hours'], int) or cleanup['interval_hours'] < 1:
                 raise ConfigValidationError("interval_hours must be a positive integer")
+            if 'batch_size' in cleanup and (not isinstance(cleanup['batch_size'], int) or cleanup['batch_size'] < 1):
+                raise ConfigValidationError("cleanup.batch_size must be a positive integer")
+            if 'throttle' in cleanup and (not isinstance(cleanup['throttle'], (int, float)) or cleanup['throttle'] < 0):
+                raise ConfigValidationError("cleanup.throttle must be a non-negative number")
+            for field in ('primary_key', 'time_column', 'partition_format'):
+                if field in cleanup and (not isinstance(cleanup[field], str) or not cleanup[field]):
+                    raise ConfigValidationError(f"cleanup.{field} must be a non-empty string")
+            if 'drop_partitions' in cleanup and not isinstance(cleanup['drop_partitions'], bool):
+                raise ConfigValidationError("cleanup.drop_partitions must be a boolean")
+
+        # 验证溢出缓冲配置
+        if 'spill' in config:
+            spill = config['spill']
+            if not isinstance(spill, dict):
+                raise ConfigValidationError("Spill configuration must be a dictionary")
+            if 'enabled' in spill and not isinstance(spill['enabled'], bool):
+                raise ConfigValidationError("spill.enabled must be a boolean")
+            if 'directory' in spill and (not isinstance(spill['directory'], str) or not spill['directory']):
+                raise ConfigValidationError("spill.directory must be a non-empty string")
+            for field in ('max_bytes', 'segment_bytes'):
+                if field in spill and (not isinstance(spill[field], int) or spill[field] < 1):
+                    raise ConfigValidationError(f"spill.{field} must be a positive integer")
 
     @staticmethod
     def validate_watch_config(config: Dict[str, Any]) -> None:
@@ -91,6 +185,227 @@ class ConfigValidator:
             if not isinstance(config['recursive'], bool):
                 raise ConfigValidationError("recursive must be a boolean value")
 
+    @staticmethod
+    def validate_pipeline_config(config: Dict[str, Any]) -> None:
+        """验证流水线配置"""
+        if 'pipeline' not in config:
+            return
+
+        pipeline = config['pipeline']
+        if not isinstance(pipeline, dict):
+            raise ConfigValidationError("Pipeline configuration must be a dictionary")
+
+        if 'enabled' in pipeline and not isinstance(pipeline['enabled'], bool):
+            raise ConfigValidationError("pipeline.enabled must be a boolean")
+
+        for int_field in ['parser_workers', 'writer_threads', 'queue_size', 'table_queue_batches']:
+            if int_field in pipeline:
+                if not isinstance(pipeline[int_field], int) or pipeline[int_field] < 1:
+                    raise ConfigValidationError(f"pipeline.{int_field} must be a positive integer")
+
+    @staticmethod
+    def validate_metrics_config(config: Dict[str, Any]) -> None:
+        """验证指标服务配置"""
+        if 'metrics' not in config:
+            return
+
+        metrics = config['metrics']
+        if not isinstance(metrics, dict):
+            raise ConfigValidationError("Metrics configuration must be a dictionary")
+
+        if 'enabled' in metrics and not isinstance(metrics['enabled'], bool):
+            raise ConfigValidationError("metrics.enabled must be a boolean")
+        if 'host' in metrics and (not isinstance(metrics['host'], str) or not metrics['host']):
+            raise ConfigValidationError("metrics.host must be a non-empty string")
+        if 'port' in metrics:
+            if not isinstance(metrics['port'], int) or metrics['port'] < 0 or metrics['port'] > 65535:
+                raise ConfigValidationError("metrics.port must be between 0 and 65535")
+
+    @staticmethod
+    def validate_profiling_config(config: Dict[str, Any]) -> None:
+        """验证性能分析配置"""
+        if 'profiling' not in config:
+            return
+
+        profiling = config['profiling']
+        if not isinstance(profiling, dict):
+            raise ConfigValidationError("Profiling configuration must be a dictionary")
+
+        for bool_field in ['enabled', 'cprofile', 'tracemalloc']:
+            if bool_field in profiling and not isinstance(profiling[bool_field], bool):
+                raise ConfigValidationError(f"profiling.{bool_field} must be a boolean")
+        if 'sample_every' in profiling:
+            if not isinstance(profiling['sample_every'], int) or profiling['sample_every'] < 1:
+                raise ConfigValidationError("profiling.sample_every must be a positive integer")
+        if 'dump_interval' in profiling:
+            if not isinstance(profiling['dump_interval'], (int, float)) or profiling['dump_interval'] <= 0:
+                raise ConfigValidationError("profiling.dump_interval must be a positive number")
+        if 'directory' in profiling and (not isinstance(profiling['directory'], str) or not profiling['directory']):
+            raise ConfigValidationError("profiling.directory must be a non-empty string")
+
+    @staticmethod
+    def validate_parsing_config(config: Dict[str, Any]) -> None:
+        """验证解析配置"""
+        if 'parsing' not in config:
+            return
+
+        parsing = config['parsing']
+        if not isinstance(parsing, dict):
+            raise ConfigValidationError("Parsing configuration must be a dictionary")
+
+        if 'workers' in parsing:
+            if not isinstance(parsing['workers'], int) or parsing['workers'] < 0:
+                raise ConfigValidationError("parsing.workers must be a non-negative integer")
+        if 'chunk_lines' in parsing:
+            if not isinstance(parsing['chunk_lines'], int) or parsing['chunk_lines'] < 1:
+                raise ConfigValidationError("parsing.chunk_lines must be a positive integer")
+
+    @staticmethod
+    def validate_async_config(config: Dict[str, Any]) -> None:
+        """验证异步运行时配置"""
+        if 'async' not in config:
+            return
+
+        async_config = config['async']
+        if not isinstance(async_config, dict):
+            raise ConfigValidationError("Async configuration must be a dictionary")
+
+        if 'driver' in async_config and async_config['driver'] not in {'auto', 'aiomysql', 'executor'}:
+            raise ConfigValidationError("async.driver must be one of: auto, aiomysql, executor")
+
+        for int_field in ['max_inflight', 'workers', 'io_workers', 'read_bytes']:
+            if int_field in async_config:
+                if not isinstance(async_config[int_field], int) or async_config[int_field] < 1:
+                    raise ConfigValidationError(f"async.{int_field} must be a positive integer")
+
+    @staticmethod
+    def validate_backfill_config(config: Dict[str, Any]) -> None:
+        """验证补录配置"""
+        if 'backfill' not in config:
+            return
+
+        backfill = config['backfill']
+        if not isinstance(backfill, dict):
+            raise ConfigValidationError("Backfill configuration must be a dictionary")
+
+        for int_field in ['workers', 'batch_size', 'read_size']:
+            if int_field in backfill:
+                if not isinstance(backfill[int_field], int) or backfill[int_field] < 1:
+                    raise ConfigValidationError(f"backfill.{int_field} must be a positive integer")
+
+    @staticmethod
+    def validate_sharding_config(config: Dict[str, Any]) -> None:
+        """验证多实例分片配置"""
+        if 'sharding' not in config:
+            return
+
+        sharding = config['sharding']
+        if not isinstance(sharding, dict):
+            raise ConfigValidationError("Sharding configuration must be a dictionary")
+
+        if 'enabled' in sharding and not isinstance(sharding['enabled'], bool):
+            raise ConfigValidationError("sharding.enabled must be a boolean")
+        if sharding.get('node_id') is not None:
+            if not isinstance(sharding['node_id'], str) or not sharding['node_id']:
+                raise ConfigValidationError("sharding.node_id must be a non-empty string")
+        for number_field in ['lease_seconds', 'heartbeat_interval']:
+            if number_field in sharding:
+                if not isinstance(sharding[number_field], (int, float)) or sharding[number_field] <= 0:
+                    raise ConfigValidationError(f"sharding.{number_field} must be a positive number")
+        # 心跳间隔必须明显短于租约, 否则正常节点的租约也会过期
+        if sharding.get('heartbeat_interval', 10) * 2 > sharding.get('lease_seconds', 30):
+            raise ConfigValidationError("sharding.heartbeat_interval must be at most half of lease_seconds")
+        if 'vnodes' in sharding:
+            if not isinstance(sharding['vnodes'], int) or sharding['vnodes'] < 1:
+                raise ConfigValidationError("sharding.vnodes must be a positive integer")
+        if 'table_prefix' in sharding:
+            if not isinstance(sharding['table_prefix'], str) or not re.match(r'^\w+$', sharding['table_prefix']):
+                raise ConfigValidationError("sharding.table_prefix must be a valid identifier")
+        if 'database' in sharding:
+            ConfigValidator.validate_database_config(sharding['database'])
+
+    @staticmethod
+    def validate_dedup_config(config: Dict[str, Any]) -> None:
+        """验证记录哈希与去重配置"""
+        if 'hash_algorithm' in config and config['hash_algorithm'] not in HASH_ALGORITHMS:
+            raise ConfigValidationError(f"hash_algorithm must be one of: {sorted(HASH_ALGORITHMS)}")
+
+        if 'dedup' not in config:
+            return
+
+        dedup = config['dedup']
+        if not isinstance(dedup, dict):
+            raise ConfigValidationError("Dedup configuration must be a dictionary")
+
+        if 'enabled' in dedup and not isinstance(dedup['enabled'], bool):
+            raise ConfigValidationError("dedup.enabled must be a boolean")
+        if 'column' in dedup:
+            if not isinstance(dedup['column'], str) or not re.match(r'^\w+$', dedup['column']):
+                raise ConfigValidationError("dedup.column must be a valid column name")
+        if 'cache_size' in dedup:
+            if not isinstance(dedup['cache_size'], int) or dedup['cache_size'] < 0:
+                raise ConfigValidationError("dedup.cache_size must be a non-negative integer")
+
+    @staticmethod
+    def validate_coalesce_config(config: Dict[str, Any]) -> None:
+        """验证事件合并配置"""
+        if 'coalesce' not in config:
+            return
+
+        coalesce = config['coalesce']
+        if not isinstance(coalesce, dict):
+            raise ConfigValidationError("Coalesce configuration must be a dictionary")
+
+        if 'enabled' in coalesce and not isinstance(coalesce['enabled'], bool):
+            raise ConfigValidationError("coalesce.enabled must be a boolean")
+        if 'window' in coalesce:
+            if not isinstance(coalesce['window'], (int, float)) or coalesce['window'] <= 0:
+                raise ConfigValidationError("coalesce.window must be a positive number")
+        if 'byte_threshold' in coalesce:
+            if not isinstance(coalesce['byte_threshold'], int) or coalesce['byte_threshold'] < 0:
+                raise ConfigValidationError("coalesce.byte_threshold must be a non-negative integer")
+
+    @staticmethod
+    def validate_reader_config(config: Dict[str, Any]) -> None:
+        """验证文件读取配置"""
+        if 'reader' not in config:
+            return
+
+        reader = config['reader']
+        if not isinstance(reader, dict):
+            raise ConfigValidationError("Reader configuration must be a dictionary")
+
+        for int_field in ['chunk_size', 'max_line_bytes']:
+            if int_field in reader:
+                if not isinstance(reader[int_field], int) or reader[int_field] < 1:
+                    raise ConfigValidationError(f"reader.{int_field} must be a positive integer")
+        if 'max_open_files' in reader:
+            if not isinstance(reader['max_open_files'], int) or reader['max_open_files'] < 0:
+                raise ConfigValidationError("reader.max_open_files must be a non-negative integer")
+        if 'max_idle_seconds' in reader:
+            if not isinstance(reader['max_idle_seconds'], (int, float)) or reader['max_idle_seconds'] <= 0:
+                raise ConfigValidationError("reader.max_idle_seconds must be a positive number")
+
+    @staticmethod
+    def validate_checkpoint_config(config: Dict[str, Any]) -> None:
+        """验证检查点配置"""
+        if 'checkpoint' not in config:
+            return
+
+        checkpoint = config['checkpoint']
+        if not isinstance(checkpoint, dict):
+            raise ConfigValidationError("Checkpoint configuration must be a dictionary")
+
+        if 'path' in checkpoint:
+            if not isinstance(checkpoint['path'], str) or not checkpoint['path']:
+                raise ConfigValidationError("checkpoint.path must be a non-empty string")
+        if 'flush_interval' in checkpoint:
+            if not isinstance(checkpoint['flush_interval'], (int, float)) or checkpoint['flush_interval'] <= 0:
+                raise ConfigValidationError("checkpoint.flush_interval must be a positive number")
+        if 'fingerprint_bytes' in checkpoint:
+            if not isinstance(checkpoint['fingerprint_bytes'], int) or checkpoint['fingerprint_bytes'] < 1:
+                raise ConfigValidationError("checkpoint.fingerprint_bytes must be a positive integer")
+
     @staticmethod
     def validate_field_mapping(mapping: Dict[str, Any]) -> None:
         """验证单个字段映射配置"""
@@ -114,6 +429,12 @@ class ConfigValidator:
                 f"Must be one of: {ConfigValidator.VALID_FIELD_TYPES}"
             )
 
+        if 'format' in mapping:
+            if mapping['type'] != 'datetime':
+                raise ConfigValidationError("format is only supported for datetime fields")
+            if not isinstance(mapping['format'], str) or not mapping['format']:
+                raise ConfigValidationError("format must be a non-empty string")
+
     @staticmethod
     def validate_log_files_config(config: Dict[str, Any]) -> None:
         """验证日志文件配置"""
@@ -148,6 +469,24 @@ class ConfigValidator:
             if not isinstance(log_config['table'], str) or not log_config['table']:
                 raise ConfigValidationError(f"table in log file #{idx} must be a non-empty string")
 
+            # 验证日志格式
+            log_format = log_config.get('format', 'auto')
+            if log_format not in ConfigValidator.VALID_LOG_FORMATS:
+                raise ConfigValidationError(
+                    f"Invalid format in log file #{idx}: {log_format}. "
+                    f"Must be one of: {ConfigValidator.VALID_LOG_FORMATS}"
+                )
+            if 'pattern' in log_config:
+                if not isinstance(log_config['pattern'], str) or not log_config['pattern']:
+                    raise ConfigValidationError(f"pattern in log file #{idx} must be a non-empty string")
+                try:
+                    if not re.compile(log_config['pattern']).groupindex:
+                        raise ConfigValidationError(f"pattern in log file #{idx} must use named groups")
+                except re.error as e:
+                    raise ConfigValidationError(f"Invalid line pattern in log file #{idx}: {str(e)}")
+            elif log_format == 'regex':
+                raise ConfigValidationError(f"format regex in log file #{idx} requires a pattern")
+
             # 验证字段映射
             if not isinstance(log_config['field_mappings'], list):
                 raise ConfigValidationError(f"field_mappings in log file #{idx} must be a list")
@@ -163,6 +502,106 @@ class ConfigValidator:
                         f"Invalid field mapping #{mapping_idx} in log file #{idx}: {str(e)}"
                     )
 
+    @staticmethod
+    def validate_reload_config(config: Dict[str, Any]) -> None:
+        """验证配置热加载设置"""
+        if 'reload' not in config:
+            return
+
+        reload_config = config['reload']
+        if not isinstance(reload_config, dict):
+            raise ConfigValidationError("Reload configuration must be a dictionary")
+        if 'enabled' in reload_config and not isinstance(reload_config['enabled'], bool):
+            raise ConfigValidationError("reload.enabled must be a boolean")
+
+    @staticmethod
+    def validate_processing_config(config: Dict[str, Any]) -> None:
+        """验证各日志配置的过滤、采样和汇总设置"""
+        for idx, log_config in enumerate(config.get('log_files', [])):
+            if 'processing' not in log_config:
+                continue
+            processing = log_config['processing']
+            if not isinstance(processing, dict):
+                raise ConfigValidationError(f"processing in log file #{idx} must be a dictionary")
+            fields = {mapping.get('target_field') for mapping in log_config.get('field_mappings', [])}
+
+            def check_field(field: Any, where: str) -> None:
+                if not isinstance(field, str) or field not in fields:
+                    raise ConfigValidationError(
+                        f"{where} in log file #{idx} must name a target_field, got {field!r}"
+                    )
+
+            filters = processing.get('filters', [])
+            if not isinstance(filters, list):
+                raise ConfigValidationError(f"processing.filters in log file #{idx} must be a list")
+            for filter_idx, spec in enumerate(filters):
+                if not isinstance(spec, dict):
+                    raise ConfigValidationError(f"Filter #{filter_idx} in log file #{idx} must be a dictionary")
+                check_field(spec.get('field'), f"Filter #{filter_idx} field")
+                op = spec.get('op', 'eq')
+                if not isinstance(op, str) or op not in FILTER_OPS:
+                    raise ConfigValidationError(
+                        f"Filter #{filter_idx} in log file #{idx} has invalid op {op}. "
+                        f"Must be one of: {sorted(FILTER_OPS)}"
+                    )
+                if op in ('in', 'not_in') and not isinstance(spec.get('value'), list):
+                    raise ConfigValidationError(f"Filter #{filter_idx} in log file #{idx} needs a list value for {op}")
+                if op == 'regex':
+                    try:
+                        re.compile(spec.get('value'))
+                    except (re.error, TypeError) as e:
+                        raise ConfigValidationError(f"Invalid regex in filter #{filter_idx} of log file #{idx}: {str(e)}")
+
+            if 'sample_rate' in processing:
+                rate = processing['sample_rate']
+                if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not 0 < rate <= 1:
+                    raise ConfigValidationError(f"processing.sample_rate in log file #{idx} must be in (0, 1]")
+            if 'sample_by' in processing:
+                if not isinstance(processing['sample_by'], list) or not processing['sample_by']:
+                    raise ConfigValidationError(f"processing.sample_by in log file #{idx} must be a non-empty list")
+                for field in processing['sample_by']:
+                    check_field(field, "processing.sample_by")
+
+            if 'aggregate' not in processing:
+                continue
+            aggregate = processing['aggregate']
+            if not isinstance(aggregate, dict):
+                raise ConfigValidationError(f"processing.aggregate in log file #{idx} must be a dictionary")
+            table = aggregate.get('table')
+            if not isinstance(table, str) or not table:
+                raise ConfigValidationError(f"processing.aggregate.table in log file #{idx} must be a non-empty string")
+            if table == log_config.get('table'):
+                raise ConfigValidationError(f"processing.aggregate.table in log file #{idx} must differ from table")
+            for key in ('window_seconds', 'lateness', 'idle_seconds'):
+                if key in aggregate:
+                    value = aggregate[key]
+                    if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                        raise ConfigValidationError(f"processing.aggregate.{key} in log file #{idx} must be a non-negative number")
+            if aggregate.get('window_seconds', 60) <= 0:
+                raise ConfigValidationError(f"processing.aggregate.window_seconds in log file #{idx} must be positive")
+            if 'keep_rows' in aggregate and not isinstance(aggregate['keep_rows'], bool):
+                raise ConfigValidationError(f"processing.aggregate.keep_rows in log file #{idx} must be a boolean")
+            if aggregate.get('time_field') is not None:
+                check_field(aggregate['time_field'], "processing.aggregate.time_field")
+            group_by = aggregate.get('group_by', [])
+            if not isinstance(group_by, list):
+                raise ConfigValidationError(f"processing.aggregate.group_by in log file #{idx} must be a list")
+            for field in group_by:
+                check_field(field, "processing.aggregate.group_by")
+            metrics = aggregate.get('metrics', [{'op': 'count'}])
+            if not isinstance(metrics, list) or not metrics:
+                raise ConfigValidationError(f"processing.aggregate.metrics in log file #{idx} must be a non-empty list")
+            for metric_idx, spec in enumerate(metrics):
+                if not isinstance(spec, dict) or not isinstance(spec.get('op'), str) or spec['op'] not in AGGREGATE_OPS:
+                    raise ConfigValidationError(
+                        f"Metric #{metric_idx} in log file #{idx} must have an op in {sorted(AGGREGATE_OPS)}"
+                    )
+                if spec['op'] != 'count':
+                    check_field(spec.get('field'), f"Metric #{metric_idx} field")
+                if 'column' in spec:
+                    if not isinstance(spec['column'], str) or not re.match(r'^\w+$', spec['column']):
+                        raise ConfigValidationError(f"Metric #{metric_idx} in log file #{idx} has an invalid column name")
+
     @classmethod
     def validate_config(cls, config: Dict[str, Any]) -> None:
         """验证整个配置文件"""
@@ -176,4 +615,17 @@ class ConfigValidator:
 
         cls.validate_database_config(config['database'])
         cls.validate_watch_config(config)
-        cls.validate_log_files_config(config)
\ No newline at end of file
+        cls.validate_log_files_config(config)
+        cls.validate_pipeline_config(config)
+        cls.validate_reader_config(config)
+        cls.validate_coalesce_config(config)
+        cls.validate_parsing_config(config)
+        cls.validate_async_config(config)
+        cls.validate_checkpoint_config(config)
+        cls.validate_metrics_config(config)
+        cls.validate_profiling_config(config)
+        cls.validate_backfill_config(config)
+        cls.validate_sharding_config(config)
+        cls.validate_dedup_config(config)
+        cls.validate_processing_config(config)
+        cls.validate_reload_config(config)
\ No newline at end of file
@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(TimeoutError):
+    """等待空闲连接超时; 属于 TimeoutError, 由写库重试和溢出缓冲按临时错误处理"""
+    pass
+
+class ConnectionPool:
+    """有界连接池
+
+    连接按需创建, 数量在 min_size 与 max_size 之间; 连接用尽时 checkout 阻塞等待,
+    超过 checkout_timeout 抛出 PoolTimeout。空闲超过 health_check_interval 的连接在取出前
+    用 ping 检查, 存活超过 max_lifetime 的连接在归还时关闭重建, 出错的连接直接丢弃。
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 5,
+                 checkout_timeout: float = 30.0, max_lifetime: float = 3600.0,
+                 health_check_interval: float = 30.0, ping: Optional[Callable[[Any], None]] = None):
+        self.connect = connect
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.ping = ping
+        # 后进先出: 常用的连接保持热, 多余的连接空闲到被 prune 关闭
+        self._idle: deque = deque()
+        self._created: Dict[int, float] = {}
+        self._cond = threading.Condition()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.opened = 0
+        self.recycled = 0
+        self.failed_checks = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], connect: Callable[[], Any],
+                    ping: Optional[Callable[[Any], None]] = None) -> "ConnectionPool":
+        pool_config = config.get('pool', {})
+        pool = cls(
+            connect,
+            min_size=pool_config.get('min_size', 1),
+            max_size=pool_config.get('max_size', config.get('pool_size', 5)),
+            checkout_timeout=pool_config.get('checkout_timeout', 30.0),
+            max_lifetime=pool_config.get('max_lifetime', 3600.0),
+            health_check_interval=pool_config.get('health_check_interval', 30.0),
+            ping=ping
+        )
+        pool.fill()
+        return pool
+
+    def fill(self) -> None:
+        """预先建立 min_size 个连接"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def checkout(self) -> Any:
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {self.checkout_timeout}s "
+                            f"({self._in_use}/{self.max_size} in use)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    conn, last_used = None, None
+                    self._size += 1
+            if conn is None:
+                conn = self._open()
+            elif not self._usable(conn, last_used):
+                continue
+            break
+
+        wait = time.monotonic() - started
+        with self._cond:
+            self._in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += wait
+            if waited:
+                self.waits += 1
+        return conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """归还连接; discard 为 True 表示连接已不可用"""
+        expired = time.monotonic() - self._created.get(id(conn), 0) >= self.max_lifetime
+        if discard or expired or self._closed:
+            if expired and not discard:
+                self.recycled += 1
+            self._discard(conn)
+            with self._cond:
+                self._in_use -= 1
+            return
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def prune(self, max_idle: float = 300.0) -> int:
+        """关闭空闲过久或超过寿命的连接, 至少保留 min_size 个, 返回关闭的数量"""
+        now = time.monotonic()
+        closing = []
+        with self._cond:
+            keep = deque()
+            # 队首是最久未用的连接
+            while self._idle:
+                conn, last_used = self._idle.popleft()
+                stale = now - last_used >= max_idle and self._size - len(closing) > self.min_size
+                if stale or now - self._created.get(id(conn), now) >= self.max_lifetime:
+                    closing.append(conn)
+                else:
+                    keep.append((conn, last_used))
+            self._idle = keep
+        for conn in closing:
+            self._discard(conn)
+        self.recycled += len(closing)
+        if closing:
+            self.fill()
+        return len(closing)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "utilization": round(self._in_use / self.max_size, 3) if self.max_size else 0,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "avg_wait": round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0,
+                "timeouts": self.timeouts,
+                "opened": self.opened,
+                "recycled": self.recycled,
+                "failed_checks": self.failed_checks
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def _open(self) -> Any:
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._created[id(conn)] = time.monotonic()
+        self.opened += 1
+        return conn
+
+    def _usable(self, conn: Any, last_used: float) -> bool:
+        """取出的空闲连接是否可以直接使用, 不可用时已被关闭"""
+        now = time.monotonic()
+        if now - self._created.get(id(conn), now) >= self.max_lifetime:
+            self.recycled += 1
+            self._discard(conn)
+            return False
+        if self.ping is None or now - last_used < self.health_check_interval:
+            return True
+        try:
+            self.ping(conn)
+            return True
+        except Exception as e:
+            self.failed_checks += 1
+            logger.warning(f"Dropping dead database connection: {str(e)}")
+            self._discard(conn)
+            return False
+
+    def _discard(self, conn: Any) -> None:
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
@@ -1,7 +1,9 @@
-import mysql.connector
-from mysql.connector import pooling
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
 import logging
+import metrics
+from storage_backends import create_backend
+from spill_buffer import SpillBuffer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -9,38 +11,115 @@ logger = logging.getLogger(__name__)
 class DatabaseHandler:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.pool = self._create_connection_pool()
-
-    def _create_connection_pool(self):
-        db_config = {
-            'host': self.config['host'],
-            'port': self.config['port'],
-            'user': self.config['user'],
-            'password': self.config['password'],
-            'database': self.config['database'],
-            'pool_name': 'mypool',
-            'pool_size': 5
-        }
-        return mysql.connector.pooling.MySQLConnectionPool(**db_config)
+        # 具体数据库由 database.type 决定, 默认 mysql
+        self.backend = create_backend(config)
+        self.retry = config.get('retry')
+        spill = config.get('spill', {})
+        self.spill: Optional[SpillBuffer] = None
+        if spill.get('enabled', False):
+            self.spill = SpillBuffer(
+                spill.get('directory', 'spill'),
+                max_bytes=spill.get('max_bytes', 1073741824),
+                segment_bytes=spill.get('segment_bytes', 8388608)
+            )
 
     def get_connection(self):
-        return self.pool.get_connection()
+        return self.backend.connection()
 
     def insert_log(self, table: str, data: Dict[str, Any]) -> None:
+        self.insert_rows(table, tuple(data.keys()), [tuple(data.values())])
+
+    def insert_rows(self, table: str, columns: Tuple[str, ...], rows: Sequence[Tuple[Any, ...]]) -> int:
+        """按固定列顺序批量写入元组行, 整批只占用一个连接并提交一次"""
+        return self._insert_groups(table, {columns: rows})
+
+    def write_batch(self, table: str, columns: Tuple[str, ...], rows: Sequence[Tuple[Any, ...]]) -> int:
+        """写入一批数据, 失败时按 retry 配置退避重试; 数据库不可用时转存到溢出缓冲
+
+        该表在溢出缓冲中还有未回放的批次时, 新批次直接追加到缓冲末尾, 保证回放后的写入顺序;
+        其它表照常写入。非暂时性错误(表不存在、约束冲突等)的批次移到死信文件。
+        返回写入数据库的行数; 行既没有入库也没有转存到磁盘时抛出异常, 调用方不能推进检查点。
+        """
+        if self.spill is not None and self.spill.pending(table):
+            self._spill(table, columns, rows)
+            return 0
+        try:
+            return self._with_retry(self.insert_rows, table, columns, rows)
+        except Exception as e:
+            if self.spill is None:
+                raise
+            if self.backend.is_transient(e):
+                logger.warning(f"Database unavailable, spilling {len(rows)} rows for {table} to disk")
+                self._spill(table, columns, rows)
+            else:
+                logger.error(f"Moving {len(rows)} rows for {table} to {self.spill.dead_letter_path()}: {str(e)}")
+                self.spill.dead_letter(table, columns, list(rows), str(e))
+            return 0
+
+    def _spill(self, table: str, columns: Tuple[str, ...], rows: Sequence[Tuple[Any, ...]]) -> None:
+        if not self.spill.append(table, columns, list(rows)):
+            raise OSError(f"Spill buffer full, cannot keep {len(rows)} rows for {table}")
+        metrics.ROWS_SPILLED.labels(table).inc(len(rows))
+
+    def replay_spill(self) -> int:
+        """把溢出缓冲中的批次按顺序写回数据库, 每批只尝试一次, 暂时性失败留待下次调用"""
+        if self.spill is None or not self.spill.pending():
+            return 0
+        return self.spill.replay(self.insert_rows, self.backend.is_transient)
+
+    def _with_retry(self, operation: Callable[..., int], *args) -> int:
+        attempts = self.retry['max_attempts'] if self.retry else 1
+        delay = self.retry['delay'] if self.retry else 0
+        for attempt in range(1, attempts + 1):
+            try:
+                return operation(*args)
+            except Exception as e:
+                if attempt >= attempts or not self.backend.is_transient(e):
+                    raise
+                logger.warning(f"Database write failed (attempt {attempt}/{attempts}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                delay *= self.retry['backoff']
+
+    def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """批量写入字典行, 按列集合分组后在同一事务中写入"""
+        groups: Dict[Tuple[str, ...], List[Tuple[Any, ...]]] = {}
+        for row in rows:
+            groups.setdefault(tuple(row.keys()), []).append(tuple(row.values()))
+        return self._insert_groups(table, groups)
+
+    def _insert_groups(self, table: str, groups: Dict[Tuple[str, ...], Sequence[Tuple[Any, ...]]]) -> int:
+        total = sum(len(rows) for rows in groups.values())
+        if not total:
+            return 0
+
         try:
-            columns = ', '.join(data.keys())
-            placeholders = ', '.join(['%s'] * len(data))
-            query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-            values = tuple(data.values())
-            
             with self.get_connection() as conn:
-                with conn.cursor() as cursor:
-                    cursor.execute(query, values)
+                started = time.perf_counter()
+                for columns, rows in groups.items():
+                    if rows:
+                        self.backend.bulk_insert(conn, table, columns, rows)
                 conn.commit()
+                metrics.DB_LATENCY.observe(time.perf_counter() - started)
         except Exception as e:
-            logger.error(f"Error inserting data: {str(e)}")
+            metrics.INSERT_ERRORS.labels(table).inc()
+            logger.error(f"Error inserting {total} rows into {table}: {str(e)}")
             raise
+        metrics.ROWS_INSERTED.labels(table).inc(total)
+        metrics.BATCH_ROWS.observe(total)
+        return total
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self.backend.pool_stats()
+
+    def prune_connections(self) -> int:
+        try:
+            return self.backend.prune()
+        except Exception as e:
+            logger.error(f"Error pruning database connections: {str(e)}")
+            return 0
 
     def close(self):
-        if hasattr(self, 'pool'):
-            self.pool._remove_connections()
\ No newline at end of file
+        if getattr(self, 'spill', None) is not None:
+            self.spill.close()
+        if hasattr(self, 'backend'):
+            self.backend.close()
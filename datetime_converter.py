@@ -0,0 +1,79 @@
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+DEFAULT_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f"
+]
+
+# 秒级前缀之后只跟小数秒时, 可以复用前缀的转换结果
+_FRACTION = re.compile(r"\.(\d{1,6})")
+_PREFIX_LENGTH = 19
+
+class DatetimeConverter:
+    """单个字段的时间转换器
+
+    转换顺序: 配置的显式格式 -> 上次成功的格式 -> datetime.fromisoformat -> 默认格式列表。
+    连续日志行的时间戳大多相同或只差小数秒, 因此缓存上一个值及其秒级前缀的结果。
+    按格式解析得到的前缀只复用于同样形态(有无小数秒及其位数)的值, 格式不接受的小数秒仍会被拒绝。
+    """
+
+    def __init__(self, explicit_format: Optional[str] = None, formats: Optional[List[str]] = None):
+        self.explicit_format = explicit_format
+        self.formats = formats or DEFAULT_FORMATS
+        self._learned_format: Optional[str] = None
+        # 以元组整体替换, 多线程共用同一个转换器时不会读到不一致的状态
+        self._last = (None, None)
+        # (秒级前缀, 前缀之后的长度, 结果); 长度为 None 表示 ISO 格式, 任意小数秒都可复用
+        self._prefix = (None, None, None)
+
+    def convert(self, value: str) -> datetime:
+        last_value, last_result = self._last
+        if value == last_value:
+            return last_result
+
+        prefix, rest = value[:_PREFIX_LENGTH], value[_PREFIX_LENGTH:]
+        fraction = _FRACTION.fullmatch(rest) if rest else None
+        cached_prefix, shape, cached_result = self._prefix
+        if prefix == cached_prefix and (not rest or fraction) and (shape is None or shape == len(rest)):
+            result = cached_result
+            if fraction:
+                result = result.replace(microsecond=int(fraction.group(1).ljust(6, "0")))
+        else:
+            result, iso = self._parse(value)
+            if len(prefix) == _PREFIX_LENGTH and result.tzinfo is None and (not rest or fraction):
+                self._prefix = (prefix, None if iso else len(rest), result.replace(microsecond=0))
+
+        self._last = (value, result)
+        return result
+
+    def _parse(self, value: str) -> Tuple[datetime, bool]:
+        """返回 (结果, 是否按 ISO 格式解析)"""
+        if self.explicit_format:
+            return datetime.strptime(value, self.explicit_format), False
+
+        learned_format = self._learned_format
+        if learned_format:
+            try:
+                return datetime.strptime(value, learned_format), False
+            except ValueError:
+                pass
+
+        try:
+            return datetime.fromisoformat(value), True
+        except ValueError:
+            pass
+
+        for fmt in self.formats:
+            if fmt == learned_format:
+                continue
+            try:
+                result = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            self._learned_format = fmt
+            return result, False
+        raise ValueError(f"Unable to parse datetime: {value}")
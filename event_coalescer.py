@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EventCoalescer:
+    """合并同一路径在时间窗口内的修改事件, 每个路径每个周期最多处理一次
+
+    窗口内积压的字节数达到 byte_threshold 时立即处理, 不再等待窗口结束。
+    """
+
+    def __init__(self, process: Callable[[str], None], window: float = 0.1,
+                 byte_threshold: int = 0, backlog: Optional[Callable[[str], int]] = None):
+        self.process = process
+        self.window = window
+        self.byte_threshold = byte_threshold
+        self.backlog = backlog
+        self._pending: Dict[str, float] = {}
+        self._urgent = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.events_received = 0
+        self.paths_processed = 0
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-coalescer", daemon=True)
+            self._thread.start()
+
+    def submit(self, file_path: str) -> None:
+        self.events_received += 1
+        with self._lock:
+            if file_path not in self._pending:
+                self._pending[file_path] = time.monotonic()
+            elif file_path in self._urgent:
+                return
+        if self.byte_threshold and self.backlog is not None:
+            try:
+                urgent = self.backlog(file_path) >= self.byte_threshold
+            except OSError:
+                urgent = False
+            if urgent:
+                with self._lock:
+                    self._urgent.add(file_path)
+                self._wake.set()
+
+    def close(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # 停止前把仍在等待的路径处理完
+        self.tick(force=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {"events_received": self.events_received, "paths_processed": self.paths_processed}
+
+    def tick(self, force: bool = False) -> int:
+        now = time.monotonic()
+        with self._lock:
+            ready = [path for path, first in self._pending.items()
+                     if force or path in self._urgent or now - first >= self.window]
+            for path in ready:
+                del self._pending[path]
+                self._urgent.discard(path)
+
+        for path in ready:
+            try:
+                self.process(path)
+            except Exception as e:
+                logger.error(f"Error processing file {path}: {str(e)}")
+        self.paths_processed += len(ready)
+        return len(ready)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake.wait(self.window)
+            self._wake.clear()
+            self.tick()
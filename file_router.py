@@ -0,0 +1,94 @@
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FileRouter:
+    """把文件路径路由到匹配的解析配置
+
+    所有 file_pattern 合并成一个正则, 每个模式放在一个可选的前瞻分组里,
+    一次匹配即可得到全部命中的配置, 代价不再随模式数量线性增长。
+    路径 -> 路由结果按路径缓存, 由创建、删除、移动事件失效。
+    """
+
+    def __init__(self, routes: List[Dict[str, Any]], cache_size: int = 4096):
+        self.routes = routes
+        self.cache_size = cache_size
+        self._cache: Dict[str, List[Dict[str, Any]]] = {}
+        # 指定了路由的路径不受缓存容量影响
+        self._pinned: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._combined: Optional[re.Pattern] = None
+        self._groups: List[tuple] = []
+        # 含捕获分组或行内标志的模式合并后语义可能改变, 单独匹配
+        self._separate: List[tuple] = []
+
+        parts = []
+        for position, route in enumerate(routes):
+            regex = route["regex"]
+            if regex.groups or regex.pattern.lstrip("^").startswith("(?"):
+                self._separate.append((position, regex))
+                continue
+            name = f"r{position}"
+            parts.append(f"(?:(?=.*?(?P<{name}>{regex.pattern})))?")
+            self._groups.append((position, name))
+        if parts:
+            try:
+                self._combined = re.compile("".join(parts), re.DOTALL)
+            except re.error as e:
+                logger.warning(f"Cannot combine file patterns, matching one by one: {str(e)}")
+                self._separate = [(position, route["regex"]) for position, route in enumerate(routes)]
+                self._groups = []
+
+    def match(self, file_path: str) -> List[Dict[str, Any]]:
+        # 不匹配任何模式的路径缓存为空列表, 同样算作命中
+        routes = self._cache.get(file_path)
+        if routes is None:
+            routes = self._pinned.get(file_path)
+        if routes is None:
+            routes = self._route(os.path.basename(file_path))
+            with self._lock:
+                if len(self._cache) >= self.cache_size:
+                    self._cache.clear()
+                self._cache[file_path] = routes
+        return routes
+
+    def _route(self, file_name: str) -> List[Dict[str, Any]]:
+        matched = []
+        if self._combined is not None:
+            m = self._combined.match(file_name)
+            matched = [position for position, name in self._groups if m.group(name) is not None]
+        if self._separate:
+            matched.extend(position for position, regex in self._separate if regex.search(file_name))
+            matched.sort()
+        return [self.routes[position] for position in matched]
+
+    def pin(self, file_path: str, routes: List[Dict[str, Any]]) -> None:
+        """为不再匹配任何模式的路径(轮转后的前身文件)指定路由, 直到该路径失效"""
+        with self._lock:
+            self._cache.pop(file_path, None)
+            self._pinned[file_path] = routes
+
+    def pinned(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            return dict(self._pinned)
+
+    def invalidate(self, file_path: str) -> None:
+        with self._lock:
+            self._cache.pop(file_path, None)
+            self._pinned.pop(file_path, None)
+
+    def invalidate_prefix(self, directory: str) -> None:
+        prefix = os.path.join(directory, "")
+        with self._lock:
+            for file_path in [path for path in self._cache if path.startswith(prefix)]:
+                del self._cache[file_path]
+            for file_path in [path for path in self._pinned if path.startswith(prefix)]:
+                del self._pinned[file_path]
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -1,86 +1,188 @@
 import re
 import json
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Callable, Union
 import logging
+from datetime_converter import DatetimeConverter
+
+# 优先使用更快的 JSON 库; 三者的解析错误都是 ValueError 的子类, 且都可以直接解析 UTF-8 字节
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+        _json_loads = ujson.loads
+    except ImportError:
+        _json_loads = json.loads
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+Row = Tuple[Any, ...]
+Line = Union[str, bytes]
+
+FORMATS = ('auto', 'json', 'kv', 'regex')
+# 判断文件格式时查看的行数
+SNIFF_LINES = 20
+# 各格式的逐行解析方法名; 调用时再取方法, 分析器替换的类属性才会生效
+ROW_PARSERS = {
+    "auto": "parse_row",
+    "json": "_parse_json_row",
+    "kv": "_parse_text_row",
+    "regex": "_parse_text_row"
+}
+
+def _text(line: Line) -> str:
+    return line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line
+
+def _looks_like_json(line: Line) -> bool:
+    return line.lstrip()[:1] in ('{', b'{')
+
+def _to_bool(value: Any) -> bool:
+    return str(value).lower() in ('true', '1', 'yes', 'y')
+
+def _identity(value: Any) -> Any:
+    return value
+
 class LogParser:
     def __init__(self, log_config: Dict[str, Any]):
         self.log_config = log_config
         self.field_mappings = log_config["field_mappings"]
+        # 所有 source_field 合并成一个预编译的 key=value 扫描器, 每行只扫描一遍;
+        # 扫描放在前瞻里不消耗字符, 与逐字段查找一样能命中其它键或值内部的 key=
+        source_fields = sorted({m["source_field"] for m in self.field_mappings}, key=len, reverse=True)
+        # 同一位置只能命中一个键, 含 = 的键可能与更短的键起点相同, 单独查找
+        scanned = [field for field in source_fields if "=" not in field]
+        self._text_pattern = re.compile(
+            "(?=(" + "|".join(re.escape(field) for field in scanned) + r")=([^\s]+))"
+        ) if scanned else None
+        self._field_patterns = [
+            (field, re.compile(re.escape(field) + r"=([^\s]+)")) for field in source_fields if "=" in field
+        ]
+        self.columns, self._plan = self._compile_plan(self.field_mappings)
+        # format 为 auto 时按文件内容判断; pattern 是带命名分组的整行正则, 配置后取代 key=value 扫描
+        self.format = log_config.get("format", "auto")
+        pattern = log_config.get("pattern")
+        self._line_pattern = re.compile(pattern) if pattern else None
+        self._text_format = "regex" if self._line_pattern is not None else "kv"
+
+    @classmethod
+    def _compile_plan(cls, field_mappings: List[Dict[str, Any]]) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, Callable[[Any], Any], int], ...]]:
+        """把字段映射编译成固定的 (source_field, 转换函数, 列下标) 序列, 列顺序即 target_field 首次出现的顺序"""
+        columns: List[str] = []
+        plan = []
+        for mapping in field_mappings:
+            target_field = mapping["target_field"]
+            if target_field not in columns:
+                columns.append(target_field)
+            converter = cls._build_converter(mapping.get("type", "string"), mapping.get("format"))
+            plan.append((mapping["source_field"], converter, columns.index(target_field)))
+        return tuple(columns), tuple(plan)
+
+    @staticmethod
+    def _build_converter(target_type: str, fmt: Optional[str] = None) -> Callable[[Any], Any]:
+        if target_type == "string":
+            return str
+        elif target_type == "int":
+            return int
+        elif target_type == "float":
+            return float
+        elif target_type == "datetime":
+            # 每个时间字段独立记忆成功的格式, 可通过映射中的 format 指定格式
+            convert = DatetimeConverter(fmt).convert
+            return lambda value: convert(value) if isinstance(value, str) else value
+        elif target_type == "bool":
+            return _to_bool
+        return _identity
+
+    def sniff(self, lines: List[Line]) -> str:
+        """根据文件开头的若干行判断格式, 混合格式时返回 auto"""
+        if self.format != "auto":
+            return self.format
+        sample = lines[:SNIFF_LINES]
+        if not sample:
+            return "auto"
+        json_lines = sum(1 for line in sample if _looks_like_json(line))
+        if json_lines == len(sample):
+            return "json"
+        if json_lines == 0:
+            return self._text_format
+        return "auto"
+
+    def row_parser(self, fmt: str) -> Callable[[Line], Optional[Row]]:
+        """返回指定格式的逐行解析函数"""
+        return getattr(self, ROW_PARSERS.get(fmt, "parse_row"))
 
     def parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        row = self.parse_row(line)
+        if row is None:
+            return None
+        return {column: value for column, value in zip(self.columns, row) if value is not None}
+
+    def parse_row(self, line: Line) -> Optional[Row]:
+        """解析一行, 按 self.columns 的顺序返回元组, 缺失或转换失败的字段为 None"""
+        # 只有以 { 开头的行才尝试 JSON, 文本日志不再为每行抛出一次解析异常
+        if _looks_like_json(line):
+            return self._parse_json_row(line)
+        return self._parse_text_row(line)
+
+    def _parse_json_row(self, line: Line) -> Optional[Row]:
         try:
-            # 尝试解析为JSON
             try:
-                data = json.loads(line)
-            except json.JSONDecodeError:
-                # 使用正则表达式解析
-                data = self._parse_text_log(line)
-
-            if not data:
+                data = _json_loads(line)
+            except ValueError:
+                # 偶尔出现的非 JSON 行按文本解析
+                return self._parse_text_row(line)
+            if not data or not isinstance(data, dict):
                 return None
+            return self._apply_field_mapping(data)
+        except Exception as e:
+            logger.error(f"Error parsing line: {str(e)}")
+            return None
 
-            # 应用字段映射
+    def _parse_text_row(self, line: Line) -> Optional[Row]:
+        try:
+            line = _text(line)
+            if self._line_pattern is not None:
+                data = self._parse_regex_log(line)
+            else:
+                data = self._parse_text_log(line)
             return self._apply_field_mapping(data)
         except Exception as e:
             logger.error(f"Error parsing line: {str(e)}")
             return None
 
+    def _parse_regex_log(self, line: str) -> Dict[str, Any]:
+        match = self._line_pattern.search(line)
+        if match is None:
+            return {"raw_message": line.strip()}
+        return {key: value for key, value in match.groupdict().items() if value is not None}
+
     def _parse_text_log(self, line: str) -> Dict[str, Any]:
         result = {}
-        for field_mapping in self.field_mappings:
-            source_field = field_mapping["source_field"]
-            pattern = f"{source_field}=([^\\s]+)"
-            match = re.search(pattern, line)
+        if self._text_pattern is not None:
+            for key, value in self._text_pattern.findall(line):
+                # 同名字段以第一次出现为准
+                if key not in result:
+                    result[key] = value
+        for key, pattern in self._field_patterns:
+            match = pattern.search(line)
             if match:
-                result[source_field] = match.group(1)
+                result[key] = match.group(1)
         return result if result else {"raw_message": line.strip()}
 
-    def _apply_field_mapping(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        result = {}
-        for mapping in self.field_mappings:
-            source_field = mapping["source_field"]
-            target_field = mapping["target_field"]
-            field_type = mapping.get("type", "string")
-
+    def _apply_field_mapping(self, data: Dict[str, Any]) -> Optional[Row]:
+        row = [None] * len(self.columns)
+        found = False
+        for source_field, convert, index in self._plan:
             if source_field in data:
-                value = data[source_field]
-                converted_value = self._convert_type(value, field_type)
-                if converted_value is not None:
-                    result[target_field] = converted_value
+                try:
+                    value = convert(data[source_field])
+                except Exception as e:
+                    logger.error(f"Type conversion error: {str(e)}")
+                    continue
+                if value is not None:
+                    row[index] = value
+                    found = True
 
-        return result if result else None
-
-    def _convert_type(self, value: Any, target_type: str) -> Any:
-        try:
-            if target_type == "string":
-                return str(value)
-            elif target_type == "int":
-                return int(value)
-            elif target_type == "float":
-                return float(value)
-            elif target_type == "datetime":
-                if isinstance(value, str):
-                    formats = [
-                        "%Y-%m-%d %H:%M:%S",
-                        "%Y-%m-%dT%H:%M:%S",
-                        "%Y/%m/%d %H:%M:%S",
-                        "%Y-%m-%d %H:%M:%S.%f"
-                    ]
-                    for fmt in formats:
-                        try:
-                            return datetime.strptime(value, fmt)
-                        except ValueError:
-                            continue
-                    raise ValueError(f"Unable to parse datetime: {value}")
-                return value
-            elif target_type == "bool":
-                return str(value).lower() in ('true', '1', 'yes', 'y')
-            return value
-        except Exception as e:
-            logger.error(f"Type conversion error: {str(e)}")
-            return None
\ No newline at end of file
+        return tuple(row) if found else None
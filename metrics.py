@@ -0,0 +1,221 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """带标签的指标; 每组标签值对应一个子指标, 子指标创建后缓存复用"""
+
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render(values, child))
+        return lines
+
+    def _render(self, values, child) -> List[str]:
+        raise NotImplementedError
+
+class _CounterValue:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def _render(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _render(self, values, child) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class GaugeFunction(_Metric):
+    """抓取时才计算的仪表, 回调返回 {标签值: 数值}"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelname: str):
+        self._function: Optional[Callable[[], Dict[str, float]]] = None
+        super().__init__(name, documentation, (labelname,))
+
+    def set_function(self, function: Callable[[], Dict[str, float]]) -> None:
+        self._function = function
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        if self._function is None:
+            return lines
+        try:
+            values = self._function()
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {str(e)}")
+            return lines
+        for label, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, (label,))} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+EVENTS = REGISTRY.register(Counter(
+    "watchdog_events_total", "File system events received", ("type",)))
+BYTES_READ = REGISTRY.register(Counter(
+    "watchdog_bytes_read_total", "Bytes read from log files"))
+LINES_PARSED = REGISTRY.register(Counter(
+    "watchdog_lines_parsed_total", "Non-empty lines handed to a parser", ("table",)))
+PARSE_FAILURES = REGISTRY.register(Counter(
+    "watchdog_parse_failures_total", "Lines that did not produce a row", ("table",)))
+ROWS_INSERTED = REGISTRY.register(Counter(
+    "watchdog_rows_inserted_total", "Rows committed to the database", ("table",)))
+INSERT_ERRORS = REGISTRY.register(Counter(
+    "watchdog_insert_errors_total", "Failed batch inserts", ("table",)))
+ROWS_SPILLED = REGISTRY.register(Counter(
+    "watchdog_rows_spilled_total", "Rows written to the spill buffer", ("table",)))
+ROWS_DEDUPLICATED = REGISTRY.register(Counter(
+    "watchdog_rows_deduplicated_total", "Rows dropped by the in-process dedup cache", ("table",)))
+ROWS_FILTERED = REGISTRY.register(Counter(
+    "watchdog_rows_filtered_total", "Rows dropped by processing filters or sampling", ("table",)))
+BATCH_ROWS = REGISTRY.register(Histogram(
+    "watchdog_batch_rows", "Rows per committed batch", buckets=SIZE_BUCKETS))
+DB_LATENCY = REGISTRY.register(Histogram(
+    "watchdog_db_insert_seconds", "Time to insert and commit one batch"))
+POOL_WAIT = REGISTRY.register(Histogram(
+    "watchdog_pool_wait_seconds", "Time spent waiting for a database connection"))
+FILE_LAG = REGISTRY.register(GaugeFunction(
+    "watchdog_file_lag_bytes", "File size minus checkpointed offset", "path"))
+POOL_CONNECTIONS = REGISTRY.register(GaugeFunction(
+    "watchdog_pool_connections", "Database connections by state (in_use, idle, max_size)", "state"))
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(host: str = '127.0.0.1', port: int = 9108) -> ThreadingHTTPServer:
+    """在后台线程中以 Prometheus 文本格式提供 /metrics"""
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
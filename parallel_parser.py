@@ -0,0 +1,97 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+from log_parser import Line, LogParser
+from record_hash import RecordHasher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 记录哈希的输入: (文件标识, 每行的起始偏移); 未开启去重时为 None
+HashKeys = Optional[Tuple[str, List[int]]]
+# (log_config 下标, 文件格式, 待解析的行, 记录哈希输入, 调用方附带的标记)
+Job = Tuple[int, str, List[Line], HashKeys, Any]
+
+_worker_parsers: List[LogParser] = []
+_worker_hasher: Optional[RecordHasher] = None
+
+def _init_worker(log_configs: List[Dict[str, Any]], hash_algorithm: Optional[str] = None) -> None:
+    global _worker_parsers, _worker_hasher
+    _worker_parsers = [LogParser(log_config) for log_config in log_configs]
+    _worker_hasher = RecordHasher(hash_algorithm) if hash_algorithm else None
+
+def _parse_lines(parser: LogParser, fmt: str, lines: List[Line], keys: HashKeys = None,
+                 hasher: Optional[RecordHasher] = None) -> List[Tuple[Any, ...]]:
+    parse = parser.row_parser(fmt)
+    rows = []
+    if keys is None or hasher is None:
+        for line in lines:
+            row = parse(line)
+            if row is not None:
+                rows.append(row)
+        return rows
+    # 哈希作为最后一列追加在解析结果之后
+    for line, digest in zip(lines, hasher.digest_lines(keys[0], keys[1], lines)):
+        row = parse(line)
+        if row is not None:
+            rows.append(row + (digest,))
+    return rows
+
+def _parse_chunk(config_index: int, fmt: str, lines: List[Line], keys: HashKeys) -> List[Tuple[Any, ...]]:
+    return _parse_lines(_worker_parsers[config_index], fmt, lines, keys, _worker_hasher)
+
+class ChunkParser:
+    """在当前进程内按块解析"""
+
+    def __init__(self, log_configs: List[Dict[str, Any]], parsers: List[LogParser] = None,
+                 hash_algorithm: Optional[str] = None):
+        self.parsers = parsers if parsers is not None else [LogParser(c) for c in log_configs]
+        self.hasher = RecordHasher(hash_algorithm) if hash_algorithm else None
+
+    def imap(self, jobs: Iterable[Job]) -> Iterator[Tuple[Any, List[Tuple[Any, ...]]]]:
+        for config_index, fmt, lines, keys, tag in jobs:
+            yield tag, _parse_lines(self.parsers[config_index], fmt, lines, keys, self.hasher) if lines else []
+
+    def close(self) -> None:
+        pass
+
+class ProcessChunkParser(ChunkParser):
+    """把行块分发到子进程解析, 结果按提交顺序返回, 在途任务数量有上限"""
+
+    def __init__(self, log_configs: List[Dict[str, Any]], workers: int, max_pending: int = 0,
+                 hash_algorithm: Optional[str] = None):
+        super().__init__(log_configs, parsers=[])
+        self.max_pending = max_pending or workers * 2
+        # 使用 spawn 避免在已有观察者线程的进程中 fork
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(log_configs, hash_algorithm)
+        )
+
+    def imap(self, jobs: Iterable[Job]) -> Iterator[Tuple[Any, List[Tuple[Any, ...]]]]:
+        pending: deque = deque()
+        for config_index, fmt, lines, keys, tag in jobs:
+            future = self.executor.submit(_parse_chunk, config_index, fmt, lines, keys) if lines else None
+            pending.append((tag, future))
+            while len(pending) > self.max_pending:
+                yield self._result(*pending.popleft())
+        while pending:
+            yield self._result(*pending.popleft())
+
+    @staticmethod
+    def _result(tag: Any, future: Future) -> Tuple[Any, List[Tuple[Any, ...]]]:
+        return tag, future.result() if future is not None else []
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+def create_chunk_parser(log_configs: List[Dict[str, Any]], parsers: List[LogParser], workers: int,
+                        hash_algorithm: Optional[str] = None) -> ChunkParser:
+    if workers and workers > 0:
+        logger.info(f"Parsing with {workers} worker processes")
+        return ProcessChunkParser(log_configs, workers, hash_algorithm=hash_algorithm)
+    return ChunkParser(log_configs, parsers, hash_algorithm)
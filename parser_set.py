@@ -0,0 +1,100 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+import logging
+from log_parser import LogParser
+from file_router import FileRouter
+from parallel_parser import create_chunk_parser
+from processing_stage import create_processing_stage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ParserSet:
+    """由 log_files 与 parsing 配置编译出的全部解析状态: 解析计划、处理阶段、路由和行块解析器
+
+    配置热加载时在后台整体编译一份新的, 再一次性替换。正在读取的文件继续使用开始时的那一份,
+    旧的解析进程在最后一个读取方结束后才关闭。
+    """
+
+    def __init__(self, config: Dict[str, Any], hash_column: Optional[str] = None,
+                 hash_algorithm: Optional[str] = None, cache_size: int = 4096):
+        self.parsers: Dict[str, Dict[str, Any]] = {}
+        for index, log_config in enumerate(config["log_files"]):
+            parser = LogParser(log_config)
+            columns = parser.columns + (hash_column,) if hash_column else parser.columns
+            # 字段映射之后的处理阶段: 过滤、采样, 以及按时间窗口汇总到单独的表
+            row_filter, aggregator = create_processing_stage(log_config, columns)
+            self.parsers[log_config["file_pattern"]] = {
+                "index": index,
+                "file_pattern": log_config["file_pattern"],
+                "regex": re.compile(log_config["file_pattern"]),
+                "parser": parser,
+                "table": log_config["table"],
+                "columns": columns,
+                "filter": row_filter,
+                "aggregator": aggregator,
+                # 行块解析器按 index 选择解析计划, 读取时必须使用同一份 ParserSet
+                "parser_set": self
+            }
+        self.aggregators = [entry["aggregator"] for entry in self.parsers.values() if entry["aggregator"] is not None]
+        # 解析按行块进行; parsing.workers > 0 时行块交给子进程解析
+        parsing_config = config.get("parsing", {})
+        self.chunk_lines = parsing_config.get("chunk_lines", 1000)
+        self.chunk_parser = create_chunk_parser(
+            config["log_files"],
+            [entry["parser"] for entry in self.parsers.values()],
+            parsing_config.get("workers", 0),
+            hash_algorithm=hash_algorithm if hash_column else None
+        )
+        # 文件路径 -> 匹配的解析配置, 由文件事件失效
+        self.router = FileRouter(list(self.parsers.values()), cache_size=cache_size)
+        self._users = 0
+        self._retired = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._users += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            idle = self._retired and self._users == 0
+        if idle:
+            self.close()
+
+    def retire(self) -> None:
+        """被新配置取代; 没有读取方时立即关闭"""
+        with self._lock:
+            self._retired = True
+            idle = self._users == 0
+        if idle:
+            self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def adopt_pins(self, previous: "ParserSet") -> None:
+        """把旧配置下为轮转前身文件指定的路由按 file_pattern 迁移过来"""
+        for file_path, routes in previous.router.pinned().items():
+            mapped = [self.parsers[route["file_pattern"]] for route in routes if route["file_pattern"] in self.parsers]
+            if mapped:
+                self.router.pin(file_path, mapped)
+
+    def drain_rollups(self, force: bool = False) -> List[tuple]:
+        rollups = []
+        for aggregator in self.aggregators:
+            rows = aggregator.drain(force)
+            if rows:
+                rollups.append((aggregator.table, aggregator.columns, rows))
+        return rollups
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.chunk_parser.close()
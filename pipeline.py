@@ -0,0 +1,225 @@
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# parse_range(file_path, start, end) -> 可迭代的 (table, columns, rows, position)
+# position 是产出这些行后已消费到的整行末尾偏移; rows 为空时只用来报告进度
+ParseRange = Callable[[str, int, int], Iterable[Tuple[str, Tuple[str, ...], List[Tuple[Any, ...]], int]]]
+QueueKey = Tuple[str, Tuple[str, ...]]
+# on_written(key, position): 该偏移之前的记录都已写入数据库; key 是登记标记时文件对应的偏移记录键
+OnWritten = Callable[[str, int], None]
+# (偏移记录键, 偏移标记), 由 OffsetTracker.mark 返回, 随行块一起传到写库方
+Block = Tuple[str, List[int]]
+
+_STOP = object()
+
+class OffsetTracker:
+    """按文件记录已读出但尚未写入的偏移, 行块写完后按读取顺序报告可以保存的偏移
+
+    每读出一段登记一个 [偏移, 未写完的行块数] 标记; 开头的标记全部写完后通过 on_written
+    报告其中最后一个偏移。有行块写入失败的文件不再推进偏移, 重新启动后从失败处重读。
+    标记按 key_of(file_path) 在登记时得到的键归组(默认就是路径), 文件改名或同名文件重建后
+    偏移仍报告给读取时的那个文件。
+    """
+
+    def __init__(self, on_written: Optional[OnWritten] = None,
+                 key_of: Optional[Callable[[str], Optional[str]]] = None):
+        self.on_written = on_written
+        self.key_of = key_of
+        self._marks: Dict[str, Deque[List[int]]] = {}
+        self._stalled = set()
+        self._lock = threading.Lock()
+
+    def _key(self, file_path: str) -> Optional[str]:
+        return self.key_of(file_path) if self.key_of is not None else file_path
+
+    def mark(self, file_path: str, position: int, pending: int) -> Optional[Block]:
+        """登记读到 position 为止、分成 pending 个行块写库的一段; 没有行块时立即尝试推进
+
+        返回的行块标识在写库后交给 settle; 文件没有偏移记录或已停止推进时返回 None。
+        """
+        key = self._key(file_path)
+        if key is None:
+            return None
+        with self._lock:
+            if key in self._stalled:
+                return None
+            mark = [position, pending]
+            self._marks.setdefault(key, deque()).append(mark)
+        if not pending:
+            self._advance(key)
+        return key, mark
+
+    def settle(self, blocks: Iterable[Optional[Block]], failed: bool = False) -> None:
+        """一批行块写库结束后调用"""
+        keys = set()
+        with self._lock:
+            for block in blocks:
+                if block is None:
+                    continue
+                key, mark = block
+                if failed:
+                    if key not in self._stalled:
+                        logger.error(f"Holding back the checkpoint of {key} after a failed write")
+                    self._stalled.add(key)
+                    self._marks.pop(key, None)
+                else:
+                    mark[1] -= 1
+                    keys.add(key)
+        for key in keys:
+            self._advance(key)
+
+    def forget(self, file_path: str) -> None:
+        """文件被删除或从头重读时清除未报告的标记和失败状态"""
+        key = self._key(file_path)
+        with self._lock:
+            self._stalled.discard(key)
+            self._marks.pop(key, None)
+
+    def _advance(self, key: str) -> None:
+        # 在锁内回调, 保证同一文件的偏移按顺序报告
+        with self._lock:
+            marks = self._marks.get(key)
+            position = None
+            while marks and marks[0][1] == 0:
+                position = marks.popleft()[0]
+            if not marks:
+                self._marks.pop(key, None)
+            if position is not None and self.on_written is not None:
+                self.on_written(key, position)
+
+class IngestPipeline:
+    """事件处理 -> 解析线程 -> 按 (表, 列) 分队列的写库线程池, 各级之间使用有界队列传递背压
+
+    解析出的每一段在 offsets 中登记偏移标记, 行块写完后才报告该偏移,
+    调用方据此推进检查点, 不会领先于已入库的数据。
+    """
+
+    def __init__(self, parse_range: ParseRange, db_handler, parser_workers: int = 2,
+                 writer_threads: int = 5, queue_size: int = 10000, batch_size: int = 1000,
+                 table_queue_batches: int = 64, sizer=None, offsets: Optional[OffsetTracker] = None):
+        self.parse_range = parse_range
+        self.db_handler = db_handler
+        self.offsets = offsets if offsets is not None else OffsetTracker()
+        self.batch_size = batch_size
+        # 可选的 BatchSizer, 按提交耗时调整每张表的批量
+        self.sizer = sizer
+        # 表队列里的元素是解析好的行块, 容量按块数计算
+        self.table_queue_batches = table_queue_batches
+        # 同一文件固定分配给同一解析线程, 保证文件内顺序
+        self._work_queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(parser_workers)]
+        self._table_queues: Dict[QueueKey, queue.Queue] = {}
+        self._table_locks: Dict[QueueKey, threading.Lock] = {}
+        self._tables_lock = threading.Lock()
+        self._work_available = threading.Event()
+        self._stopping = threading.Event()
+        self._parsers = [
+            threading.Thread(target=self._parse_loop, args=(q,), name=f"parser-{i}", daemon=True)
+            for i, q in enumerate(self._work_queues)
+        ]
+        self._writers = [
+            threading.Thread(target=self._write_loop, name=f"db-writer-{i}", daemon=True)
+            for i in range(writer_threads)
+        ]
+
+    def start(self) -> None:
+        for thread in self._parsers + self._writers:
+            thread.start()
+
+    def submit(self, file_path: str, start: int, end: int) -> None:
+        """提交文件区间 [start, end), 队列已满时阻塞调用方"""
+        index = zlib.crc32(file_path.encode('utf-8')) % len(self._work_queues)
+        self._work_queues[index].put((file_path, start, end))
+
+    def close(self) -> None:
+        for work_queue in self._work_queues:
+            work_queue.put(_STOP)
+        for thread in self._parsers:
+            thread.join()
+        # 解析线程全部退出后, 写库线程把剩余记录写完再退出
+        self._stopping.set()
+        self._work_available.set()
+        for thread in self._writers:
+            thread.join()
+
+    def _table_queue(self, key: QueueKey) -> queue.Queue:
+        table_queue = self._table_queues.get(key)
+        if table_queue is None:
+            with self._tables_lock:
+                table_queue = self._table_queues.get(key)
+                if table_queue is None:
+                    self._table_locks[key] = threading.Lock()
+                    table_queue = self._table_queues[key] = queue.Queue(maxsize=self.table_queue_batches)
+        return table_queue
+
+    def _parse_loop(self, work_queue: queue.Queue) -> None:
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                return
+            file_path, start, end = item
+            try:
+                for table, columns, rows, position in self.parse_range(file_path, start, end):
+                    block = self.offsets.mark(file_path, position, 1 if rows else 0)
+                    if rows:
+                        self._table_queue((table, columns)).put((rows, block))
+                        self._work_available.set()
+            except Exception as e:
+                logger.error(f"Error processing file {file_path}: {str(e)}")
+
+    def _drain(self, key: QueueKey) -> int:
+        """取出一批记录写库; 每个队列同一时刻只有一个写线程, 保持写入顺序"""
+        lock = self._table_locks[key]
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            table_queue = self._table_queues[key]
+            table, columns = key
+            limit = self.sizer.size(table) if self.sizer is not None else self.batch_size
+            rows = []
+            blocks = []
+            while len(rows) < limit:
+                try:
+                    block_rows, block = table_queue.get_nowait()
+                except queue.Empty:
+                    break
+                rows.extend(block_rows)
+                blocks.append(block)
+            if rows:
+                try:
+                    started = time.perf_counter()
+                    written = self.db_handler.write_batch(table, columns, rows)
+                    if self.sizer is not None and written:
+                        self.sizer.observe(table, written, time.perf_counter() - started)
+                except Exception as e:
+                    logger.error(f"Error writing {len(rows)} rows into {table}: {str(e)}")
+                    self.offsets.settle(blocks, failed=True)
+                else:
+                    self.offsets.settle(blocks)
+            return len(rows)
+        finally:
+            lock.release()
+
+    def _write_loop(self) -> None:
+        while True:
+            if not self._stopping.is_set():
+                self._work_available.clear()
+            with self._tables_lock:
+                keys = list(self._table_queues)
+            written = sum(self._drain(key) for key in keys)
+            if written:
+                continue
+            if self._stopping.is_set():
+                if all(self._table_queues[key].empty() for key in keys):
+                    return
+                # 剩余记录正由其它写线程处理
+                time.sleep(0.01)
+                continue
+            self._work_available.wait(0.5)
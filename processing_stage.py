@@ -0,0 +1,207 @@
+import operator
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+Row = Tuple[Any, ...]
+
+FILTER_OPS = {'eq', 'ne', 'in', 'not_in', 'gt', 'gte', 'lt', 'lte', 'regex', 'exists'}
+AGGREGATE_OPS = {'count', 'sum', 'min', 'max'}
+
+_COMPARISONS = {'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+
+def _predicate(index: int, op: str, value: Any) -> Callable[[Row], bool]:
+    """编译成只取一列的判断函数; 字段缺失(None)时只有 ne / not_in / exists false 成立"""
+    if op == 'exists':
+        return (lambda row: row[index] is not None) if value else (lambda row: row[index] is None)
+    if op == 'eq':
+        return lambda row: row[index] == value
+    if op == 'ne':
+        return lambda row: row[index] != value
+    if op == 'in':
+        values = frozenset(value)
+        return lambda row: row[index] in values
+    if op == 'not_in':
+        values = frozenset(value)
+        return lambda row: row[index] not in values
+    if op == 'regex':
+        search = re.compile(value).search
+        return lambda row: row[index] is not None and search(str(row[index])) is not None
+    compare = _COMPARISONS[op]
+
+    def check(row: Row) -> bool:
+        try:
+            return row[index] is not None and compare(row[index], value)
+        except TypeError:
+            return False
+    return check
+
+class RowFilter:
+    """字段映射之后的过滤与采样
+
+    filters 中的条件全部成立才保留; 采样按 sample_by 字段(默认整行)的 CRC32 决定,
+    同一条记录每次重读得到相同的结果, 不依赖随机数和进程。
+    """
+
+    def __init__(self, columns: Sequence[str], filters: List[Dict[str, Any]] = None,
+                 sample_rate: float = 1.0, sample_by: Optional[List[str]] = None):
+        self._predicates = [
+            _predicate(columns.index(spec["field"]), spec.get("op", "eq"), spec.get("value"))
+            for spec in filters or []
+        ]
+        self.sample_rate = sample_rate
+        self._threshold = int(sample_rate * 0x100000000)
+        self._sample_indexes = [columns.index(field) for field in sample_by] if sample_by else None
+
+    def _sampled(self, row: Row) -> bool:
+        values = row if self._sample_indexes is None else [row[i] for i in self._sample_indexes]
+        return zlib.crc32("\x1f".join(map(str, values)).encode('utf-8')) < self._threshold
+
+    def apply(self, rows: List[Row]) -> List[Row]:
+        if self._predicates:
+            predicates = self._predicates
+            rows = [row for row in rows if all(check(row) for check in predicates)]
+        if self.sample_rate < 1.0:
+            rows = [row for row in rows if self._sampled(row)]
+        return rows
+
+class WindowAggregator:
+    """按 (时间窗口, group_by 字段) 聚合, 产出写入汇总表的行
+
+    窗口按 time_field 的事件时间划分, 没有该字段时用到达时间。事件时间越过窗口末尾
+    lateness 秒后, 或窗口 idle_seconds 内没有新数据时, 窗口关闭并产出一行。
+    迟到的记录会为同一窗口再产出一行; count/sum/min/max 都可以在查询时再次合并。
+    尚未关闭的窗口只在内存中, 进程异常退出时丢失。
+    """
+
+    def __init__(self, columns: Sequence[str], table: str, window_seconds: float,
+                 group_by: List[str] = None, metrics: List[Dict[str, Any]] = None,
+                 time_field: Optional[str] = None, lateness: Optional[float] = None,
+                 idle_seconds: Optional[float] = None, keep_rows: bool = False):
+        self.table = table
+        self.window_seconds = window_seconds
+        self.lateness = window_seconds if lateness is None else lateness
+        self.idle_seconds = window_seconds if idle_seconds is None else idle_seconds
+        self.keep_rows = keep_rows
+        group_by = group_by or []
+        metrics = metrics or [{"op": "count"}]
+        self._group_indexes = [columns.index(field) for field in group_by]
+        self._time_index = columns.index(time_field) if time_field else None
+        # (操作, 列下标); count 不需要字段
+        self._metrics = [
+            (spec["op"], columns.index(spec["field"]) if spec["op"] != "count" else None)
+            for spec in metrics
+        ]
+        self.columns = ("window_start",) + tuple(group_by) + tuple(
+            spec.get("column") or (spec["op"] if spec["op"] == "count" else f"{spec['op']}_{spec['field']}")
+            for spec in metrics
+        )
+        # 汇总行的写入目标, 与日志表的路由条目用法一致
+        self.route = {"table": table, "columns": self.columns}
+        # (窗口起点, 分组值) -> [最后更新时间, 各指标的累计值]
+        self._windows: Dict[Tuple[float, Tuple[Any, ...]], list] = {}
+        self._watermark = float("-inf")
+        self._lock = threading.Lock()
+        self.rows_aggregated = 0
+        self.rollups_emitted = 0
+
+    def _event_time(self, row: Row, now: float) -> float:
+        if self._time_index is None:
+            return now
+        value = row[self._time_index]
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, (int, float)):
+            return float(value)
+        return now
+
+    def add(self, rows: List[Row]) -> None:
+        if not rows:
+            return
+        now = time.time()
+        tick = time.monotonic()
+        metrics = self._metrics
+        with self._lock:
+            windows = self._windows
+            latest = self._watermark
+            for row in rows:
+                event_time = self._event_time(row, now)
+                if event_time > latest:
+                    latest = event_time
+                start = event_time - event_time % self.window_seconds
+                key = (start, tuple(row[i] for i in self._group_indexes))
+                window = windows.get(key)
+                if window is None:
+                    window = windows[key] = [tick] + [0 if op in ('count', 'sum') else None for op, _ in metrics]
+                window[0] = tick
+                for position, (op, index) in enumerate(metrics, 1):
+                    if op == 'count':
+                        window[position] += 1
+                        continue
+                    value = row[index]
+                    if value is None:
+                        continue
+                    current = window[position]
+                    if op == 'sum':
+                        window[position] = current + value
+                    elif current is None or (value < current if op == 'min' else value > current):
+                        window[position] = value
+            self._watermark = latest
+            self.rows_aggregated += len(rows)
+
+    def drain(self, force: bool = False) -> List[Row]:
+        """取出已关闭的窗口; force 时取出全部, 用于停止前"""
+        tick = time.monotonic()
+        with self._lock:
+            closing = [
+                key for key, window in self._windows.items()
+                if force
+                or key[0] + self.window_seconds + self.lateness <= self._watermark
+                or tick - window[0] >= self.idle_seconds
+            ]
+            rows = []
+            for key in sorted(closing, key=lambda key: key[0]):
+                window = self._windows.pop(key)
+                rows.append((datetime.fromtimestamp(key[0]),) + key[1] + tuple(window[1:]))
+            self.rollups_emitted += len(rows)
+        return rows
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+def create_processing_stage(log_config: Dict[str, Any], columns: Sequence[str]) -> Tuple[Optional[RowFilter], Optional[WindowAggregator]]:
+    """按 log_config 的 processing 配置创建过滤器和聚合器, 未配置的部分为 None"""
+    processing = log_config.get("processing")
+    if not processing:
+        return None, None
+    row_filter = None
+    if processing.get("filters") or processing.get("sample_rate", 1.0) < 1.0:
+        row_filter = RowFilter(
+            columns,
+            filters=processing.get("filters"),
+            sample_rate=processing.get("sample_rate", 1.0),
+            sample_by=processing.get("sample_by")
+        )
+    aggregator = None
+    aggregate = processing.get("aggregate")
+    if aggregate:
+        aggregator = WindowAggregator(
+            columns,
+            table=aggregate["table"],
+            window_seconds=aggregate.get("window_seconds", 60),
+            group_by=aggregate.get("group_by"),
+            metrics=aggregate.get("metrics"),
+            time_field=aggregate.get("time_field"),
+            lateness=aggregate.get("lateness"),
+            idle_seconds=aggregate.get("idle_seconds"),
+            keep_rows=aggregate.get("keep_rows", False)
+        )
+        logger.info(f"Rolling up {log_config['table']} into {aggregator.table} every {aggregator.window_seconds}s")
+    return row_filter, aggregator
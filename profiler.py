@@ -0,0 +1,227 @@
+import cProfile
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class StageStats:
+    __slots__ = ('calls', 'sampled', 'wall', 'cpu', 'blocks', '_lock')
+
+    def __init__(self):
+        # calls 在包装函数里无锁累加, 多线程下可能略少, 只用于估算
+        self.calls = 0
+        self.sampled = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.blocks = 0
+        self._lock = threading.Lock()
+
+    def add(self, wall: float, cpu: float, blocks: int) -> None:
+        with self._lock:
+            self.sampled += 1
+            self.wall += wall
+            self.cpu += cpu
+            self.blocks += blocks
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            sampled, wall, cpu, blocks = self.sampled, self.wall, self.cpu, self.blocks
+        if not sampled:
+            return {"calls": self.calls, "sampled": 0}
+        return {
+            "calls": self.calls,
+            "sampled": sampled,
+            "wall_us_avg": round(wall / sampled * 1e6, 3),
+            "cpu_us_avg": round(cpu / sampled * 1e6, 3),
+            "alloc_blocks_avg": round(blocks / sampled, 2),
+            # 按采样均值推算全部调用的耗时
+            "wall_s_estimated": round(wall / sampled * self.calls, 6)
+        }
+
+class StageProfiler:
+    """可在运行时开关的分阶段采样分析
+
+    关闭时登记的方法保持原样, 不增加任何开销; 开启时把它们替换为计时包装,
+    每 sample_every 次调用测量一次墙钟时间、线程 CPU 时间和净分配的内存块数,
+    并按 dump_interval 周期把摘要(以及可选的 cProfile / tracemalloc 快照)写入 directory。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_every = 100
+        self.dump_interval = 60.0
+        self.directory = "profiles"
+        self.use_cprofile = False
+        self.use_tracemalloc = False
+        self._targets: List[Tuple[Any, str, str, str, Optional[int]]] = []
+        self._originals: List[Tuple[Any, str, Any]] = []
+        self._stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._cprofile: Optional[cProfile.Profile] = None
+        # cProfile 不是线程安全的, 采样调用在该锁内串行执行
+        self._cprofile_lock = threading.Lock()
+        self._local = threading.local()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        self.sample_every = config.get("sample_every", self.sample_every)
+        self.dump_interval = config.get("dump_interval", self.dump_interval)
+        self.directory = config.get("directory", self.directory)
+        self.use_cprofile = config.get("cprofile", self.use_cprofile)
+        self.use_tracemalloc = config.get("tracemalloc", self.use_tracemalloc)
+
+    def register(self, owner: Any, attr: str, stage: str, kind: str = "call",
+                 sample_every: Optional[int] = None) -> None:
+        """登记要分析的方法; kind 为 iter 时按生成器逐项计时, 调用稀疏的阶段可以指定 sample_every=1"""
+        target = (owner, attr, stage, kind, sample_every)
+        if target not in self._targets:
+            self._targets.append(target)
+
+    def install_signal_handler(self, signum: int = getattr(signal, "SIGUSR1", 0)) -> None:
+        # 只能在主线程调用; Windows 没有 SIGUSR1
+        if signum:
+            signal.signal(signum, lambda *_: self.toggle())
+
+    def toggle(self) -> None:
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def enable(self) -> None:
+        with self._lock:
+            if self.enabled:
+                return
+            self._stats = {}
+            if self.use_cprofile:
+                self._cprofile = cProfile.Profile()
+            if self.use_tracemalloc and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            for owner, attr, stage, kind, sample_every in self._targets:
+                original = owner.__dict__[attr]
+                stats = self._stats.setdefault(stage, StageStats())
+                every = sample_every or self.sample_every
+                wrap = self._wrap_iter if kind == "iter" else self._wrap_call
+                wrapper = wrap(original, stats, every)
+                self._originals.append((owner, attr, original))
+                setattr(owner, attr, wrapper)
+            self.enabled = True
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="profiler-dump", daemon=True)
+            self._thread.start()
+        logger.info(f"Profiling enabled, sampling 1/{self.sample_every} calls")
+
+    def disable(self) -> None:
+        with self._lock:
+            if not self.enabled:
+                return
+            for owner, attr, original in reversed(self._originals):
+                setattr(owner, attr, original)
+            self._originals = []
+            self.enabled = False
+            self._stop_event.set()
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.dump()
+        self._cprofile = None
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        logger.info("Profiling disabled")
+
+    def summary(self) -> Dict[str, Any]:
+        return {stage: stats.summary() for stage, stats in self._stats.items()}
+
+    def dump(self) -> Optional[str]:
+        """把当前摘要写入 directory, 返回摘要文件路径"""
+        if not self._stats:
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            prefix = os.path.join(self.directory, time.strftime("profile-%Y%m%d-%H%M%S"))
+            with open(prefix + "-summary.json", "w", encoding="utf-8") as f:
+                json.dump(self.summary(), f, indent=2)
+            if self._cprofile is not None:
+                with self._cprofile_lock:
+                    self._cprofile.dump_stats(prefix + ".prof")
+            if self.use_tracemalloc and tracemalloc.is_tracing():
+                top = tracemalloc.take_snapshot().statistics("lineno")[:50]
+                with open(prefix + "-tracemalloc.txt", "w", encoding="utf-8") as f:
+                    f.write("\n".join(str(stat) for stat in top) + "\n")
+            return prefix + "-summary.json"
+        except Exception as e:
+            logger.error(f"Error dumping profile: {str(e)}")
+            return None
+
+    def _wrap_call(self, func: Callable, stats: StageStats, every: int) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats.calls += 1
+            if stats.calls % every:
+                return func(*args, **kwargs)
+            return self._measure(stats, func, args, kwargs)
+        return wrapper
+
+    def _wrap_iter(self, func: Callable, stats: StageStats, every: int) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stats.calls += 1
+            if stats.calls % every:
+                return func(*args, **kwargs)
+            return self._measure_iter(stats, func(*args, **kwargs))
+        return wrapper
+
+    def _measure(self, stats: StageStats, func: Callable, args, kwargs) -> Any:
+        wall, cpu, blocks = time.perf_counter(), time.thread_time(), sys.getallocatedblocks()
+        try:
+            # 嵌套阶段不重复进入 cProfile
+            profile = self._cprofile
+            if profile is not None and not getattr(self._local, "profiling", False):
+                self._local.profiling = True
+                try:
+                    with self._cprofile_lock:
+                        return profile.runcall(func, *args, **kwargs)
+                finally:
+                    self._local.profiling = False
+            return func(*args, **kwargs)
+        finally:
+            stats.add(time.perf_counter() - wall, time.thread_time() - cpu,
+                      sys.getallocatedblocks() - blocks)
+
+    def _measure_iter(self, stats: StageStats, iterator: Iterator) -> Iterator:
+        # 只统计生成器自身产出每一项的时间, 不含调用方处理这些项的时间
+        wall = cpu = 0.0
+        blocks = 0
+        try:
+            while True:
+                started, cpu_started, blocks_started = time.perf_counter(), time.thread_time(), sys.getallocatedblocks()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    wall += time.perf_counter() - started
+                    cpu += time.thread_time() - cpu_started
+                    blocks += sys.getallocatedblocks() - blocks_started
+                yield item
+        finally:
+            iterator.close()
+            stats.add(wall, cpu, blocks)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.dump_interval):
+            path = self.dump()
+            if path:
+                logger.info(f"Profile summary written to {path}")
+
+PROFILER = StageProfiler()
@@ -0,0 +1,76 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Sequence, Tuple
+import logging
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+XXHASH_ALGORITHMS = {'xxh3_64', 'xxh3_128', 'xxh64'}
+HASH_ALGORITHMS = XXHASH_ALGORITHMS | {'blake2b', 'blake2s', 'md5', 'sha1', 'sha256'}
+
+class RecordHasher:
+    """为每条记录计算内容 + 位置哈希
+
+    输入为 文件 inode、行起始偏移和行内容: 同一文件重复读取得到相同的哈希,
+    内容相同但位置不同的行不会被误判为重复。xxhash 未安装时退回 blake2b。
+    """
+
+    def __init__(self, algorithm: str = 'blake2b'):
+        if algorithm in XXHASH_ALGORITHMS and xxhash is None:
+            logger.warning(f"xxhash is not installed, using blake2b instead of {algorithm}")
+            algorithm = 'blake2b'
+        self.algorithm = algorithm
+        if algorithm in XXHASH_ALGORITHMS:
+            self._digest = getattr(xxhash, f"{algorithm}_hexdigest")
+        elif algorithm == 'blake2b':
+            self._digest = lambda data: hashlib.blake2b(data, digest_size=16).hexdigest()
+        elif algorithm == 'blake2s':
+            self._digest = lambda data: hashlib.blake2s(data, digest_size=16).hexdigest()
+        else:
+            self._digest = lambda data: hashlib.new(algorithm, data).hexdigest()
+
+    def digest_lines(self, file_key: str, starts: Sequence[int], lines: Sequence[Any]) -> List[str]:
+        prefix = f"{file_key}:".encode()
+        return [
+            self._digest(prefix + b"%d:" % start + (line if isinstance(line, bytes) else line.encode('utf-8')))
+            for start, line in zip(starts, lines)
+        ]
+
+class DedupCache:
+    """有界 LRU: 丢弃最近已交给写库组件的记录
+
+    不用布隆过滤器: 它无法淘汰旧条目, 误判还会丢掉从未写入过的记录。
+    """
+
+    def __init__(self, max_entries: int = 1000000):
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def filter(self, rows: List[Tuple[Any, ...]], index: int = -1) -> List[Tuple[Any, ...]]:
+        """返回未见过的记录, 并把它们的哈希(第 index 列)记入缓存"""
+        fresh = []
+        with self._lock:
+            seen = self._seen
+            for row in rows:
+                digest = row[index]
+                if digest in seen:
+                    seen.move_to_end(digest)
+                    self.hits += 1
+                    continue
+                seen[digest] = None
+                fresh.append(row)
+            while len(seen) > self.max_entries:
+                seen.popitem(last=False)
+        return fresh
+
+    def __len__(self) -> int:
+        return len(self._seen)
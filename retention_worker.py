@@ -0,0 +1,179 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class RetentionWorker:
+    """后台清理过期日志
+
+    每张表按时间列选出过期行, 以主键顺序分块删除, 每块一个短事务, 块之间休眠 throttle 秒,
+    避免长时间持有锁。补录写入的旧日志主键较大, 同样会被选中。
+    开启 drop_partitions 时先整体删除完全过期的按天分区; 后端不支持分区时改为逐行删除。
+    """
+
+    def __init__(self, db_handler, tables: Dict[str, str], retention_days: int,
+                 interval_hours: float, batch_size: int = 5000, throttle: float = 0.1,
+                 primary_key: str = 'id', drop_partitions: bool = False,
+                 partition_format: str = 'p%Y%m%d'):
+        self.db_handler = db_handler
+        # 表名 -> 时间列
+        self.tables = tables
+        self.retention_days = retention_days
+        self.interval = interval_hours * 3600
+        self.batch_size = batch_size
+        self.throttle = throttle
+        self.primary_key = primary_key
+        self.drop_partitions = drop_partitions
+        self.partition_format = partition_format
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.rows_deleted = 0
+        self.last_run: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"runs": self.runs, "rows_deleted": self.rows_deleted, "last_run": self.last_run}
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        cutoff = (now or datetime.now()) - timedelta(days=self.retention_days)
+        started = time.monotonic()
+        tables = {}
+        for table, time_column in self.tables.items():
+            if self._stop_event.is_set():
+                break
+            table_started = time.monotonic()
+            try:
+                partitions = self._drop_partitions(table, cutoff) if self.drop_partitions else []
+            except NotImplementedError as e:
+                logger.warning(f"{str(e)}, deleting expired rows instead")
+                self.drop_partitions = False
+                partitions = []
+            except Exception as e:
+                logger.error(f"Error dropping partitions of {table}: {str(e)}")
+                partitions = []
+            try:
+                deleted = self._delete_expired(table, time_column, cutoff)
+            except Exception as e:
+                logger.error(f"Error cleaning up {table}: {str(e)}")
+                continue
+            tables[table] = {
+                "rows_deleted": deleted,
+                "partitions_dropped": partitions,
+                "duration": round(time.monotonic() - table_started, 3)
+            }
+            self.rows_deleted += deleted
+
+        self.runs += 1
+        self.last_run = {
+            "cutoff": cutoff.isoformat(),
+            "duration": round(time.monotonic() - started, 3),
+            "tables": tables
+        }
+        logger.info(f"Retention run finished: {self.last_run}")
+        return self.last_run
+
+    def _delete_expired(self, table: str, time_column: str, cutoff: datetime) -> int:
+        backend = self.db_handler.backend
+        p = backend.placeholder
+        pk = self.primary_key
+        deleted = 0
+
+        # 上一块最后一个主键, 下一块从其后开始, 已检查过的主键区间不再扫描
+        last = None
+        while not self._stop_event.is_set():
+            with self.db_handler.get_connection() as conn:
+                after = f" AND {pk} > {p}" if last is not None else ""
+                params = (cutoff, last) if last is not None else (cutoff,)
+                cursor = conn.cursor()
+                try:
+                    # 按时间列选出本块的过期行, 删除只扫描这一段主键索引
+                    cursor.execute(
+                        f"SELECT {pk} FROM {table} WHERE {time_column} < {p}{after} "
+                        f"ORDER BY {pk} LIMIT {int(self.batch_size)}",
+                        params
+                    )
+                    keys = [key for key, in cursor.fetchall()]
+                    if not keys:
+                        conn.commit()
+                        break
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE {pk} >= {p} AND {pk} <= {p} AND {time_column} < {p}",
+                        (keys[0], keys[-1], cutoff)
+                    )
+                    count = cursor.rowcount
+                finally:
+                    cursor.close()
+                conn.commit()
+
+            deleted += count
+            if len(keys) < self.batch_size:
+                break
+            last = keys[-1]
+            self._stop_event.wait(self.throttle)
+        return deleted
+
+    def _drop_partitions(self, table: str, cutoff: datetime) -> List[str]:
+        backend = self.db_handler.backend
+        pattern = self.partition_format.replace('{table}', table)
+        dropped = []
+        with self.db_handler.get_connection() as conn:
+            for name in backend.list_partitions(conn, table):
+                try:
+                    day = datetime.strptime(name, pattern)
+                except ValueError:
+                    continue
+                # 分区名表示其中数据所在的日期, 整天都早于保留边界才删除
+                if day + timedelta(days=1) <= cutoff:
+                    backend.drop_partition(conn, table, name)
+                    dropped.append(name)
+            conn.commit()
+        if dropped:
+            logger.info(f"Dropped {len(dropped)} expired partitions of {table}")
+        return dropped
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval)
+
+def create_retention_worker(config: Dict[str, Any], db_handler) -> Optional[RetentionWorker]:
+    """根据 database.cleanup 创建清理任务; 每张表使用其第一个 datetime 字段作为时间列"""
+    cleanup = config["database"].get("cleanup")
+    if not cleanup or not cleanup.get("enabled"):
+        return None
+
+    tables = {}
+    for log_config in config["log_files"]:
+        time_columns = [mapping["target_field"] for mapping in log_config["field_mappings"]
+                        if mapping.get("type") == "datetime"]
+        if not time_columns:
+            logger.warning(f"Table {log_config['table']} has no datetime field, skipping cleanup")
+            continue
+        tables.setdefault(log_config["table"], cleanup.get("time_column", time_columns[0]))
+
+    return RetentionWorker(
+        db_handler,
+        tables,
+        retention_days=cleanup["retention_days"],
+        interval_hours=cleanup["interval_hours"],
+        batch_size=cleanup.get("batch_size", 5000),
+        throttle=cleanup.get("throttle", 0.1),
+        primary_key=cleanup.get("primary_key", "id"),
+        drop_partitions=cleanup.get("drop_partitions", False),
+        partition_format=cleanup.get("partition_format", "p%Y%m%d")
+    )
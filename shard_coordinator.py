@@ -0,0 +1,337 @@
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+from database_handler import DatabaseHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+class HashRing:
+    """一致性哈希环: 每个节点放置 vnodes 个虚拟节点, 节点增减时只迁移相邻区间的文件"""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 64):
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+class ShardCoordinator:
+    """多实例分片: 按一致性哈希把 watch_directory 下的文件分配给存活节点
+
+    节点在 {prefix}_nodes 表中定期心跳, 心跳超过 lease_seconds 的节点视为失效。
+    文件所有权以租约保存在 {prefix}_leases 表, 偏移随租约一起写入; 节点失效后租约过期,
+    哈希环上接手的节点从租约中的偏移继续读取。文件以相对 watch_directory 的路径标识,
+    各节点的挂载点可以不同。过期判断使用各节点的本地时钟, lease_seconds 应远大于时钟偏差。
+    """
+
+    def __init__(self, db_handler, root: str, node_id: Optional[str] = None,
+                 lease_seconds: float = 30.0, heartbeat_interval: float = 10.0,
+                 vnodes: int = 64, table_prefix: str = "ingest", close_db_handler: bool = False):
+        self.db_handler = db_handler
+        # 租约表使用单独的数据库时由协调器负责关闭连接
+        self.close_db_handler = close_db_handler
+        self.root = root
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.vnodes = vnodes
+        self.nodes_table = f"{table_prefix}_nodes"
+        self.leases_table = f"{table_prefix}_leases"
+        self.ring = HashRing([self.node_id], vnodes)
+        # 租约键 -> 本地路径
+        self.held: Dict[str, str] = {}
+        self._held_lock = threading.Lock()
+        # 最近一次成功续约后租约的有效期, 数据库不可用时过期后停止读取
+        self._valid_until = 0.0
+        # 本节点失去分配的文件 / 失效节点留下、现归本节点的文件
+        self.on_lost: Callable[[List[str]], None] = lambda paths: None
+        self.on_orphaned: Callable[[List[str]], None] = lambda paths: None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def key(self, file_path: str) -> str:
+        return os.path.relpath(file_path, self.root).replace(os.sep, "/")
+
+    def setup(self) -> None:
+        with self.db_handler.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.nodes_table} ("
+                    "node_id VARCHAR(255) PRIMARY KEY, heartbeat_at DOUBLE PRECISION NOT NULL)"
+                )
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.leases_table} ("
+                    "path VARCHAR(512) PRIMARY KEY, owner VARCHAR(255) NOT NULL, "
+                    "expires_at DOUBLE PRECISION NOT NULL, file_offset BIGINT NOT NULL, "
+                    "file_key VARCHAR(64))"
+                )
+            finally:
+                cursor.close()
+            conn.commit()
+
+    def start(self) -> None:
+        self.setup()
+        self.heartbeat()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+            self._thread.start()
+
+    def close(self, offsets: Dict[str, int]) -> None:
+        """保存偏移并释放全部租约, 其他节点无需等待过期即可接手"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        p = self.db_handler.backend.placeholder
+        try:
+            self.save_offsets(offsets)
+            with self.db_handler.get_connection() as conn:
+                self._execute(conn, f"UPDATE {self.leases_table} SET owner = '', expires_at = 0 WHERE owner = {p}",
+                              (self.node_id,))
+                self._execute(conn, f"DELETE FROM {self.nodes_table} WHERE node_id = {p}", (self.node_id,))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error releasing shard leases: {str(e)}")
+        with self._held_lock:
+            self.held.clear()
+        if self.close_db_handler:
+            self.db_handler.close()
+
+    def owns(self, file_path: str) -> bool:
+        return self.ring.owner(self.key(file_path)) == self.node_id
+
+    def holds(self, file_path: str) -> bool:
+        return self.key(file_path) in self.held and time.time() < self._valid_until
+
+    def held_paths(self) -> List[str]:
+        with self._held_lock:
+            return list(self.held.values())
+
+    def acquire(self, file_path: str) -> Optional[Tuple[Optional[int], str]]:
+        """尝试取得文件租约
+
+        返回 (租约中的偏移, 上一个持有者); 租约被其他存活节点持有时返回 None。
+        新建的租约或文件已被替换(inode 不同)时偏移为 None, 由本地检查点决定。
+        """
+        if time.time() >= self._valid_until:
+            return None
+        key = self.key(file_path)
+        p = self.db_handler.backend.placeholder
+        now = time.time()
+        expires_at = now + self.lease_seconds
+        with self.db_handler.get_connection() as conn:
+            try:
+                row = self._fetch(conn, f"SELECT owner, expires_at, file_offset, file_key FROM {self.leases_table} "
+                                        f"WHERE path = {p}", (key,))
+                if row is None:
+                    self._execute(conn, f"INSERT INTO {self.leases_table} (path, owner, expires_at, file_offset) "
+                                        f"VALUES ({p}, {p}, {p}, 0)", (key, self.node_id, expires_at))
+                    previous, offset = "", None
+                else:
+                    previous, previous_expires, offset, file_key = row
+                    if previous not in ("", self.node_id) and previous_expires > now:
+                        conn.commit()
+                        return None
+                    # 比较并交换: 只有租约在读取后未被其他节点改动时才能取得
+                    changed = self._execute(
+                        conn,
+                        f"UPDATE {self.leases_table} SET owner = {p}, expires_at = {p} "
+                        f"WHERE path = {p} AND owner = {p} AND expires_at = {p}",
+                        (self.node_id, expires_at, key, previous, previous_expires)
+                    )
+                    if changed != 1:
+                        conn.rollback()
+                        return None
+                    if file_key is None or file_key != self._file_key(file_path):
+                        offset = None
+                conn.commit()
+            except Exception as e:
+                # 并发插入同一租约时主键冲突, 视为被其他节点取得
+                conn.rollback()
+                logger.debug(f"Lease for {key} not acquired: {str(e)}")
+                return None
+        with self._held_lock:
+            self.held[key] = file_path
+        if previous not in ("", self.node_id):
+            logger.info(f"Took over {key} from {previous} at offset {offset}")
+        return offset, previous
+
+    def save_offsets(self, offsets: Dict[str, int]) -> None:
+        """把已落盘的偏移写入持有的租约; 发现租约已被其他节点取得时不再持有"""
+        if not offsets:
+            return
+        p = self.db_handler.backend.placeholder
+        lost = []
+        with self.db_handler.get_connection() as conn:
+            for file_path, offset in offsets.items():
+                key = self.key(file_path)
+                changed = self._execute(
+                    conn,
+                    f"UPDATE {self.leases_table} SET file_offset = {p}, file_key = {p} "
+                    f"WHERE path = {p} AND owner = {p}",
+                    (offset, self._file_key(file_path), key, self.node_id)
+                )
+                if changed == 0:
+                    lost.append(key)
+            conn.commit()
+        if lost:
+            logger.warning(f"Leases lost to other nodes: {lost}")
+            with self._held_lock:
+                for key in lost:
+                    self.held.pop(key, None)
+
+    def release(self, file_path: str, offset: int) -> None:
+        key = self.key(file_path)
+        p = self.db_handler.backend.placeholder
+        with self.db_handler.get_connection() as conn:
+            self._execute(
+                conn,
+                f"UPDATE {self.leases_table} SET owner = '', expires_at = 0, file_offset = {p}, file_key = {p} "
+                f"WHERE path = {p} AND owner = {p}",
+                (offset, self._file_key(file_path), key, self.node_id)
+            )
+            conn.commit()
+        with self._held_lock:
+            self.held.pop(key, None)
+
+    def remove(self, file_path: str) -> None:
+        """文件已删除或改名, 删除本节点持有的租约"""
+        key = self.key(file_path)
+        with self._held_lock:
+            if self.held.pop(key, None) is None:
+                return
+        p = self.db_handler.backend.placeholder
+        try:
+            with self.db_handler.get_connection() as conn:
+                self._execute(conn, f"DELETE FROM {self.leases_table} WHERE path = {p} AND owner = {p}",
+                              (key, self.node_id))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error removing lease for {key}: {str(e)}")
+
+    def drop_expired(self, file_path: str) -> None:
+        """删除已过期且文件已不存在的租约"""
+        p = self.db_handler.backend.placeholder
+        with self.db_handler.get_connection() as conn:
+            self._execute(conn, f"DELETE FROM {self.leases_table} WHERE path = {p} AND expires_at < {p}",
+                          (self.key(file_path), time.time()))
+            conn.commit()
+
+    def heartbeat(self) -> None:
+        """心跳并续约, 然后按最新的存活节点重新分配文件"""
+        p = self.db_handler.backend.placeholder
+        now = time.time()
+        with self.db_handler.get_connection() as conn:
+            if not self._execute(conn, f"UPDATE {self.nodes_table} SET heartbeat_at = {p} WHERE node_id = {p}",
+                                 (now, self.node_id)):
+                self._execute(conn, f"INSERT INTO {self.nodes_table} (node_id, heartbeat_at) VALUES ({p}, {p})",
+                              (self.node_id, now))
+            self._execute(conn, f"UPDATE {self.leases_table} SET expires_at = {p} WHERE owner = {p}",
+                          (now + self.lease_seconds, self.node_id))
+            nodes = self._fetch_column(conn, f"SELECT node_id FROM {self.nodes_table} WHERE heartbeat_at >= {p}",
+                                       (now - self.lease_seconds,))
+            owned = set(self._fetch_column(conn, f"SELECT path FROM {self.leases_table} WHERE owner = {p}",
+                                           (self.node_id,)))
+            expired = self._fetch_column(
+                conn, f"SELECT path FROM {self.leases_table} WHERE owner <> {p} AND expires_at < {p}",
+                (self.node_id, now)
+            )
+            conn.commit()
+        self._valid_until = now + self.lease_seconds
+
+        ring = HashRing(nodes + [self.node_id], self.vnodes)
+        if ring.nodes != self.ring.nodes:
+            logger.info(f"Shard members changed: {ring.nodes}")
+        self.ring = ring
+        with self._held_lock:
+            for key in [key for key in self.held if key not in owned]:
+                logger.warning(f"Lease for {key} was taken by another node")
+                del self.held[key]
+            lost = [file_path for key, file_path in self.held.items() if ring.owner(key) != self.node_id]
+            # 以同一 node_id 重启后, 仍登记在本节点名下但未读取的租约同样需要接手
+            unread = [key for key in owned if key not in self.held]
+        orphaned = [os.path.join(self.root, *key.split("/"))
+                    for key in expired + unread if ring.owner(key) == self.node_id]
+        if lost:
+            self.on_lost(lost)
+        if orphaned:
+            self.on_orphaned(orphaned)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"node_id": self.node_id, "nodes": len(self.ring.nodes), "leases": len(self.held)}
+
+    @staticmethod
+    def _file_key(file_path: str) -> Optional[str]:
+        # 不同客户端挂载同一 NFS 时设备号不同, 只比较 inode
+        try:
+            return str(os.stat(file_path).st_ino)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _execute(conn, query: str, params) -> int:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _fetch(conn, query: str, params) -> Optional[Tuple[Any, ...]]:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _fetch_column(conn, query: str, params) -> List[Any]:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Shard heartbeat failed: {str(e)}")
+
+def create_shard_coordinator(config: Dict[str, Any], db_handler) -> Optional[ShardCoordinator]:
+    """sharding.enabled 时创建; 配置了 sharding.database 时租约表放在该数据库中"""
+    sharding = config.get("sharding", {})
+    if not sharding.get("enabled", False):
+        return None
+    separate = "database" in sharding
+    if separate:
+        db_handler = DatabaseHandler(sharding["database"])
+    return ShardCoordinator(
+        db_handler,
+        config["watch_directory"],
+        node_id=sharding.get("node_id"),
+        lease_seconds=sharding.get("lease_seconds", 30),
+        heartbeat_interval=sharding.get("heartbeat_interval", 10),
+        vnodes=sharding.get("vnodes", 64),
+        table_prefix=sharding.get("table_prefix", "ingest"),
+        close_db_handler=separate
+    )
@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_SEGMENT_NAME = re.compile(r"segment-(\d+)\.jsonl$")
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Unsupported value in spilled row: {type(value).__name__}")
+
+def _decode(obj: dict) -> Any:
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+class SpillBuffer:
+    """数据库不可用时的本地追加写缓冲
+
+    每个批次序列化为 JSONL 的一行, 按段文件顺序保存; 总大小超过 max_bytes 时拒绝写入,
+    避免磁盘无限增长。恢复后按段回放, 暂时性失败的批次留在段文件中等待下一次,
+    无法写入的批次移到 dead-letter.jsonl, 不阻塞后面的批次。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1073741824, segment_bytes: int = 8388608):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        # 回放与写入分开加锁, 回放期间新批次继续写入新的段文件
+        self._replay_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._segments = sorted(self._list_segments())
+        self._next_seq = (self._segments[-1] + 1) if self._segments else 0
+        self._current = None
+        self._current_seq = None
+        self._total_bytes = sum(os.path.getsize(self._segment_path(seq)) for seq in self._segments)
+        # 表 -> 缓冲中未回放的批次数, 只有这些表的新批次需要排在缓冲之后
+        self._pending: Dict[str, int] = {}
+        for seq in self._segments:
+            with open(self._segment_path(seq), "rb") as f:
+                for line in f:
+                    table = json.loads(line)["table"]
+                    self._pending[table] = self._pending.get(table, 0) + 1
+        if self._segments:
+            logger.info(f"Found {len(self._segments)} spill segments in {directory}")
+
+    def _list_segments(self) -> List[int]:
+        return [int(match.group(1)) for match in map(_SEGMENT_NAME.match, os.listdir(self.directory)) if match]
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:08d}.jsonl")
+
+    def pending(self, table: Optional[str] = None) -> bool:
+        """缓冲中是否还有未回放的批次; 指定 table 时只看该表"""
+        if table is None:
+            return bool(self._segments)
+        return table in self._pending
+
+    def dead_letter_path(self) -> str:
+        return os.path.join(self.directory, "dead-letter.jsonl")
+
+    def append(self, table: str, columns: Tuple[str, ...], rows: List[Tuple[Any, ...]]) -> bool:
+        line = json.dumps({"table": table, "columns": list(columns), "rows": rows},
+                          default=_encode, ensure_ascii=False) + "\n"
+        data = line.encode("utf-8")
+        with self._lock:
+            if self._total_bytes + len(data) > self.max_bytes:
+                logger.error(f"Spill buffer full, rejecting {len(rows)} rows for {table}")
+                return False
+            if self._current is None or self._current.tell() >= self.segment_bytes:
+                self._rotate()
+            self._current.write(data)
+            self._current.flush()
+            self._total_bytes += len(data)
+            self._pending[table] = self._pending.get(table, 0) + 1
+        return True
+
+    def dead_letter(self, table: str, columns: Tuple[str, ...], rows: List[Tuple[Any, ...]], error: str) -> None:
+        """保存无法写入的批次及原因, 供人工处理; 不计入 max_bytes"""
+        line = json.dumps({"table": table, "columns": list(columns), "rows": rows, "error": error},
+                          default=_encode, ensure_ascii=False) + "\n"
+        self._append_dead_letter(line.encode("utf-8"))
+
+    def _append_dead_letter(self, data: bytes) -> None:
+        with self._lock:
+            with open(self.dead_letter_path(), "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _replayed(self, table: str) -> None:
+        with self._lock:
+            count = self._pending.get(table, 0) - 1
+            if count > 0:
+                self._pending[table] = count
+            else:
+                self._pending.pop(table, None)
+
+    def _rotate(self) -> None:
+        if self._current is not None:
+            self._current.close()
+        self._current_seq = self._next_seq
+        self._next_seq += 1
+        self._current = open(self._segment_path(self._current_seq), "ab")
+        self._segments.append(self._current_seq)
+
+    def replay(self, write: Callable[[str, Tuple[str, ...], List[Tuple[Any, ...]]], Any],
+               is_transient: Optional[Callable[[Exception], bool]] = None) -> int:
+        """按写入顺序回放所有段, 返回成功回放的行数
+
+        暂时性失败时停止, 从失败的批次开始等待下一次; is_transient 判定为非暂时性的失败,
+        该批次移到死信文件后继续回放。
+        """
+        replayed = 0
+        with self._replay_lock:
+            with self._lock:
+                # 先封存当前段, 新写入进入新段
+                if self._current is not None:
+                    self._current.close()
+                    self._current = None
+                segments = list(self._segments)
+
+            for seq in segments:
+                path = self._segment_path(seq)
+                with open(path, "rb") as f:
+                    lines = f.readlines()
+                for index, line in enumerate(lines):
+                    batch = json.loads(line, object_hook=_decode)
+                    rows = [tuple(row) for row in batch["rows"]]
+                    try:
+                        write(batch["table"], tuple(batch["columns"]), rows)
+                    except Exception as e:
+                        if is_transient is None or is_transient(e):
+                            logger.warning(f"Spill replay paused: {str(e)}")
+                            self._keep(path, lines[:index], lines[index:])
+                            return replayed
+                        logger.error(f"Moving {len(rows)} spilled rows for {batch['table']} "
+                                     f"to {self.dead_letter_path()}: {str(e)}")
+                        batch["error"] = str(e)
+                        self._append_dead_letter(
+                            json.dumps(batch, default=_encode, ensure_ascii=False).encode("utf-8") + b"\n"
+                        )
+                    else:
+                        replayed += len(rows)
+                    self._replayed(batch["table"])
+                with self._lock:
+                    self._segments.remove(seq)
+                    self._total_bytes -= sum(len(line) for line in lines)
+                os.remove(path)
+        if replayed:
+            logger.info(f"Replayed {replayed} spilled rows")
+        return replayed
+
+    def _keep(self, path: str, done: List[bytes], remaining: List[bytes]) -> None:
+        """只保留尚未回放的批次, 原子替换段文件"""
+        if not done:
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.writelines(remaining)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes -= sum(len(line) for line in done)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._current is not None:
+                self._current.close()
+                self._current = None
@@ -0,0 +1,326 @@
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+import metrics
+from connection_pool import ConnectionPool
+
+try:
+    import mysql.connector
+except ImportError:
+    mysql = None
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+Row = Tuple[Any, ...]
+
+@lru_cache(maxsize=256)
+def build_insert_query(table: str, columns: Tuple[str, ...], placeholder: str = '%s',
+                       verb: str = 'INSERT', suffix: str = '') -> str:
+    # 每个 (表, 列集合) 只拼接一次 SQL
+    placeholders = ', '.join([placeholder] * len(columns))
+    return f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders}){suffix}"
+
+class StorageBackend:
+    """存储后端接口: 提供连接以及该数据库最快的批量写入方式"""
+
+    placeholder = '%s'
+    # 连接断开、超时等可以通过重试恢复的错误
+    transient_errors: Tuple[type, ...] = (ConnectionError, TimeoutError)
+    # ignore_duplicates 时违反唯一键的行被跳过, 各数据库的写法不同
+    ignore_verb = 'INSERT'
+    ignore_suffix = ''
+    # 使用 ConnectionPool 的后端在构造时设置
+    pool: Optional[ConnectionPool] = None
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.ignore_duplicates = config.get('ignore_duplicates', False)
+
+    def is_transient(self, error: Exception) -> bool:
+        return isinstance(error, self.transient_errors)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        started = time.perf_counter()
+        conn = self._acquire()
+        metrics.POOL_WAIT.observe(time.perf_counter() - started)
+        broken = False
+        try:
+            yield conn
+        except Exception as e:
+            # 连接类错误说明连接可能已断开, 归还时丢弃而不是放回连接池
+            broken = self.is_transient(e)
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._release(conn, broken)
+
+    def insert_query(self, table: str, columns: Tuple[str, ...]) -> str:
+        if self.ignore_duplicates:
+            return build_insert_query(table, columns, self.placeholder, self.ignore_verb, self.ignore_suffix)
+        return build_insert_query(table, columns, self.placeholder)
+
+    def bulk_insert(self, conn, table: str, columns: Tuple[str, ...], rows: Sequence[Row]) -> None:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(self.insert_query(table, columns), rows)
+        finally:
+            cursor.close()
+
+    def list_partitions(self, conn, table: str) -> List[str]:
+        raise NotImplementedError(f"{type(self).__name__} does not support partitions")
+
+    def drop_partition(self, conn, table: str, name: str) -> None:
+        raise NotImplementedError(f"{type(self).__name__} does not support partitions")
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self.pool.stats() if self.pool is not None else {}
+
+    def prune(self) -> int:
+        """关闭空闲过久或超过寿命的连接"""
+        if self.pool is None:
+            return 0
+        return self.pool.prune(self.config.get('pool', {}).get('max_idle', 300.0))
+
+    def _acquire(self):
+        raise NotImplementedError
+
+    def _release(self, conn, discard: bool = False) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+class MySQLBackend(StorageBackend):
+    """MySQL: executemany 改写为多 VALUES 插入, 大批量时可选 LOAD DATA LOCAL INFILE"""
+
+    ignore_verb = 'INSERT IGNORE'
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        if mysql is None:
+            raise RuntimeError("database.type is mysql but mysql-connector-python is not installed")
+        self.load_data_threshold = config.get('load_data_threshold', 0)
+        self.transient_errors = StorageBackend.transient_errors + (
+            mysql.connector.errors.OperationalError,
+            mysql.connector.errors.InterfaceError
+        )
+        db_config = {
+            'host': config['host'],
+            'port': config['port'],
+            'user': config['user'],
+            'password': config['password'],
+            'database': config['database']
+        }
+        if self.load_data_threshold:
+            db_config['allow_local_infile'] = True
+        self.pool = ConnectionPool.from_config(
+            config,
+            lambda: mysql.connector.connect(**db_config),
+            ping=lambda conn: conn.ping(reconnect=False)
+        )
+
+    def _acquire(self):
+        return self.pool.checkout()
+
+    def _release(self, conn, discard: bool = False) -> None:
+        self.pool.release(conn, discard)
+
+    def bulk_insert(self, conn, table, columns, rows) -> None:
+        if self.load_data_threshold and len(rows) >= self.load_data_threshold:
+            self._load_data(conn, table, columns, rows)
+        else:
+            super().bulk_insert(conn, table, columns, rows)
+
+    @staticmethod
+    def _tsv_value(value: Any) -> str:
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        text = value.isoformat(sep=' ') if isinstance(value, datetime) else str(value)
+        return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+    def _load_data(self, conn, table, columns, rows) -> None:
+        fd, tmp_path = tempfile.mkstemp(prefix='watchdog-load-', suffix='.tsv')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='\n') as f:
+                for row in rows:
+                    f.write('\t'.join(self._tsv_value(value) for value in row))
+                    f.write('\n')
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s {'IGNORE ' if self.ignore_duplicates else ''}"
+                    f"INTO TABLE {table} CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(columns)})",
+                    (tmp_path,)
+                )
+            finally:
+                cursor.close()
+        finally:
+            os.remove(tmp_path)
+
+    def list_partitions(self, conn, table: str) -> List[str]:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+                (table,)
+            )
+            return [name for name, in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def drop_partition(self, conn, table: str, name: str) -> None:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+        finally:
+            cursor.close()
+
+    def close(self) -> None:
+        self.pool.close()
+
+class PostgreSQLBackend(StorageBackend):
+    """PostgreSQL: 批量写入使用 COPY ... FROM STDIN"""
+
+    ignore_suffix = ' ON CONFLICT DO NOTHING'
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        if psycopg2 is None:
+            raise RuntimeError("database.type is postgresql but psycopg2 is not installed")
+        self.transient_errors = StorageBackend.transient_errors + (
+            psycopg2.OperationalError,
+            psycopg2.InterfaceError
+        )
+        self.pool = ConnectionPool.from_config(
+            config,
+            lambda: psycopg2.connect(
+                host=config['host'],
+                port=config['port'],
+                user=config['user'],
+                password=config['password'],
+                dbname=config['database']
+            ),
+            ping=self._ping
+        )
+
+    @staticmethod
+    def _ping(conn) -> None:
+        if conn.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+
+    def _acquire(self):
+        return self.pool.checkout()
+
+    def _release(self, conn, discard: bool = False) -> None:
+        self.pool.release(conn, discard)
+
+    def bulk_insert(self, conn, table, columns, rows) -> None:
+        buffer = io.StringIO()
+        # 字符串全部加引号, 未加引号的空字段才会被 COPY 当作 NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        for row in rows:
+            writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+        buffer.seek(0)
+        column_list = ', '.join(columns)
+        with conn.cursor() as cursor:
+            if not self.ignore_duplicates:
+                cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+                return
+            # COPY 不能跳过冲突行: 先载入会话级临时表, 再 INSERT ... SELECT ... ON CONFLICT DO NOTHING
+            stage = f"_stage_{table.replace('.', '_')}"
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS)")
+            cursor.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage}{self.ignore_suffix}"
+            )
+            cursor.execute(f"TRUNCATE {stage}")
+
+    def list_partitions(self, conn, table: str) -> List[str]:
+        # 声明式分区的子表
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = %s",
+                (table,)
+            )
+            return [name for name, in cursor.fetchall()]
+
+    def drop_partition(self, conn, table: str, name: str) -> None:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {name}")
+
+    def close(self) -> None:
+        self.pool.close()
+
+class SQLiteBackend(StorageBackend):
+    """SQLite: WAL 模式, 单个写连接, 每批在一个事务内 executemany"""
+
+    placeholder = '?'
+    ignore_verb = 'INSERT OR IGNORE'
+    # 表不存在等语句错误同样是 OperationalError, 只有数据库被锁或忙时才值得重试
+    transient_messages = ('database is locked', 'database table is locked', 'database is busy')
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.conn = sqlite3.connect(config['path'], check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # SQLite 同一时刻只允许一个写事务, 写入在进程内串行化
+        self._lock = threading.Lock()
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, sqlite3.OperationalError):
+            return any(message in str(error) for message in self.transient_messages)
+        return super().is_transient(error)
+
+    def _acquire(self):
+        self._lock.acquire()
+        return self.conn
+
+    def _release(self, conn, discard: bool = False) -> None:
+        self._lock.release()
+
+    def close(self) -> None:
+        self.conn.close()
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'postgresql': PostgreSQLBackend,
+    'postgres': PostgreSQLBackend,
+    'sqlite': SQLiteBackend
+}
+
+def create_backend(config: Dict[str, Any]) -> StorageBackend:
+    db_type = config.get('type', 'mysql')
+    if db_type not in BACKENDS:
+        raise ValueError(f"Unsupported database type: {db_type}")
+    return BACKENDS[db_type](config)
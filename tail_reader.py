@@ -0,0 +1,180 @@
+import bz2
+import gzip
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple, Union
+import logging
+import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 按文件头魔数识别压缩格式, 不依赖扩展名
+COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\x28\xb5\x2f\xfd', 'zstd'))
+# logrotate 压缩归档的扩展名, 用于找到被压缩的前身文件
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.zst')
+
+def _compression_of(head: bytes) -> Optional[str]:
+    for magic, name in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+def detect_compression(file_path: str) -> Optional[str]:
+    try:
+        with open(file_path, 'rb') as f:
+            return _compression_of(f.read(4))
+    except OSError:
+        return None
+
+class TailReader:
+    """按固定大小的二进制块读取文件增量, 逐行产出 (行内容, 行尾之后的字节偏移)
+
+    末尾没有换行符的半行不会产出, 调用方保存的偏移停在该行起点,
+    下一次事件会从那里重新读取, 因此内存占用只和块大小、单行长度有关。
+    gzip / bz2 / zstd 压缩的文件按块流式解压, 偏移为解压后的位置;
+    定位到偏移时边解压边丢弃, 不会把整个归档读入内存。
+    """
+
+    def __init__(self, chunk_size: int = 65536, max_line_bytes: int = 1048576,
+                 encoding: str = 'utf-8', max_open_files: int = 0):
+        self.chunk_size = chunk_size
+        self.max_line_bytes = max_line_bytes
+        self.encoding = encoding
+        # 频繁写入的文件保持打开, 按最近使用顺序淘汰
+        self.max_open_files = max_open_files
+        self._open_files: "OrderedDict[str, Tuple[object, float]]" = OrderedDict()
+        self._files_lock = threading.Lock()
+        self.opens = 0
+        self.reads = 0
+
+    def read_lines(self, file_path: str, start: int, end: Optional[int] = None,
+                   raw: bool = False) -> Iterator[Tuple[Union[str, bytes], int]]:
+        """raw 为 True 时直接产出字节行, 由解析器决定是否需要解码"""
+        f = self._checkout(file_path)
+        if f is None:
+            return
+        try:
+            f.seek(start)
+            yield from self._read_from(f, start, end, raw)
+        except EOFError:
+            # 压缩归档仍在写入, 数据不完整; 偏移停在最后一个完整行, 下一次事件继续
+            logger.debug(f"Compressed stream of {file_path} is incomplete, waiting for more data")
+            f.close()
+            return
+        except BaseException:
+            f.close()
+            raise
+        self._checkin(file_path, f)
+
+    def _checkout(self, file_path: str):
+        """取出缓存的文件句柄; 路径已指向其它 inode(轮转)或已删除时重新打开"""
+        with self._files_lock:
+            cached = self._open_files.pop(file_path, None)
+        if cached is not None:
+            f = cached[0]
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(file_path).st_ino:
+                    return f
+            except OSError:
+                pass
+            f.close()
+        self.opens += 1
+        f = open(file_path, 'rb')
+        compression = _compression_of(f.read(4))
+        if compression is None:
+            return f
+        f.close()
+        if compression == 'gzip':
+            return gzip.open(file_path, 'rb')
+        if compression == 'bz2':
+            return bz2.open(file_path, 'rb')
+        if zstandard is None:
+            logger.warning(f"Skipping {file_path}: zstd compressed but zstandard is not installed")
+            return None
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), read_across_frames=True)
+
+    def _checkin(self, file_path: str, f) -> None:
+        # 解压流只能从头向后定位, 不缓存; 归档不会再增长, 通常只读取一次
+        if self.max_open_files <= 0 or not isinstance(f, io.BufferedReader):
+            f.close()
+            return
+        evicted = []
+        with self._files_lock:
+            previous = self._open_files.pop(file_path, None)
+            if previous is not None:
+                evicted.append(previous[0])
+            self._open_files[file_path] = (f, time.monotonic())
+            while len(self._open_files) > self.max_open_files:
+                evicted.append(self._open_files.popitem(last=False)[1][0])
+        for handle in evicted:
+            handle.close()
+
+    def close_file(self, file_path: str) -> None:
+        with self._files_lock:
+            cached = self._open_files.pop(file_path, None)
+        if cached is not None:
+            cached[0].close()
+
+    def evict_idle(self, max_idle: float) -> None:
+        """关闭超过 max_idle 秒未读取的句柄, 避免已删除的文件一直占用磁盘"""
+        now = time.monotonic()
+        with self._files_lock:
+            idle = [path for path, (_, last_used) in self._open_files.items() if now - last_used >= max_idle]
+            handles = [self._open_files.pop(path)[0] for path in idle]
+        for handle in handles:
+            handle.close()
+
+    def close(self) -> None:
+        with self._files_lock:
+            handles = [handle for handle, _ in self._open_files.values()]
+            self._open_files.clear()
+        for handle in handles:
+            handle.close()
+
+    def _read_from(self, f, start: int, end: Optional[int],
+                   raw: bool = False) -> Iterator[Tuple[Union[str, bytes], int]]:
+        decode = self._strip_cr if raw else self._decode
+        position = start
+        pending = b''
+        remaining = None if end is None else end - start
+
+        while remaining is None or remaining > 0:
+            size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+            chunk = f.read(size)
+            self.reads += 1
+            if not chunk:
+                break
+            metrics.BYTES_READ.inc(len(chunk))
+            if remaining is not None:
+                remaining -= len(chunk)
+
+            lines = (pending + chunk if pending else chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                position += len(line) + 1
+                yield decode(line), position
+
+            # 超长且迟迟没有换行的内容按一行强制产出, 避免缓冲无限增长
+            if len(pending) > self.max_line_bytes:
+                logger.warning(f"Line longer than {self.max_line_bytes} bytes at offset {position}")
+                position += len(pending)
+                yield decode(pending), position
+                pending = b''
+
+    @staticmethod
+    def _strip_cr(raw: bytes) -> bytes:
+        return raw[:-1] if raw.endswith(b'\r') else raw
+
+    def _decode(self, raw: bytes) -> str:
+        if raw.endswith(b'\r'):
+            raw = raw[:-1]
+        return raw.decode(self.encoding, errors='replace')
@@ -0,0 +1,116 @@
+import os
+import sys
+import asyncio
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_ingest import AsyncDatabasePool, AsyncIngestEngine
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FakeAsyncPool(AsyncDatabasePool):
+    def __init__(self):
+        self.rows = []
+        self.max_concurrent = 0
+        self._concurrent = 0
+
+    async def insert_rows(self, table, columns, rows):
+        self._concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self._concurrent)
+        await asyncio.sleep(0.01)
+        self.rows.extend((table, row) for row in rows)
+        self._concurrent -= 1
+        return len(rows)
+
+def _config(tmp_dir):
+    return {
+        "database": {"batch_size": 50, "flush_interval": 0.1},
+        "watch_directory": tmp_dir,
+        "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+        "log_files": [{
+            "file_pattern": r"app\d*\.log$",
+            "table": "app_logs",
+            "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+        }]
+    }
+
+def test_engine_ingests_many_files_concurrently():
+    async def scenario(tmp_dir):
+        pool = FakeAsyncPool()
+        handler = LogFileHandler(_config(tmp_dir), db_handler=pool)
+        engine = AsyncIngestEngine(handler, pool, batch_size=50, flush_interval=0.1,
+                                   max_inflight=4, read_bytes=256)
+        engine.start()
+
+        paths = []
+        for index in range(10):
+            path = os.path.join(tmp_dir, f"app{index}.log")
+            with open(path, "w") as f:
+                f.writelines(f"seq={index * 1000 + i}\n" for i in range(100))
+            paths.append(path)
+            engine.notify(path)
+            engine.notify(path)
+        await engine.drain()
+
+        with open(paths[0], "a") as f:
+            f.write("seq=999999\n")
+        engine.notify(paths[0])
+        await engine.close()
+
+        assert len(pool.rows) == 1001
+        assert sorted(row[0] for _, row in pool.rows)[-1] == 999999
+        assert 1 < pool.max_concurrent <= 4
+        assert handler.checkpoints.resolve(paths[0]) == os.path.getsize(paths[0])
+        logger.info(f"Max concurrent inserts: {pool.max_concurrent}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(scenario(tmp_dir))
+
+class FailingAsyncPool(FakeAsyncPool):
+    def __init__(self):
+        super().__init__()
+        self.failing = True
+
+    async def insert_rows(self, table, columns, rows):
+        if self.failing:
+            raise ConnectionError("database went away")
+        return await super().insert_rows(table, columns, rows)
+
+def test_checkpoint_follows_written_rows():
+    async def scenario(tmp_dir):
+        pool = FailingAsyncPool()
+        handler = LogFileHandler(_config(tmp_dir), db_handler=pool)
+        engine = AsyncIngestEngine(handler, pool, batch_size=50, flush_interval=60, read_bytes=256)
+        engine.start()
+
+        path = os.path.join(tmp_dir, "app.log")
+        with open(path, "w") as f:
+            f.writelines(f"seq={i}\n" for i in range(10))
+        engine.notify(path)
+        await engine._queue.join()
+        # 行还在缓冲里, 检查点不能领先
+        assert handler.checkpoints.offset(path) == 0
+        await engine.settle()
+        # 写入失败的批次不推进检查点
+        assert handler.checkpoints.offset(path) == 0
+        assert not engine._path_locks
+
+        # 模拟重新启动: 清除读取位置和失败状态, 从检查点重读
+        pool.failing = False
+        handler.forget(path, keep_checkpoint=True)
+        handler.offsets.forget(path)
+        engine.notify(path)
+        await engine.close()
+        assert len(pool.rows) == 10
+        assert handler.checkpoints.offset(path) == os.path.getsize(path)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(scenario(tmp_dir))
+
+if __name__ == "__main__":
+    test_engine_ingests_many_files_concurrently()
+    test_checkpoint_follows_written_rows()
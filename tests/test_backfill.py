@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+import threading
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backfill import Backfill
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class RecordingDatabaseHandler:
+    def __init__(self):
+        self.rows = []
+        self.batches = 0
+        self.lock = threading.Lock()
+
+    def write_batch(self, table, columns, rows):
+        with self.lock:
+            self.batches += 1
+            self.rows.extend(dict(zip(columns, row)) for row in rows)
+        return len(rows)
+
+    def close(self):
+        pass
+
+def _config(tmp_dir):
+    return {
+        "database": {"batch_size": 1000, "flush_interval": 0.1},
+        "watch_directory": tmp_dir,
+        "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+        "log_files": [{
+            "file_pattern": r"app\d*\.log$",
+            "table": "app_logs",
+            "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+        }]
+    }
+
+def test_backfill_imports_existing_files():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = RecordingDatabaseHandler()
+        handler = LogFileHandler(_config(tmp_dir), db_handler=db)
+        handler.chunk_lines = 100
+        paths = []
+        for index in range(3):
+            path = os.path.join(tmp_dir, f"app{index}.log")
+            with open(path, "w") as f:
+                f.writelines(f"seq={index * 10000 + i}\n" for i in range(2500))
+            paths.append(path)
+        with open(os.path.join(tmp_dir, "other.txt"), "w") as f:
+            f.write("seq=1\n")
+
+        backfill = Backfill(handler, workers=2, batch_size=1000, read_size=4096)
+        assert backfill.scan() == paths
+        stats = backfill.run()
+
+        assert stats["files"] == 3
+        assert stats["rows"] == 7500
+        assert sorted(row["seq"] for row in db.rows) == sorted(
+            index * 10000 + i for index in range(3) for i in range(2500)
+        )
+        # 每个文件按 batch_size 分批写入, 而不是逐块写入
+        assert db.batches <= 9
+        for path in paths:
+            assert handler.checkpoints.resolve(path) == os.path.getsize(path)
+
+        # 再次补录不会重复写入
+        assert backfill.backfill_file(paths[0]) == (0, 0)
+        assert len(db.rows) == 7500
+        handler.chunk_parser.close()
+
+def test_live_event_is_deferred_while_backfilling():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        handler = LogFileHandler(_config(tmp_dir), db_handler=RecordingDatabaseHandler())
+        path = os.path.join(tmp_dir, "app.log")
+        with open(path, "w") as f:
+            f.write("seq=1\n")
+
+        submitted = []
+        handler._submit = submitted.append
+        handler.lock_path(path)
+        handler._process_path(path)
+        assert handler.checkpoints.offset(path) == 0
+        handler.unlock_path(path)
+        assert submitted == [path]
+
+        # 未被占用时实时事件直接处理
+        assert handler.try_lock_path(path)
+        handler.unlock_path(path)
+        assert submitted == [path]
+        handler.chunk_parser.close()
+
+if __name__ == "__main__":
+    test_backfill_imports_existing_files()
+    test_live_event_is_deferred_while_backfilling()
+    logger.info("All backfill tests passed")
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_writer import BatchSizer, BatchWriter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FakeDatabaseHandler:
+    def __init__(self):
+        self.batches = []
+
+    def write_batch(self, table, columns, rows):
+        self.batches.append((table, [dict(zip(columns, row)) for row in rows]))
+        return len(rows)
+
+def test_flush_on_batch_size():
+    db = FakeDatabaseHandler()
+    writer = BatchWriter(db, batch_size=3, flush_interval=60)
+
+    for i in range(7):
+        writer.add("app_logs", ("content",), (f"line {i}",))
+
+    assert [len(rows) for _, rows in db.batches] == [3, 3]
+    assert writer.pending() == 1
+
+    writer.close()
+    assert [len(rows) for _, rows in db.batches] == [3, 3, 1]
+    assert [row["content"] for _, rows in db.batches for row in rows] == [f"line {i}" for i in range(7)]
+
+def test_flush_on_max_age():
+    db = FakeDatabaseHandler()
+    writer = BatchWriter(db, batch_size=1000, flush_interval=0.1)
+    writer.start()
+    try:
+        writer.add("app_logs", ("content",), ("a",))
+        writer.add("error_logs", ("content",), ("b",))
+        deadline = time.monotonic() + 2
+        while len(db.batches) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        writer.close()
+
+    assert sorted(table for table, _ in db.batches) == ["app_logs", "error_logs"]
+    logger.info(f"Flushed batches: {db.batches}")
+
+def test_flush_splits_to_current_batch_size():
+    db = FakeDatabaseHandler()
+    sizer = BatchSizer(initial=400, min_size=100, max_size=100, target_latency=0.5)
+    for _ in range(2):
+        sizer.observe("app_logs", 400, 2.0)
+    assert sizer.size("app_logs") == 100
+    writer = BatchWriter(db, batch_size=400, flush_interval=60, sizer=sizer)
+
+    # 一次加入的行数超过收缩后的批量时按批量分批写入
+    writer.add_many("app_logs", ("content",), [(f"line {i}",) for i in range(250)])
+    assert [len(rows) for _, rows in db.batches] == [100, 100, 50]
+    writer.close()
+
+def test_batch_size_follows_commit_latency():
+    sizer = BatchSizer(initial=1000, min_size=100, max_size=1500, target_latency=0.5)
+    sizer.observe("app_logs", 1000, 0.1)
+    assert sizer.size("app_logs") == 1250
+    # 不满的批次不会让批量继续增大
+    sizer.observe("app_logs", 10, 0.01)
+    assert sizer.size("app_logs") == 1250
+    sizer.observe("app_logs", 1250, 0.1)
+    assert sizer.size("app_logs") == 1500
+    for _ in range(5):
+        sizer.observe("app_logs", 1500, 2.0)
+    assert sizer.size("app_logs") == 100
+    assert sizer.size("error_logs") == 1000
+
+if __name__ == "__main__":
+    test_flush_on_batch_size()
+    test_flush_on_max_age()
+    test_flush_splits_to_current_batch_size()
+    test_batch_size_follows_commit_latency()
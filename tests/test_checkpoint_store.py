@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoint_store import CheckpointStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _write(path, content, mode="ab"):
+    with open(path, mode) as f:
+        f.write(content)
+
+def test_offsets_survive_restart():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_path = os.path.join(tmp_dir, "checkpoints.json")
+        log_file = os.path.join(tmp_dir, "app.log")
+        _write(log_file, b"a" * 2000 + b"\n")
+
+        store = CheckpointStore(store_path, fingerprint_bytes=64)
+        assert store.resolve(log_file) == 0
+        store.update(log_file, 2001)
+        store.flush()
+
+        restarted = CheckpointStore(store_path, fingerprint_bytes=64)
+        assert restarted.resolve(log_file) == 2001
+
+def test_truncation_and_rotation_reset_offset():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_path = os.path.join(tmp_dir, "checkpoints.json")
+        log_file = os.path.join(tmp_dir, "app.log")
+        _write(log_file, b"line one\nline two\n")
+
+        store = CheckpointStore(store_path)
+        store.resolve(log_file)
+        store.update(log_file, 18)
+
+        # 截断
+        _write(log_file, b"new\n", mode="wb")
+        assert store.resolve(log_file) == 0
+        store.update(log_file, 4)
+
+        # 轮转: 原文件改名, 同路径创建新文件
+        os.rename(log_file, log_file + ".1")
+        _write(log_file, b"fresh line\n")
+        assert store.resolve(log_file) == 0
+        logger.info(f"Tracked paths: {store.paths()}")
+
+def test_reused_inode_with_other_content_is_detected():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_path = os.path.join(tmp_dir, "checkpoints.json")
+        log_file = os.path.join(tmp_dir, "app.log")
+        _write(log_file, b"x" * 100 + b"\n")
+
+        store = CheckpointStore(store_path, fingerprint_bytes=32)
+        store.resolve(log_file)
+        store.update(log_file, 101)
+        store.flush()
+
+        _write(log_file, b"y" * 200 + b"\n", mode="r+b")
+        restarted = CheckpointStore(store_path, fingerprint_bytes=32)
+        assert restarted.resolve(log_file) == 0
+
+if __name__ == "__main__":
+    test_offsets_survive_restart()
+    test_truncation_and_rotation_reset_offset()
+    test_reused_inode_with_other_content_is_detected()
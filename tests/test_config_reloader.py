@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_reloader import ConfigReloader
+from watchdog_to_db import LogFileHandler, apply_reload, load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _config(tmp_dir, mappings):
+    return {
+        "database": {"type": "sqlite", "path": os.path.join(tmp_dir, "logs.db")},
+        "watch_directory": tmp_dir,
+        "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+        "metrics": {"enabled": False},
+        "coalesce": {"enabled": False},
+        "log_files": [{
+            "file_pattern": r"app\.log$",
+            "table": "app_logs",
+            "field_mappings": [
+                {"source_field": field, "target_field": field, "type": "string"} for field in mappings
+            ]
+        }]
+    }
+
+def _write_config(path, config):
+    with open(path + ".tmp", "w") as f:
+        json.dump(config, f)
+    # 和编辑器一样先写临时文件再改名替换
+    os.replace(path + ".tmp", path)
+
+class FakeObserver:
+    def __init__(self):
+        self.calls = []
+
+    def schedule(self, handler, path, recursive=False):
+        self.calls.append(("schedule", path, recursive))
+        return (path, recursive)
+
+    def unschedule(self, watch):
+        self.calls.append(("unschedule",) + watch)
+
+def test_invalid_config_is_ignored():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = os.path.join(tmp_dir, "config.json")
+        config = _config(tmp_dir, ["level"])
+        _write_config(config_path, config)
+        reloader = ConfigReloader(config_path, config)
+        assert reloader.poll() is None
+
+        broken = dict(config, log_files=[{"file_pattern": "(", "table": "t", "field_mappings": []}])
+        _write_config(config_path, broken)
+        assert reloader.poll() is None
+        assert reloader.failures == 1
+
+        # 类型不对的字段名同样被拒绝, 而不是在校验时抛出 TypeError
+        log_file = dict(config["log_files"][0], processing={"filters": [{"field": ["level"], "op": "eq", "value": "x"}]})
+        _write_config(config_path, dict(config, log_files=[log_file]))
+        assert reloader.poll() is None
+        assert reloader.failures == 2
+
+        # 检查配置时出现意外异常, 保留当前的观察者登记继续运行
+        class BrokenReloader:
+            def poll(self):
+                raise TypeError("unhashable type: 'list'")
+        assert apply_reload(BrokenReloader(), None, None, "watch", None) == "watch"
+
+        changed = dict(config, parsing={"chunk_lines": 10})
+        _write_config(config_path, changed)
+        assert reloader.poll() == (changed, {"parsing"})
+
+def test_startup_config_is_validated():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = os.path.join(tmp_dir, "config.json")
+        config = _config(tmp_dir, ["level"])
+        _write_config(config_path, config)
+        assert load_config(config_path) == config
+
+        # 热加载时会被拒绝的配置, 启动时同样拒绝
+        log_file = dict(config["log_files"][0], processing={"filters": [{"field": ["level"]}]})
+        _write_config(config_path, dict(config, log_files=[log_file]))
+        assert load_config(config_path) is None
+
+def test_reload_keeps_offsets_and_in_flight_reads():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(os.path.join(tmp_dir, "logs.db"))
+        conn.execute("CREATE TABLE app_logs (level TEXT, user TEXT)")
+        conn.commit()
+        config_path = os.path.join(tmp_dir, "config.json")
+        config = _config(tmp_dir, ["level"])
+        _write_config(config_path, config)
+        handler = LogFileHandler(config)
+        reloader = ConfigReloader(config_path, config)
+        observer = FakeObserver()
+        watch = (tmp_dir, False)
+
+        log_path = os.path.join(tmp_dir, "app.log")
+        with open(log_path, "w") as f:
+            f.write("level=INFO user=a\nlevel=WARN user=b\n")
+        # 读取进行到一半时配置被替换, 这次读取仍用旧的解析状态完成
+        start = handler.checkpoints.resolve(log_path)
+        configs = handler.match_parsers(log_path)
+        batches = handler.iter_batches(log_path, configs, start)
+        route, rows, position = next(batches)
+        old_set = handler.parser_set
+
+        time.sleep(0.01)
+        _write_config(config_path, _config(tmp_dir, ["level", "user"]))
+        watch = apply_reload(reloader, handler, observer, watch, handler)
+        assert handler.parser_set is not old_set
+        assert not old_set.closed
+        assert list(batches) == []
+        assert old_set.closed
+        assert rows == [("INFO",), ("WARN",)]
+        handler.batch_writer.add_many("app_logs", route["columns"], rows)
+        handler.checkpoints.update(log_path, position)
+
+        # 新行按新的字段映射写入, 偏移接着上次的位置
+        with open(log_path, "a") as f:
+            f.write("level=ERROR user=c\n")
+        handler._process_path(log_path)
+        # 监控目录没有变化, 观察者不重新登记
+        assert observer.calls == []
+
+        time.sleep(0.01)
+        moved = dict(_config(tmp_dir, ["level", "user"]), recursive=True)
+        _write_config(config_path, moved)
+        watch = apply_reload(reloader, handler, observer, watch, handler)
+        assert observer.calls == [("schedule", tmp_dir, True), ("unschedule", tmp_dir, False)]
+        assert watch == (tmp_dir, True)
+        handler.close()
+
+        assert conn.execute("SELECT level, user FROM app_logs ORDER BY rowid").fetchall() == [
+            ("INFO", None), ("WARN", None), ("ERROR", "c")
+        ]
+        conn.close()
+
+if __name__ == "__main__":
+    test_invalid_config_is_ignored()
+    test_startup_config_is_validated()
+    test_reload_keeps_offsets_and_in_flight_reads()
+    logger.info("All config reloader tests passed")
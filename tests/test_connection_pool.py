@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool, PoolTimeout
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+def _ping(conn):
+    conn.execute("SELECT 1")
+
+def test_checkout_blocks_until_release_or_timeout():
+    pool = ConnectionPool(_connect, min_size=1, max_size=2, checkout_timeout=0.2)
+    pool.fill()
+    first = pool.checkout()
+    second = pool.checkout()
+    assert pool.stats()["utilization"] == 1.0
+
+    started = time.monotonic()
+    try:
+        pool.checkout()
+        assert False, "checkout should time out"
+    except PoolTimeout:
+        pass
+    assert time.monotonic() - started >= 0.2
+
+    # 归还连接会唤醒等待中的取用方
+    threading.Timer(0.05, pool.release, args=(first,)).start()
+    assert pool.checkout() is first
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["waits"] == 1 and stats["opened"] == 2
+    pool.release(first)
+    pool.release(second)
+    pool.close()
+
+def test_dead_and_expired_connections_are_replaced():
+    pool = ConnectionPool(_connect, min_size=1, max_size=2, health_check_interval=0, ping=_ping)
+    pool.fill()
+    conn = pool.checkout()
+    pool.release(conn)
+    # 连接在空闲期间断开, 取出前的检查发现后换成新连接
+    conn.close()
+    fresh = pool.checkout()
+    assert fresh is not conn
+    assert pool.stats()["failed_checks"] == 1
+
+    # 出错的连接归还时丢弃
+    pool.release(fresh, discard=True)
+    assert pool.stats()["size"] == 0
+
+    pool.max_lifetime = 0.05
+    conn = pool.checkout()
+    time.sleep(0.06)
+    pool.release(conn)
+    stats = pool.stats()
+    assert stats["recycled"] == 1 and stats["idle"] == 0
+    pool.close()
+
+if __name__ == "__main__":
+    test_checkout_blocks_until_release_or_timeout()
+    test_dead_and_expired_connections_are_replaced()
+    logger.info("All connection pool tests passed")
@@ -0,0 +1,59 @@
+import os
+import sys
+import logging
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime_converter import DatetimeConverter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_iso_and_fraction_share_prefix_cache():
+    converter = DatetimeConverter()
+
+    assert converter.convert("2024-03-01T10:00:00") == datetime(2024, 3, 1, 10, 0, 0)
+    assert converter.convert("2024-03-01T10:00:00.5") == datetime(2024, 3, 1, 10, 0, 0, 500000)
+    assert converter.convert("2024-03-01T10:00:00.000123") == datetime(2024, 3, 1, 10, 0, 0, 123)
+    assert converter.convert("2024-03-01 10:00:01") == datetime(2024, 3, 1, 10, 0, 1)
+
+def test_learned_and_explicit_formats():
+    converter = DatetimeConverter()
+    assert converter.convert("2024/03/01 10:00:00") == datetime(2024, 3, 1, 10, 0, 0)
+    assert converter._learned_format == "%Y/%m/%d %H:%M:%S"
+    assert converter.convert("2024/03/01 11:30:00") == datetime(2024, 3, 1, 11, 30, 0)
+
+    explicit = DatetimeConverter("%d/%b/%Y:%H:%M:%S")
+    assert explicit.convert("01/Mar/2024:10:00:00") == datetime(2024, 3, 1, 10, 0, 0)
+
+    try:
+        converter.convert("not a date")
+        assert False, "expected ValueError"
+    except ValueError as e:
+        logger.info(f"Rejected: {e}")
+
+def test_fraction_needs_format_support():
+    explicit = DatetimeConverter("%d/%m/%Y %H:%M:%S")
+    assert explicit.convert("01/03/2024 10:00:00") == datetime(2024, 3, 1, 10, 0, 0)
+    # 显式格式没有 %f, 带小数秒的值即使前缀已缓存也不接受
+    for value in ("01/03/2024 10:00:00.5", "01/03/2024 10:00:00.123456"):
+        try:
+            explicit.convert(value)
+            assert False, "expected ValueError"
+        except ValueError as e:
+            logger.info(f"Rejected: {e}")
+
+    fractional = DatetimeConverter("%d/%m/%Y %H:%M:%S.%f")
+    assert fractional.convert("01/03/2024 10:00:00.250") == datetime(2024, 3, 1, 10, 0, 0, 250000)
+    assert fractional.convert("01/03/2024 10:00:00.750") == datetime(2024, 3, 1, 10, 0, 0, 750000)
+    try:
+        fractional.convert("01/03/2024 10:00:00")
+        assert False, "expected ValueError"
+    except ValueError as e:
+        logger.info(f"Rejected: {e}")
+
+if __name__ == "__main__":
+    test_iso_and_fraction_share_prefix_cache()
+    test_learned_and_explicit_formats()
+    test_fraction_needs_format_support()
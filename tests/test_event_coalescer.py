@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_coalescer import EventCoalescer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_bursts_are_merged_per_path():
+    processed = []
+    coalescer = EventCoalescer(processed.append, window=0.05)
+    coalescer.start()
+    try:
+        for _ in range(1000):
+            coalescer.submit("app.log")
+            coalescer.submit("error.log")
+        time.sleep(0.2)
+    finally:
+        coalescer.close()
+
+    assert coalescer.events_received == 2000
+    assert sorted(set(processed)) == ["app.log", "error.log"]
+    assert len(processed) <= 6
+    logger.info(f"Coalescer stats: {coalescer.stats()}")
+
+def test_byte_threshold_skips_the_window():
+    processed = []
+    coalescer = EventCoalescer(processed.append, window=10, byte_threshold=100,
+                               backlog=lambda path: 500 if path == "big.log" else 0)
+    coalescer.start()
+    try:
+        coalescer.submit("small.log")
+        coalescer.submit("big.log")
+        deadline = time.monotonic() + 2
+        while not processed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert processed == ["big.log"]
+    finally:
+        coalescer.close()
+    assert processed == ["big.log", "small.log"]
+
+if __name__ == "__main__":
+    test_bursts_are_merged_per_path()
+    test_byte_threshold_skips_the_window()
@@ -0,0 +1,116 @@
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_router import FileRouter
+from checkpoint_store import CheckpointStore
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PATTERNS = [r"app\d*\.log$", r"^app", r"\.log$", r"nginx", r"(access|error)\.log$", r"(?i)^AUDIT"]
+
+def _routes(patterns):
+    return [{"index": index, "regex": re.compile(pattern)} for index, pattern in enumerate(patterns)]
+
+def test_combined_routing_matches_each_pattern():
+    routes = _routes(PATTERNS)
+    router = FileRouter(routes)
+    for name in ["app1.log", "xapp.log", "nginx.txt", "app.log.1", "error.log", "audit.txt", "other"]:
+        expected = [route["index"] for route in routes if route["regex"].search(name)]
+        assert [route["index"] for route in router.match(f"/var/log/{name}")] == expected, name
+
+def test_unmatched_paths_are_cached():
+    router = FileRouter(_routes([r"\.log$"]))
+    computed = []
+    route = router._route
+    router._route = lambda file_name: computed.append(file_name) or route(file_name)
+    for _ in range(5):
+        assert router.match("/logs/notes.txt") == []
+    assert computed == ["notes.txt"]
+
+def test_cache_invalidation():
+    router = FileRouter(_routes(PATTERNS))
+    router.match("/logs/a/app.log")
+    router.match("/logs/a/nginx.txt")
+    router.match("/logs/b/app.log")
+    assert len(router) == 3
+    router.invalidate("/logs/b/app.log")
+    assert len(router) == 2
+    router.invalidate_prefix("/logs/a")
+    assert len(router) == 0
+
+def test_checkpoint_moves_with_renamed_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = CheckpointStore(os.path.join(tmp_dir, "checkpoints.json"))
+        src = os.path.join(tmp_dir, "app.log")
+        dest = os.path.join(tmp_dir, "app1.log")
+        with open(src, "w") as f:
+            f.write("seq=1\n")
+        store.resolve(src)
+        store.update(src, 6)
+        os.rename(src, dest)
+        store.move(src, dest)
+        assert store.paths() == [dest]
+        assert store.resolve(dest) == 6
+
+def test_rotated_and_compressed_predecessor_is_finished():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "logs.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE app_logs (seq INTEGER)")
+        conn.commit()
+        handler = LogFileHandler({
+            "database": {"type": "sqlite", "path": db_path},
+            "watch_directory": tmp_dir,
+            "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+            "metrics": {"enabled": False},
+            "coalesce": {"enabled": False},
+            "log_files": [{
+                "file_pattern": r"app\.log$",
+                "table": "app_logs",
+                "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+            }]
+        })
+        log_path = os.path.join(tmp_dir, "app.log")
+        with open(log_path, "w") as f:
+            f.write("seq=1\nseq=2\n")
+        handler._process_path(log_path)
+        with open(log_path, "a") as f:
+            f.write("seq=3\n")
+
+        # logrotate: 改名后 app.log.1 不再匹配模式, 仍用原配置读完
+        os.rename(log_path, log_path + ".1")
+        assert handler.forget_moved(log_path, log_path + ".1")
+        handler._process_path(log_path + ".1")
+        with open(log_path + ".1", "a") as f:
+            f.write("seq=4\n")
+
+        # 压缩: 归档从原文件的偏移接着读
+        with open(log_path + ".1", "rb") as src, gzip.open(log_path + ".1.gz", "wb") as dest:
+            shutil.copyfileobj(src, dest)
+        handler.note_created(log_path + ".1.gz")
+        os.remove(log_path + ".1")
+        handler.forget(log_path + ".1")
+        handler._process_path(log_path + ".1.gz")
+        handler.close()
+
+        rows = conn.execute("SELECT seq FROM app_logs ORDER BY rowid").fetchall()
+        assert rows == [(1,), (2,), (3,), (4,)]
+        conn.close()
+
+if __name__ == "__main__":
+    test_combined_routing_matches_each_pattern()
+    test_unmatched_paths_are_cached()
+    test_cache_invalidation()
+    test_checkpoint_moves_with_renamed_file()
+    test_rotated_and_compressed_predecessor_is_finished()
+    logger.info("All file router tests passed")
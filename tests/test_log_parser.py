@@ -0,0 +1,102 @@
+import os
+import re
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_parser import LogParser
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOG_CONFIG = {
+    "file_pattern": "app\\.log",
+    "table": "app_logs",
+    "field_mappings": [
+        {"source_field": "level", "target_field": "severity", "type": "string"},
+        {"source_field": "message", "target_field": "content", "type": "string"},
+        {"source_field": "user.id", "target_field": "user_id", "type": "int"}
+    ]
+}
+
+def test_text_log_single_pass_extraction():
+    parser = LogParser(LOG_CONFIG)
+
+    record = parser.parse_line("level=WARN user.id=42 message=disk_full level=INFO")
+    assert record == {"severity": "WARN", "content": "disk_full", "user_id": 42}
+
+    # source_field 按字面匹配, 不再被当作正则
+    assert parser.parse_line("userXid=7 level=INFO") == {"severity": "INFO"}
+
+def _baseline_text_log(field_mappings, line):
+    # 原先的逐字段查找, source_field 按字面匹配
+    result = {}
+    for field_mapping in field_mappings:
+        source_field = field_mapping["source_field"]
+        match = re.search(f"{re.escape(source_field)}=([^\\s]+)", line)
+        if match:
+            result[source_field] = match.group(1)
+    return result if result else {"raw_message": line.strip()}
+
+def test_text_log_matches_per_field_search():
+    field_mappings = [
+        {"source_field": field, "target_field": field, "type": "string"}
+        for field in ("a", "ba", "msg", "k=v")
+    ]
+    parser = LogParser({"table": "t", "field_mappings": field_mappings})
+    lines = [
+        "ba=1",
+        "a=1 ba=2",
+        "ba=2 a=1",
+        "xa=1 a=2",
+        "msg=a=1 a=2",
+        "msg=ba=3",
+        "k=v=1 k=2",
+        "nothing here",
+    ]
+    for line in lines:
+        # 键是其它键的后缀, 或出现在其它字段的值里时, 结果与逐字段查找一致
+        assert parser._parse_text_log(line) == _baseline_text_log(field_mappings, line), line
+
+def test_rows_follow_compiled_column_order():
+    parser = LogParser(LOG_CONFIG)
+    assert parser.columns == ("severity", "content", "user_id")
+    # 转换失败的字段留空, 其余列照常输出
+    assert parser.parse_row("message=hello user.id=abc") == (None, "hello", None)
+    assert parser.parse_row("nothing to map") is None
+
+def test_json_log_still_preferred():
+    parser = LogParser(LOG_CONFIG)
+    record = parser.parse_line('{"level": "ERROR", "message": "boom", "user.id": "9"}')
+    assert record == {"severity": "ERROR", "content": "boom", "user_id": 9}
+    logger.info(f"Parsed record: {record}")
+
+def test_sniff_binds_parser_per_format():
+    parser = LogParser(LOG_CONFIG)
+    json_lines = [b'{"level": "INFO", "message": "a"}', b' {"level": "WARN", "message": "b"}']
+    assert parser.sniff(json_lines) == "json"
+    assert parser.sniff([b"level=INFO message=a"]) == "kv"
+    assert parser.sniff([json_lines[0], b"level=INFO"]) == "auto"
+
+    # 字节行直接解析, 不需要先解码成字符串
+    assert parser.row_parser("json")(json_lines[1]) == ("WARN", "b", None)
+    assert parser.row_parser("kv")("level=INFO message=café".encode("utf-8")) == ("INFO", "café", None)
+    # JSON 文件中偶尔出现的文本行仍按 key=value 解析
+    assert parser.row_parser("json")(b"level=ERROR message=trace") == ("ERROR", "trace", None)
+
+def test_regex_format():
+    config = dict(LOG_CONFIG, format="regex",
+                  pattern=r"^\[(?P<level>\w+)\] (?P<message>.*)$")
+    parser = LogParser(config)
+    assert parser.sniff([b"[INFO] started"]) == "regex"
+    assert parser.row_parser("regex")(b"[ERROR] disk full") == ("ERROR", "disk full", None)
+    assert parser.row_parser("regex")("no brackets") is None
+
+if __name__ == "__main__":
+    test_text_log_single_pass_extraction()
+    test_text_log_matches_per_field_search()
+    test_rows_follow_compiled_column_order()
+    test_json_log_still_preferred()
+    test_sniff_binds_parser_per_format()
+    test_regex_format()
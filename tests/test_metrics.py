@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import logging
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+from metrics import Counter, Histogram, MetricsRegistry
+from database_handler import DatabaseHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_render_counter_and_histogram():
+    registry = MetricsRegistry()
+    rows = registry.register(Counter("rows_total", "Rows", ("table",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+
+    rows.labels("app_logs").inc(5)
+    rows.labels("app_logs").inc()
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert 'rows_total{table="app_logs"} 6' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+
+def test_insert_metrics_and_http_endpoint():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "logs.db")})
+        with db.get_connection() as conn:
+            conn.execute("CREATE TABLE metric_logs (content TEXT)")
+            conn.commit()
+        before = metrics.ROWS_INSERTED.labels("metric_logs").value
+        db.insert_rows("metric_logs", ("content",), [("a",), ("b",)])
+        db.close()
+        assert metrics.ROWS_INSERTED.labels("metric_logs").value == before + 2
+
+    metrics.FILE_LAG.set_function(lambda: {"/var/log/app.log": 42})
+    server = metrics.start_http_server("127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            text = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+        metrics.FILE_LAG.set_function(None)
+
+    assert 'watchdog_rows_inserted_total{table="metric_logs"}' in text
+    assert 'watchdog_file_lag_bytes{path="/var/log/app.log"} 42' in text
+    assert 'watchdog_db_insert_seconds_count' in text
+
+if __name__ == "__main__":
+    test_render_counter_and_histogram()
+    test_insert_metrics_and_http_endpoint()
+    logger.info("All metrics tests passed")
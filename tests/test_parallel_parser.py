@@ -0,0 +1,45 @@
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel_parser import ChunkParser, ProcessChunkParser
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOG_CONFIGS = [
+    {
+        "file_pattern": "app\\.log",
+        "table": "app_logs",
+        "field_mappings": [
+            {"source_field": "seq", "target_field": "seq", "type": "int"},
+            {"source_field": "level", "target_field": "severity", "type": "string"}
+        ]
+    }
+]
+
+def _jobs(chunks):
+    for chunk_index, chunk in enumerate(chunks):
+        yield 0, "kv", chunk, None, chunk_index
+
+def test_process_parser_keeps_submission_order():
+    chunks = [[f"seq={i * 50 + j} level=INFO" for j in range(50)] for i in range(20)]
+    chunks[3] = []
+
+    expected = list(ChunkParser(LOG_CONFIGS).imap(_jobs(chunks)))
+    parser = ProcessChunkParser(LOG_CONFIGS, workers=2, max_pending=3)
+    try:
+        results = list(parser.imap(_jobs(chunks)))
+    finally:
+        parser.close()
+
+    assert results == expected
+    assert [tag for tag, _ in results] == list(range(20))
+    assert results[3][1] == []
+    assert results[4][1][0] == (200, "INFO")
+    logger.info(f"Parsed {sum(len(rows) for _, rows in results)} rows")
+
+if __name__ == "__main__":
+    test_process_parser_keeps_submission_order()
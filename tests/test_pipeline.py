@@ -0,0 +1,165 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import IngestPipeline, OffsetTracker
+from checkpoint_store import CheckpointStore
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SlowDatabaseHandler:
+    def __init__(self, delay):
+        self.delay = delay
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def write_batch(self, table, columns, rows):
+        time.sleep(self.delay)
+        with self.lock:
+            self.rows.setdefault(table, []).extend(dict(zip(columns, row)) for row in rows)
+        return len(rows)
+
+def parse_range(file_path, start, end):
+    for offset in range(start, end, 5):
+        stop = min(offset + 5, end)
+        yield file_path, ("path", "offset"), [(file_path, i) for i in range(offset, stop)], stop
+
+def test_pipeline_keeps_order_per_table():
+    db = SlowDatabaseHandler(delay=0.01)
+    pipeline = IngestPipeline(parse_range, db, parser_workers=2, writer_threads=3,
+                              queue_size=8, batch_size=16)
+    pipeline.start()
+
+    for start in range(0, 200, 10):
+        pipeline.submit("app.log", start, start + 10)
+        pipeline.submit("error.log", start, start + 10)
+    pipeline.close()
+
+    for table in ("app.log", "error.log"):
+        offsets = [row["offset"] for row in db.rows[table]]
+        assert offsets == list(range(200))
+    logger.info(f"Tables written: {sorted(db.rows)}")
+
+class FailingDatabaseHandler(SlowDatabaseHandler):
+    def write_batch(self, table, columns, rows):
+        if table == "broken":
+            raise RuntimeError("table does not exist")
+        return super().write_batch(table, columns, rows)
+
+def test_offsets_reported_after_write():
+    db = FailingDatabaseHandler(delay=0.01)
+    written = {}
+    # 偏移 -> 解析到该偏移时已产出的行数
+    parsed = {}
+    def on_written(file_path, position):
+        # 报告的偏移之前的行必须都已入库, 且同一文件的偏移只增不减
+        assert len(db.rows.get(file_path, [])) >= parsed[position]
+        assert position >= written.get(file_path, 0)
+        written[file_path] = position
+
+    def split_range(file_path, start, end):
+        # 每个区间最后一行被过滤掉, 该块没有行, 只报告进度
+        rows = [(file_path, i) for i in range(start, end - 1)]
+        parsed[end - 1] = parsed[end] = parsed.get(start, 0) + len(rows)
+        yield file_path, ("path", "offset"), rows, end - 1
+        yield file_path, ("path", "offset"), [], end
+
+    pipeline = IngestPipeline(split_range, db, parser_workers=1, writer_threads=2,
+                              queue_size=8, batch_size=4, offsets=OffsetTracker(on_written))
+    pipeline.start()
+    for start in range(0, 40, 4):
+        pipeline.submit("app.log", start, start + 4)
+    pipeline.close()
+
+    assert written["app.log"] == 40
+    assert len(db.rows["app.log"]) == 30
+
+    def failing_range(file_path, start, end):
+        yield "broken", ("offset",), [(start,)], end
+        yield file_path, ("offset",), [(end,)], end + 1
+
+    written.clear()
+    pipeline = IngestPipeline(failing_range, db, parser_workers=1, writer_threads=1,
+                              offsets=OffsetTracker(lambda file_path, position: written.update({file_path: position})))
+    pipeline.start()
+    pipeline.submit("bad.log", 0, 4)
+    pipeline.submit("bad.log", 4, 8)
+    pipeline.close()
+    # 写入失败的行块之后的偏移都不再报告
+    assert "bad.log" not in written
+
+def test_offsets_follow_rotated_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = CheckpointStore(os.path.join(tmp_dir, "checkpoints.json"))
+        offsets = OffsetTracker(store.update_entry, key_of=store.entry_key)
+        log_path = os.path.join(tmp_dir, "app.log")
+        with open(log_path, "w") as f:
+            f.write("seq=1\nseq=2\n")
+        assert store.resolve(log_path) == 0
+        block = offsets.mark(log_path, 12, 1)
+
+        # 行块写完前文件被轮转, 同名文件重新创建
+        os.rename(log_path, log_path + ".1")
+        store.move(log_path, log_path + ".1")
+        with open(log_path, "w") as f:
+            f.write("seq=3\n")
+        assert store.resolve(log_path) == 0
+
+        offsets.settle([block])
+        assert store.offset(log_path + ".1") == 12
+        assert store.offset(log_path) == 0
+
+def test_failed_write_holds_back_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "logs.db")
+        handler = LogFileHandler({
+            "database": {"type": "sqlite", "path": db_path},
+            "watch_directory": tmp_dir,
+            "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+            "metrics": {"enabled": False},
+            "coalesce": {"enabled": False},
+            "pipeline": {"enabled": True, "parser_workers": 1, "writer_threads": 1},
+            "log_files": [
+                {
+                    "file_pattern": r"app\.log$",
+                    "table": "app_logs",
+                    "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+                },
+                {
+                    "file_pattern": r"error\.log$",
+                    "table": "missing_logs",
+                    "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+                }
+            ]
+        })
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE app_logs (seq INTEGER)")
+        conn.commit()
+        handler.start()
+
+        app_path = os.path.join(tmp_dir, "app.log")
+        error_path = os.path.join(tmp_dir, "error.log")
+        for path in (app_path, error_path):
+            with open(path, "w") as f:
+                f.write("seq=1\nseq=2\n")
+            handler._process_path(path)
+        # 写库失败(表不存在)的文件检查点不推进, 其它文件照常推进
+        handler.close()
+        assert handler.checkpoints.offset(app_path) == os.path.getsize(app_path)
+        assert handler.checkpoints.offset(error_path) == 0
+        assert conn.execute("SELECT seq FROM app_logs ORDER BY rowid").fetchall() == [(1,), (2,)]
+        conn.close()
+
+if __name__ == "__main__":
+    test_pipeline_keeps_order_per_table()
+    test_offsets_reported_after_write()
+    test_offsets_follow_rotated_file()
+    test_failed_write_holds_back_checkpoint()
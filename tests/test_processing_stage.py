@@ -0,0 +1,106 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import logging
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing_stage import RowFilter, WindowAggregator
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("log_time", "severity", "duration")
+
+def test_filters_and_deterministic_sampling():
+    rows = [(None, level, i) for i in range(1000) for level in ("DEBUG", "INFO", "ERROR")]
+    row_filter = RowFilter(COLUMNS, filters=[
+        {"field": "severity", "op": "in", "value": ["INFO", "ERROR"]},
+        {"field": "duration", "op": "gte", "value": 100}
+    ])
+    kept = row_filter.apply(rows)
+    assert len(kept) == 1800
+    assert all(row[1] != "DEBUG" and row[2] >= 100 for row in kept)
+
+    sampler = RowFilter(COLUMNS, sample_rate=0.1, sample_by=["duration"])
+    sampled = sampler.apply(rows)
+    # 同一条记录的采样结果固定, 同一 duration 的各级别同进同出
+    assert sampled == sampler.apply(rows)
+    assert 150 < len(sampled) < 450
+    assert len(sampled) % 3 == 0
+
+def test_window_aggregation():
+    aggregator = WindowAggregator(
+        COLUMNS, table="rollup", window_seconds=60, group_by=["severity"], time_field="log_time",
+        metrics=[{"op": "count"}, {"op": "sum", "field": "duration"}, {"op": "max", "field": "duration"}],
+        lateness=0, idle_seconds=3600
+    )
+    assert aggregator.columns == ("window_start", "severity", "count", "sum_duration", "max_duration")
+    minute = datetime(2025, 1, 1, 10, 0)
+    aggregator.add([
+        (minute.replace(second=1), "INFO", 5),
+        (minute.replace(second=30), "INFO", 7),
+        (minute.replace(second=59), "ERROR", None)
+    ])
+    # 事件时间尚未越过窗口末尾
+    assert aggregator.drain() == []
+    aggregator.add([(minute.replace(minute=1, second=0), "INFO", 1)])
+    assert aggregator.drain() == [(minute, "INFO", 2, 12, 7), (minute, "ERROR", 1, 0, None)]
+    assert aggregator.drain(force=True) == [(minute.replace(minute=1), "INFO", 1, 1, 1)]
+    assert len(aggregator) == 0
+
+def test_handler_writes_rollups_instead_of_rows():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "logs.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE app_logs (severity TEXT, duration INTEGER)")
+        conn.execute("CREATE TABLE app_rollup (window_start TEXT, severity TEXT, events INTEGER, total INTEGER)")
+        conn.commit()
+        log_path = os.path.join(tmp_dir, "app.log")
+        with open(log_path, "w") as f:
+            for i in range(300):
+                f.write(f"level={('DEBUG', 'INFO', 'ERROR')[i % 3]} duration={i}\n")
+
+        handler = LogFileHandler({
+            "database": {"type": "sqlite", "path": db_path},
+            "watch_directory": tmp_dir,
+            "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+            "metrics": {"enabled": False},
+            "log_files": [{
+                "file_pattern": r"app\.log$",
+                "table": "app_logs",
+                "field_mappings": [
+                    {"source_field": "level", "target_field": "severity", "type": "string"},
+                    {"source_field": "duration", "target_field": "duration", "type": "int"}
+                ],
+                "processing": {
+                    "filters": [{"field": "severity", "op": "ne", "value": "DEBUG"}],
+                    "aggregate": {
+                        "table": "app_rollup",
+                        "window_seconds": 3600,
+                        "group_by": ["severity"],
+                        "metrics": [{"op": "count", "column": "events"},
+                                    {"op": "sum", "field": "duration", "column": "total"}]
+                    }
+                }
+            }]
+        })
+        handler._process_file(log_path, 0)
+        handler.close()
+
+        assert conn.execute("SELECT COUNT(*) FROM app_logs").fetchone() == (0,)
+        rollups = conn.execute("SELECT severity, events, total FROM app_rollup ORDER BY severity").fetchall()
+        assert rollups == [
+            ("ERROR", 100, sum(range(2, 300, 3))),
+            ("INFO", 100, sum(range(1, 300, 3)))
+        ]
+        conn.close()
+
+if __name__ == "__main__":
+    test_filters_and_deterministic_sampling()
+    test_window_aggregation()
+    test_handler_writes_rollups_instead_of_rows()
+    logger.info("All processing stage tests passed")
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import StageProfiler
+from log_parser import LogParser
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Worker:
+    def work(self, n):
+        return [i * i for i in range(n)]
+
+    def items(self, n):
+        for i in range(n):
+            yield i
+
+def test_enable_wraps_and_disable_restores():
+    original_work = Worker.__dict__["work"]
+    original_items = Worker.__dict__["items"]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profiler = StageProfiler()
+        profiler.configure({"sample_every": 2, "directory": tmp_dir, "dump_interval": 3600})
+        profiler.register(Worker, "work", "work")
+        profiler.register(Worker, "items", "items", kind="iter")
+
+        profiler.enable()
+        worker = Worker()
+        assert Worker.__dict__["work"] is not original_work
+        for _ in range(10):
+            assert worker.work(100)[-1] == 99 * 99
+        for _ in range(4):
+            assert list(worker.items(5)) == [0, 1, 2, 3, 4]
+
+        summary = profiler.summary()
+        assert summary["work"]["calls"] == 10
+        assert summary["work"]["sampled"] == 5
+        assert summary["work"]["wall_us_avg"] > 0
+        assert summary["items"]["sampled"] == 2
+
+        profiler.disable()
+        assert Worker.__dict__["work"] is original_work
+        assert Worker.__dict__["items"] is original_items
+
+        dumps = [name for name in os.listdir(tmp_dir) if name.endswith("-summary.json")]
+        assert len(dumps) == 1
+        with open(os.path.join(tmp_dir, dumps[0])) as f:
+            assert json.load(f)["work"]["calls"] == 10
+
+def test_cprofile_snapshot():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profiler = StageProfiler()
+        profiler.configure({"sample_every": 1, "directory": tmp_dir, "cprofile": True})
+        profiler.register(Worker, "work", "work")
+        profiler.toggle()
+        Worker().work(10)
+        profiler.toggle()
+        assert not profiler.enabled
+        assert any(name.endswith(".prof") for name in os.listdir(tmp_dir))
+
+def test_row_parser_sees_wrapped_methods():
+    parser = LogParser({"field_mappings": [{"source_field": "message", "target_field": "message"}]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profiler = StageProfiler()
+        profiler.configure({"sample_every": 1, "directory": tmp_dir, "dump_interval": 3600})
+        profiler.register(LogParser, "_parse_json_row", "parse_json")
+        profiler.enable()
+        # 解析器创建在开启分析之前, 取解析函数时仍应得到包装后的方法
+        parse = parser.row_parser("json")
+        for i in range(3):
+            assert parse(b'{"message": "m"}') == ("m",)
+        profiler.disable()
+        assert profiler.summary()["parse_json"]["calls"] == 3
+
+if __name__ == "__main__":
+    test_enable_wraps_and_disable_restores()
+    test_cprofile_snapshot()
+    test_row_parser_sees_wrapped_methods()
+    logger.info("All profiler tests passed")
@@ -0,0 +1,79 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_hash import DedupCache, RecordHasher
+from database_handler import DatabaseHandler
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_hash_depends_on_content_and_position():
+    hasher = RecordHasher("blake2b")
+    first = hasher.digest_lines("42", [0, 10], [b"seq=1", b"seq=1"])
+    assert first[0] != first[1]
+    assert hasher.digest_lines("42", [0], ["seq=1"]) == first[:1]
+    assert hasher.digest_lines("43", [0], [b"seq=1"]) != first[:1]
+    assert len(first[0]) == 32
+    # 未安装 xxhash 时退回 blake2b
+    assert RecordHasher("xxh3_64").algorithm in ("xxh3_64", "blake2b")
+
+def test_dedup_cache_is_bounded():
+    cache = DedupCache(max_entries=3)
+    assert cache.filter([(1, "a"), (2, "b"), (3, "a")]) == [(1, "a"), (2, "b")]
+    assert cache.hits == 1
+    cache.filter([(4, "c"), (5, "d")])
+    assert len(cache) == 3
+    # "a" 重复出现时移到了队尾, 最久未用的 "b" 被淘汰
+    assert cache.filter([(6, "b"), (7, "a")]) == [(6, "b")]
+
+def test_replay_does_not_insert_duplicates():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "logs.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE app_logs (seq INTEGER, record_hash TEXT UNIQUE)")
+        conn.commit()
+        log_path = os.path.join(tmp_dir, "app.log")
+        with open(log_path, "w") as f:
+            f.writelines(["seq=1\n", "seq=2\n", "seq=1\n"])
+
+        def handler():
+            return LogFileHandler({
+                "database": {"type": "sqlite", "path": db_path, "ignore_duplicates": True},
+                "watch_directory": tmp_dir,
+                "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+                "metrics": {"enabled": False},
+                "dedup": {"enabled": True, "cache_size": 100},
+                "log_files": [{
+                    "file_pattern": r"app\.log$",
+                    "table": "app_logs",
+                    "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+                }]
+            })
+
+        first = handler()
+        first._process_file(log_path, 0)
+        # 同一进程内重读由缓存丢弃
+        first._process_file(log_path, 0)
+        assert first.dedup.hits == 3
+        first.close()
+
+        # 新进程没有缓存, 由唯一键跳过
+        second = handler()
+        second._process_file(log_path, 0)
+        second.close()
+
+        rows = conn.execute("SELECT seq FROM app_logs ORDER BY rowid").fetchall()
+        assert rows == [(1,), (2,), (1,)]
+        conn.close()
+
+if __name__ == "__main__":
+    test_hash_depends_on_content_and_position()
+    test_dedup_cache_is_bounded()
+    test_replay_does_not_insert_duplicates()
+    logger.info("All record hash tests passed")
@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+import logging
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_handler import DatabaseHandler
+from retention_worker import RetentionWorker, create_retention_worker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_logs(db, now):
+    with db.get_connection() as conn:
+        conn.execute("CREATE TABLE app_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, log_time TIMESTAMP, content TEXT)")
+        conn.commit()
+    # 前 95 行已过期, 后 10 行在保留期内
+    rows = [(now - timedelta(days=40) + timedelta(hours=i), f"line {i}") for i in range(95)]
+    rows += [(now - timedelta(days=1), f"recent {i}") for i in range(10)]
+    db.insert_rows("app_logs", ("log_time", "content"), rows)
+
+def test_chunked_delete_stops_at_retention_boundary():
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "logs.db")})
+        create_logs(db, now)
+
+        worker = RetentionWorker(db, {"app_logs": "log_time"}, retention_days=30,
+                                 interval_hours=1, batch_size=20, throttle=0)
+        result = worker.run_once(now)
+
+        with db.get_connection() as conn:
+            remaining = [content for content, in conn.execute("SELECT content FROM app_logs ORDER BY id")]
+        db.close()
+
+        assert result["tables"]["app_logs"]["rows_deleted"] == 95
+        assert remaining == [f"recent {i}" for i in range(10)]
+        assert worker.stats()["runs"] == 1
+
+def test_backfilled_rows_and_missing_partitions():
+    now = datetime(2024, 6, 1, 12, 0, 0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "logs.db")})
+        create_logs(db, now)
+        # 补录的旧日志主键排在保留期内的行之后
+        db.insert_rows("app_logs", ("log_time", "content"),
+                       [(now - timedelta(days=60), f"backfill {i}") for i in range(25)])
+
+        # SQLite 不支持分区, 退回逐行删除
+        worker = RetentionWorker(db, {"app_logs": "log_time"}, retention_days=30,
+                                 interval_hours=1, batch_size=20, throttle=0, drop_partitions=True)
+        result = worker.run_once(now)
+
+        with db.get_connection() as conn:
+            remaining = [content for content, in conn.execute("SELECT content FROM app_logs ORDER BY id")]
+        db.close()
+
+        assert result["tables"]["app_logs"]["rows_deleted"] == 120
+        assert result["tables"]["app_logs"]["partitions_dropped"] == []
+        assert remaining == [f"recent {i}" for i in range(10)]
+
+def test_create_from_config():
+    config = {
+        "database": {"cleanup": {"enabled": True, "retention_days": 7, "interval_hours": 1}},
+        "log_files": [
+            {"table": "app_logs", "field_mappings": [
+                {"source_field": "message", "target_field": "content", "type": "string"},
+                {"source_field": "timestamp", "target_field": "log_time", "type": "datetime"}
+            ]},
+            {"table": "raw_logs", "field_mappings": [
+                {"source_field": "message", "target_field": "content", "type": "string"}
+            ]}
+        ]
+    }
+    worker = create_retention_worker(config, db_handler=None)
+    assert worker.tables == {"app_logs": "log_time"}
+    assert worker.interval == 3600
+
+    config["database"]["cleanup"]["enabled"] = False
+    assert create_retention_worker(config, db_handler=None) is None
+
+if __name__ == "__main__":
+    test_chunked_delete_stops_at_retention_boundary()
+    test_backfilled_rows_and_missing_partitions()
+    test_create_from_config()
+    logger.info("All retention tests passed")
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_handler import DatabaseHandler
+from shard_coordinator import HashRing, ShardCoordinator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_ring_moves_only_keys_of_new_node():
+    keys = [f"app/{i}.log" for i in range(3000)]
+    before = HashRing(["a", "b"])
+    after = HashRing(["a", "b", "c"])
+    moved = [key for key in keys if before.owner(key) != after.owner(key)]
+    assert all(after.owner(key) == "c" for key in moved)
+    # 新节点大约分到三分之一
+    assert 600 < len(moved) < 1400
+
+def test_lease_takeover_keeps_offset():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        watch_dir = os.path.join(tmp_dir, "logs")
+        os.mkdir(watch_dir)
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "leases.db")})
+        first = ShardCoordinator(db, watch_dir, node_id="node-a", lease_seconds=0.5)
+        second = ShardCoordinator(db, watch_dir, node_id="node-b", lease_seconds=0.5)
+        first.setup()
+        first.heartbeat()
+        second.heartbeat()
+        first.heartbeat()
+        assert first.ring.nodes == ["node-a", "node-b"]
+
+        paths = []
+        for i in range(20):
+            path = os.path.join(watch_dir, f"app{i}.log")
+            with open(path, "w") as f:
+                f.write("seq=1\n" * 10)
+            paths.append(path)
+        mine = [path for path in paths if first.owns(path)]
+        theirs = [path for path in paths if second.owns(path)]
+        assert mine and theirs and len(mine) + len(theirs) == len(paths)
+
+        path = mine[0]
+        assert first.acquire(path) == (None, "")
+        assert second.acquire(path) is None
+        first.save_offsets({path: 60})
+
+        # node-a 停止心跳, 租约过期后由 node-b 接手
+        orphaned = []
+        second.on_orphaned = orphaned.extend
+        time.sleep(0.6)
+        second.heartbeat()
+        assert second.ring.nodes == ["node-b"]
+        assert path in orphaned
+        assert second.acquire(path) == (60, "node-a")
+
+        # node-a 恢复后发现租约已被取得
+        first.heartbeat()
+        assert not first.holds(path)
+
+        second.close({path: 60})
+        db.close()
+
+def test_restarted_node_catches_up_its_leases():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        watch_dir = os.path.join(tmp_dir, "logs")
+        os.mkdir(watch_dir)
+        path = os.path.join(watch_dir, "app.log")
+        with open(path, "w") as f:
+            f.write("seq=1\n")
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "leases.db")})
+        first = ShardCoordinator(db, watch_dir, node_id="node-a")
+        first.setup()
+        first.heartbeat()
+        assert first.acquire(path) == (None, "")
+
+        # 以同一 node_id 重启: 租约仍在本节点名下, 心跳时交给 on_orphaned 补读
+        restarted = ShardCoordinator(db, watch_dir, node_id="node-a")
+        orphaned = []
+        restarted.on_orphaned = orphaned.extend
+        restarted.heartbeat()
+        assert orphaned == [path]
+        assert restarted.acquire(path) == (None, "node-a")
+
+        orphaned.clear()
+        restarted.heartbeat()
+        assert orphaned == []
+        db.close()
+
+if __name__ == "__main__":
+    test_ring_moves_only_keys_of_new_node()
+    test_lease_takeover_keeps_offset()
+    test_restarted_node_catches_up_its_leases()
+    logger.info("All shard coordinator tests passed")
@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import logging
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spill_buffer import SpillBuffer
+from database_handler import DatabaseHandler
+from watchdog_to_db import LogFileHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_replay_keeps_order_and_types():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spill = SpillBuffer(tmp_dir, segment_bytes=200)
+        for i in range(10):
+            spill.append("app_logs", ("log_time", "seq"), [(datetime(2024, 1, 1, 0, 0, i), i)])
+        spill.close()
+        assert len(os.listdir(tmp_dir)) > 1
+
+        # 重新打开后仍能找到未回放的段
+        spill = SpillBuffer(tmp_dir, segment_bytes=200)
+        assert spill.pending()
+        written = []
+        assert spill.replay(lambda table, columns, rows: written.extend(rows)) == 10
+        assert written == [(datetime(2024, 1, 1, 0, 0, i), i) for i in range(10)]
+        assert not spill.pending()
+        assert os.listdir(tmp_dir) == []
+
+def test_failed_replay_resumes_from_failed_batch():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spill = SpillBuffer(tmp_dir)
+        for i in range(5):
+            spill.append("app_logs", ("seq",), [(i,)])
+
+        written = []
+        down = [True]
+        def flaky(table, columns, rows):
+            if rows[0][0] == 3 and down[0]:
+                raise ConnectionError("database went away")
+            written.extend(rows)
+
+        assert spill.replay(flaky) == 3
+        assert spill.pending()
+        down[0] = False
+        assert spill.replay(flaky) == 2
+        assert written == [(0,), (1,), (2,), (3,), (4,)]
+
+def test_size_limit():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spill = SpillBuffer(tmp_dir, max_bytes=100)
+        assert spill.append("t", ("c",), [("x",)])
+        assert not spill.append("t", ("c",), [("x" * 200,)])
+        spill.close()
+
+def test_non_transient_batch_goes_to_dead_letter():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spill = SpillBuffer(tmp_dir)
+        for i in range(4):
+            spill.append("broken" if i == 1 else "app_logs", ("seq",), [(i,)])
+        assert spill.pending("app_logs") and spill.pending("broken")
+
+        written = []
+        def write(table, columns, rows):
+            if table == "broken":
+                raise ValueError("no such table: broken")
+            written.extend(rows)
+
+        # 无法写入的批次不阻塞后面的批次
+        assert spill.replay(write, lambda e: isinstance(e, ConnectionError)) == 3
+        assert written == [(0,), (2,), (3,)]
+        assert not spill.pending()
+        with open(spill.dead_letter_path()) as f:
+            assert [json.loads(line)["rows"] for line in f] == [[[1]]]
+
+def test_database_handler_spills_during_outage():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseHandler({
+            "type": "sqlite",
+            "path": os.path.join(tmp_dir, "logs.db"),
+            "retry": {"max_attempts": 2, "delay": 0.01, "backoff": 2},
+            "spill": {"enabled": True, "directory": os.path.join(tmp_dir, "spill")}
+        })
+        with db.get_connection() as conn:
+            conn.execute("CREATE TABLE app_logs (seq INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE error_logs (seq INTEGER NOT NULL)")
+            conn.commit()
+
+        # 表名写错不是暂时性错误, 批次进入死信文件, 不影响其它写入
+        assert db.write_batch("app_log", ("seq",), [(0,)]) == 0
+        assert not db.spill.pending()
+        assert os.path.exists(db.spill.dead_letter_path())
+
+        insert = db.backend.bulk_insert
+        down = [True]
+        def locked(conn, table, columns, rows):
+            if down[0] and table == "app_logs":
+                raise sqlite3.OperationalError("database is locked")
+            insert(conn, table, columns, rows)
+        db.backend.bulk_insert = locked
+
+        # 数据库被锁时批次转存到磁盘而不是丢弃
+        assert db.write_batch("app_logs", ("seq",), [(1,), (2,)]) == 0
+        assert db.spill.pending("app_logs")
+        assert db.replay_spill() == 0
+
+        # 缓冲未清空前, 同一张表的新批次排在缓冲之后, 其它表照常写入
+        assert db.write_batch("app_logs", ("seq",), [(3,)]) == 0
+        assert db.write_batch("error_logs", ("seq",), [(1,)]) == 1
+        down[0] = False
+        assert db.replay_spill() == 3
+        assert db.write_batch("app_logs", ("seq",), [(4,)]) == 1
+
+        with db.get_connection() as conn:
+            seqs = [seq for seq, in conn.execute("SELECT seq FROM app_logs ORDER BY rowid")]
+        db.close()
+        assert seqs == [1, 2, 3, 4]
+
+def test_unsaved_rows_hold_back_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "logs.db")
+        db = DatabaseHandler({"type": "sqlite", "path": db_path})
+        # 未开启溢出缓冲时写入失败的批次直接抛出
+        try:
+            db.write_batch("app_logs", ("seq",), [(1,)])
+        except sqlite3.OperationalError:
+            pass
+        else:
+            raise AssertionError("write_batch returned without writing the rows")
+        db.close()
+
+        # 溢出缓冲已满时同样抛出, 行不会被悄悄丢弃
+        db = DatabaseHandler({
+            "type": "sqlite",
+            "path": db_path,
+            "spill": {"enabled": True, "directory": os.path.join(tmp_dir, "spill"), "max_bytes": 10}
+        })
+        def locked(conn, table, columns, rows):
+            raise sqlite3.OperationalError("database is locked")
+        db.backend.bulk_insert = locked
+        try:
+            db.write_batch("app_logs", ("seq",), [(1,)])
+        except OSError:
+            pass
+        else:
+            raise AssertionError("write_batch returned without spilling the rows")
+        db.close()
+
+        log_path = os.path.join(tmp_dir, "app.log")
+        with open(log_path, "w") as f:
+            f.write("seq=1\nseq=2\n")
+        handler = LogFileHandler({
+            "database": {"type": "sqlite", "path": db_path},
+            "watch_directory": tmp_dir,
+            "checkpoint": {"path": os.path.join(tmp_dir, "checkpoints.json")},
+            "metrics": {"enabled": False},
+            "coalesce": {"enabled": False},
+            "log_files": [{
+                "file_pattern": r"app\.log$",
+                "table": "app_logs",
+                "field_mappings": [{"source_field": "seq", "target_field": "seq", "type": "int"}]
+            }]
+        })
+        # 表还不存在, 写入失败; 检查点停在失败的行之前
+        handler._process_path(log_path)
+        handler.save_checkpoints(force=True)
+        assert handler.checkpoints.offset(log_path) == 0
+
+        with handler.db_handler.get_connection() as conn:
+            conn.execute("CREATE TABLE app_logs (seq INTEGER)")
+            conn.commit()
+        with open(log_path, "a") as f:
+            f.write("seq=3\n")
+        handler._process_path(log_path)
+        handler.close()
+        with open(os.path.join(tmp_dir, "checkpoints.json")) as f:
+            assert [entry["offset"] for entry in json.load(f).values()] == [0]
+
+if __name__ == "__main__":
+    test_replay_keeps_order_and_types()
+    test_failed_replay_resumes_from_failed_batch()
+    test_size_limit()
+    test_non_transient_batch_goes_to_dead_letter()
+    test_database_handler_spills_during_outage()
+    test_unsaved_rows_hold_back_checkpoint()
+    logger.info("All spill buffer tests passed")
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import logging
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_validator import ConfigValidator, ConfigValidationError
+from database_handler import DatabaseHandler
+from storage_backends import MySQLBackend, SQLiteBackend
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_sqlite_batch_insert():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "logs.db")})
+        assert isinstance(db.backend, SQLiteBackend)
+        with db.get_connection() as conn:
+            conn.execute("CREATE TABLE app_logs (log_time TEXT, severity TEXT, content TEXT)")
+            conn.commit()
+
+        rows = [(datetime(2024, 1, 1, 10, 0, i).isoformat(), "INFO", f"line {i}") for i in range(50)]
+        assert db.insert_rows("app_logs", ("log_time", "severity", "content"), rows) == 50
+        assert db.insert_many("app_logs", [{"severity": "WARN"}, {"content": "only content"}]) == 2
+        db.insert_log("app_logs", {"severity": "ERROR", "content": "single"})
+
+        with db.get_connection() as conn:
+            count, = conn.execute("SELECT COUNT(*) FROM app_logs").fetchone()
+            journal_mode, = conn.execute("PRAGMA journal_mode").fetchone()
+        db.close()
+
+        assert count == 53
+        assert journal_mode == "wal"
+
+def test_failed_batch_is_rolled_back():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseHandler({"type": "sqlite", "path": os.path.join(tmp_dir, "logs.db")})
+        with db.get_connection() as conn:
+            conn.execute("CREATE TABLE app_logs (seq INTEGER NOT NULL)")
+            conn.commit()
+
+        try:
+            db.insert_rows("app_logs", ("seq",), [(1,), (None,)])
+            assert False, "expected integrity error"
+        except Exception as e:
+            logger.info(f"Rejected batch: {e}")
+
+        with db.get_connection() as conn:
+            count, = conn.execute("SELECT COUNT(*) FROM app_logs").fetchone()
+        db.close()
+        assert count == 0
+
+def test_database_type_validation():
+    ConfigValidator.validate_database_config({"type": "sqlite", "path": "logs.db"})
+    try:
+        ConfigValidator.validate_database_config({"type": "oracle", "path": "x"})
+        assert False, "expected validation error"
+    except ConfigValidationError:
+        pass
+    assert MySQLBackend._tsv_value("a\tb\\c") == "a\\tb\\\\c"
+    assert MySQLBackend._tsv_value(None) == "\\N"
+
+if __name__ == "__main__":
+    test_sqlite_batch_insert()
+    test_failed_batch_is_rolled_back()
+    test_database_type_validation()
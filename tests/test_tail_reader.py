@@ -0,0 +1,98 @@
+import bz2
+import gzip
+import os
+import sys
+import tempfile
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tail_reader import TailReader
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def test_partial_line_is_carried_to_next_read():
+    reader = TailReader(chunk_size=4)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = os.path.join(tmp_dir, "app.log")
+        with open(log_file, "wb") as f:
+            f.write("level=INFO message=启动\r\nlevel=WARN mess".encode("utf-8"))
+
+        lines = list(reader.read_lines(log_file, 0))
+        assert [line for line, _ in lines] == ["level=INFO message=启动"]
+        position = lines[-1][1]
+
+        with open(log_file, "ab") as f:
+            f.write(b"age=slow\n")
+
+        lines = list(reader.read_lines(log_file, position))
+        assert [line for line, _ in lines] == ["level=WARN message=slow"]
+        assert lines[-1][1] == os.path.getsize(log_file)
+
+def test_read_is_limited_to_range_and_long_lines():
+    reader = TailReader(chunk_size=8, max_line_bytes=16)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = os.path.join(tmp_dir, "app.log")
+        with open(log_file, "wb") as f:
+            f.write(b"one\ntwo\nthree\n" + b"x" * 40)
+
+        assert [line for line, _ in reader.read_lines(log_file, 0, 8)] == ["one", "two"]
+
+        # 超长部分被强制切出, 剩余不足上限的半行留到下一次读取
+        lines = list(reader.read_lines(log_file, 14))
+        assert lines == [("x" * 24, 38)]
+        logger.info(f"Forced lines: {lines}")
+
+def test_hot_file_handle_is_reused_until_rotation():
+    reader = TailReader(max_open_files=4)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = os.path.join(tmp_dir, "app.log")
+        position = 0
+        for i in range(5):
+            with open(log_file, "a") as f:
+                f.write(f"line {i}\n")
+            lines = list(reader.read_lines(log_file, position))
+            assert [line for line, _ in lines] == [f"line {i}"]
+            position = lines[-1][1]
+        assert reader.opens == 1
+
+        os.rename(log_file, log_file + ".1")
+        with open(log_file, "w") as f:
+            f.write("rotated\n")
+        assert [line for line, _ in reader.read_lines(log_file, 0)] == ["rotated"]
+        assert reader.opens == 2
+        reader.close()
+
+def test_compressed_file_is_read_from_uncompressed_offset():
+    reader = TailReader(chunk_size=8)
+    content = b"".join(b"seq=%d\n" % i for i in range(100))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, compress in (("app.log.1.gz", gzip.compress), ("app.log.1.bz2", bz2.compress)):
+            archive = os.path.join(tmp_dir, name)
+            with open(archive, "wb") as f:
+                f.write(compress(content))
+            # 偏移是解压后的位置, 可以超过归档本身的大小
+            start = content.index(b"seq=90\n")
+            assert start > os.path.getsize(archive)
+            lines = list(reader.read_lines(archive, start, raw=True))
+            assert [line for line, _ in lines] == [b"seq=%d" % i for i in range(90, 100)]
+            assert lines[-1][1] == len(content)
+        assert reader.opens == 2
+
+def test_incomplete_archive_stops_at_last_full_line():
+    reader = TailReader(chunk_size=256)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, "app.log.1.gz")
+        data = gzip.compress(b"".join(b"line %d\n" % i for i in range(5000)))
+        with open(archive, "wb") as f:
+            f.write(data[:len(data) // 2])
+        lines = list(reader.read_lines(archive, 0))
+        assert lines and lines[-1][0] == f"line {len(lines) - 1}"
+
+if __name__ == "__main__":
+    test_partial_line_is_carried_to_next_read()
+    test_read_is_limited_to_range_and_long_lines()
+    test_hot_file_handle_is_reused_until_rotation()
+    test_compressed_file_is_read_from_uncompressed_offset()
+    test_incomplete_archive_stops_at_last_full_line()
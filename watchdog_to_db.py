@@ -1,13 +1,30 @@
+import argparse
+import asyncio
 import json
 import time
 import logging
 import os
-import re
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from log_parser import LogParser
+from datetime_converter import DatetimeConverter
 from database_handler import DatabaseHandler
+from batch_writer import BatchWriter, create_batch_sizer
+from pipeline import IngestPipeline, OffsetTracker
+from tail_reader import COMPRESSED_SUFFIXES, TailReader, detect_compression
+from checkpoint_store import CheckpointStore
+from backfill import Backfill
+from record_hash import DedupCache
+from parser_set import ParserSet
+from config_reloader import RELOADABLE_SECTIONS, WATCH_SECTIONS, ConfigReloader
+from config_validator import ConfigValidator
+from shard_coordinator import ShardCoordinator, create_shard_coordinator
+from event_coalescer import EventCoalescer
+from retention_worker import create_retention_worker
+import metrics
+from profiler import PROFILER
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,96 +32,878 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+ROUTE_CACHE_SIZE = 4096
+
 class LogFileHandler(FileSystemEventHandler):
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], db_handler=None):
         self.config = config
-        self.db_handler = DatabaseHandler(config["database"])
-        self.parsers = {}
-        self.file_positions = {}
-        
-        for log_config in config["log_files"]:
-            self.parsers[log_config["file_pattern"]] = {
-                "parser": LogParser(log_config),
-                "table": log_config["table"]
-            }
+        self.db_handler = db_handler if db_handler is not None else DatabaseHandler(config["database"])
+        # database.adaptive_batch 开启时按提交耗时调整每张表的批量
+        self.batch_sizer = create_batch_sizer(config["database"])
+        reader_config = config.get("reader", {})
+        self.tail_reader = TailReader(
+            chunk_size=reader_config.get("chunk_size", 65536),
+            max_line_bytes=reader_config.get("max_line_bytes", 1048576),
+            max_open_files=reader_config.get("max_open_files", 64)
+        )
+        self.max_idle_seconds = reader_config.get("max_idle_seconds", 60)
+        checkpoint_config = config.get("checkpoint", {})
+        self.checkpoints = CheckpointStore(
+            checkpoint_config.get("path", "checkpoints.json"),
+            flush_interval=checkpoint_config.get("flush_interval", 5),
+            fingerprint_bytes=checkpoint_config.get("fingerprint_bytes", 1024)
+        )
+        # 流水线模式下区间末尾的半行起点, 只由该文件固定的解析线程访问
+        self._partial_offsets = {}
+        # 已读出、尚未写完的区间末尾 (inode, 偏移); 检查点只记录已写入的整行偏移
+        self._dispatched: Dict[str, Tuple[int, int]] = {}
+        # 偏移标记按检查点记录键(设备:inode)归组, 改名或轮转后仍报告给读取时的文件
+        self.offsets = OffsetTracker(self.checkpoints.update_entry, key_of=self.checkpoints.entry_key)
+        self.batch_writer = BatchWriter(
+            self.db_handler,
+            batch_size=config["database"].get("batch_size", 1000),
+            flush_interval=config["database"].get("flush_interval", 1.0),
+            sizer=self.batch_sizer,
+            offsets=self.offsets
+        )
+        # 去重: 每条记录追加一列内容 + 位置哈希, 可选在进程内丢弃近期已写入的记录
+        dedup_config = config.get("dedup", {})
+        hash_column = dedup_config.get("column", "record_hash") if dedup_config.get("enabled", False) else None
+        cache_size = dedup_config.get("cache_size", 1000000)
+        self.dedup_enabled = hash_column is not None
+        self.dedup = DedupCache(cache_size) if hash_column and cache_size else None
+        self.hash_column = hash_column
+        self.hash_algorithm = config.get("hash_algorithm", "blake2b")
+
+        # log_files / parsing 编译出的解析状态, 配置热加载时整体替换
+        self.parser_set = ParserSet(config, hash_column, self.hash_algorithm, cache_size=ROUTE_CACHE_SIZE)
+        self.chunk_lines = self.parser_set.chunk_lines
+        # 已被替换、仍有读取方或未写出汇总窗口的旧解析状态
+        self._retired_sets: List[ParserSet] = []
+        self._retired_lock = threading.Lock()
+        # (文件路径, 配置下标) -> 探测到的日志格式
+        self._formats = {}
+        # 同一文件同一时刻只由一个读取方处理; 补录占用时实时事件记入 _deferred, 释放后重新提交
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self._path_locks_guard = threading.Lock()
+        self._deferred = set()
+
+        # 流水线模式: 事件线程只登记待读区间, 解析与写库交给后台线程
+        self.pipeline = None
+        pipeline_config = config.get("pipeline", {})
+        if pipeline_config.get("enabled", False):
+            self.pipeline = IngestPipeline(
+                self._parse_range,
+                self.db_handler,
+                parser_workers=pipeline_config.get("parser_workers", 2),
+                writer_threads=pipeline_config.get(
+                    "writer_threads", config["database"].get("pool_size", 5)
+                ),
+                queue_size=pipeline_config.get("queue_size", 10000),
+                batch_size=config["database"].get("batch_size", 1000),
+                table_queue_batches=pipeline_config.get("table_queue_batches", 64),
+                sizer=self.batch_sizer,
+                offsets=self.offsets
+            )
+
+        # 合并高频修改事件: 同一路径在窗口内只读取一次
+        self.coalescer = None
+        coalesce_config = config.get("coalesce", {})
+        if coalesce_config.get("enabled", True):
+            self.coalescer = EventCoalescer(
+                self._process_path,
+                window=coalesce_config.get("window", 0.1),
+                byte_threshold=coalesce_config.get("byte_threshold", 1048576),
+                backlog=self._backlog
+            )
+
+        self.metrics_server = None
+        metrics.FILE_LAG.set_function(self._file_lags)
+        if isinstance(self.db_handler, DatabaseHandler):
+            metrics.POOL_CONNECTIONS.set_function(self._pool_usage)
+
+        # 过期数据清理和分片协调只在同步写库组件上运行, 异步模式由 async_main 单独创建
+        self.retention = None
+        self.coordinator = None
+        if isinstance(self.db_handler, DatabaseHandler):
+            self.retention = create_retention_worker(config, self.db_handler)
+            self.attach_coordinator(create_shard_coordinator(config, self.db_handler))
 
     def on_created(self, event):
         if event.is_directory:
             return
         logger.info(f"New file created: {event.src_path}")
-        self._process_file(event.src_path, 0)
+        metrics.EVENTS.labels("created").inc()
+        self.note_created(event.src_path)
+        self._submit(event.src_path)
 
     def on_modified(self, event):
         if event.is_directory:
             return
-        logger.info(f"File modified: {event.src_path}")
-        last_position = self.file_positions.get(event.src_path, 0)
-        self._process_file(event.src_path, last_position)
-
-    def _process_file(self, file_path: str, start_position: int):
-        for pattern, config in self.parsers.items():
-            if re.search(pattern, os.path.basename(file_path)):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        f.seek(start_position)
-                        new_content = f.read()
-                        
-                        if not new_content:
-                            return
-
-                        current_position = f.tell()
-                        self.file_positions[file_path] = current_position
-                        
-                        for line in new_content.splitlines():
-                            if line.strip():
-                                record = config["parser"].parse_line(line)
-                                if record:
-                                    try:
-                                        self.db_handler.insert_log(config["table"], record)
-                                        logger.debug(f"Inserted record: {record}")
-                                    except Exception as e:
-                                        logger.error(f"Error inserting record: {str(e)}")
-                                        
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {str(e)}")
+        metrics.EVENTS.labels("modified").inc()
+        self._submit(event.src_path)
+
+    def on_deleted(self, event):
+        metrics.EVENTS.labels("deleted").inc()
+        if event.is_directory:
+            self.forget_directory(event.src_path)
+        else:
+            self.forget(event.src_path)
+
+    def on_moved(self, event):
+        metrics.EVENTS.labels("moved").inc()
+        if event.is_directory:
+            self.forget_directory(event.src_path)
+            return
+        if self.forget_moved(event.src_path, event.dest_path):
+            # 不经合并窗口直接读完前身文件, 再处理随后创建的新文件
+            self._process_path(event.dest_path)
+
+    def forget_moved(self, src_path: str, dest_path: str) -> bool:
+        """处理文件改名, 返回新路径是否仍需读取"""
+        configs = self.match_parsers(src_path)
+        tracked = self.checkpoints.tracked(src_path)
+        dispatched = self._dispatched.get(src_path)
+        self.forget(src_path, keep_checkpoint=True)
+        if self.coordinator is not None:
+            self.coordinator.remove(src_path)
+        if self.match_parsers(dest_path):
+            # 改名后仍在监控范围内: 偏移随文件一起迁移, 继续读取改名前未读完的内容
+            self._move_offsets(src_path, dest_path, dispatched)
+            return True
+        if configs and tracked:
+            # 轮转出的前身文件(如 app.log.1)不再匹配模式, 沿用原配置读完剩余内容
+            self.router.pin(dest_path, configs)
+            self._move_offsets(src_path, dest_path, dispatched)
+            return True
+        self.checkpoints.remove(src_path)
+        return False
+
+    def _move_offsets(self, src_path: str, dest_path: str, dispatched: Optional[Tuple[int, int]]):
+        self.checkpoints.move(src_path, dest_path)
+        if dispatched is not None:
+            # 已排队的区间不再重复提交
+            self._dispatched[dest_path] = dispatched
+
+    def note_created(self, file_path: str):
+        # 同名文件被重新创建, 缓存的路由和格式都不再可信
+        self.forget(file_path, keep_checkpoint=True)
+        self._inherit_predecessor(file_path)
+
+    def _inherit_predecessor(self, file_path: str):
+        """app.log.1 被压缩成 app.log.1.gz 时, 归档从原文件的偏移(解压后的位置)接着读"""
+        stem, suffix = os.path.splitext(file_path)
+        if suffix not in COMPRESSED_SUFFIXES or not self.checkpoints.tracked(stem):
+            return
+        if self.pipeline is None:
+            # 原文件已读出的行写出后检查点才推进到对应位置
+            self.batch_writer.flush()
+        configs = self.match_parsers(file_path)
+        if not configs:
+            configs = self.match_parsers(stem)
+            if not configs:
+                return
+            self.router.pin(file_path, configs)
+        self.checkpoints.inherit(file_path, stem)
+
+    def forget(self, file_path: str, keep_checkpoint: bool = False):
+        """文件被删除或移走时释放与该路径相关的缓存、句柄和检查点"""
+        self.router.invalidate(file_path)
+        for config in self.parsers.values():
+            self._formats.pop((file_path, config["index"]), None)
+        self.tail_reader.close_file(file_path)
+        self._dispatched.pop(file_path, None)
+        with self._path_locks_guard:
+            lock = self._path_locks.get(file_path)
+            # 正在被读取的路径保留锁, 由占用方释放
+            if lock is not None and not lock.locked() and file_path not in self._deferred:
+                del self._path_locks[file_path]
+        if not keep_checkpoint:
+            # 改名的文件保留未写完的偏移标记, 写完后报告给同一条检查点记录
+            self.offsets.forget(file_path)
+            self.checkpoints.remove(file_path)
+            if self.coordinator is not None:
+                self.coordinator.remove(file_path)
+
+    def forget_directory(self, directory: str):
+        prefix = os.path.join(directory, "")
+        self.router.invalidate_prefix(directory)
+        for file_path in self.checkpoints.paths():
+            if file_path.startswith(prefix):
+                self.forget(file_path)
+
+    def _submit(self, file_path: str):
+        if self.coalescer is not None:
+            self.coalescer.submit(file_path)
+        else:
+            self._process_path(file_path)
+
+    def _process_path(self, file_path: str):
+        if not self.try_lock_path(file_path):
+            return
+        try:
+            if self.claim(file_path):
+                self._dispatch(file_path, self.checkpoints.resolve(file_path))
+        finally:
+            self.unlock_path(file_path)
+
+    def attach_coordinator(self, coordinator: Optional[ShardCoordinator], submit=None):
+        """开启分片: submit 用于提交接手的文件, 异步模式传入引擎的入队函数"""
+        self.coordinator = coordinator
+        if coordinator is None:
+            return
+        self._take_over_submit = submit or self._submit
+        coordinator.on_lost = self._release_paths
+        coordinator.on_orphaned = self._take_over
+
+    def claim(self, file_path: str) -> bool:
+        """分片模式下只读取分配给本节点且持有租约的文件, 接手时从租约中的偏移继续"""
+        coordinator = self.coordinator
+        if coordinator is None or coordinator.holds(file_path):
+            return True
+        if not coordinator.owns(file_path):
+            return False
+        try:
+            lease = coordinator.acquire(file_path)
+        except Exception as e:
+            logger.error(f"Error acquiring lease for {file_path}: {str(e)}")
+            return False
+        if lease is None:
+            return False
+        offset, previous = lease
+        if offset is not None:
+            local = self.checkpoints.resolve(file_path)
+            # 本节点写过的偏移可能比租约中最后一次同步的更新
+            if previous != coordinator.node_id or offset > local:
+                self.checkpoints.update(file_path, offset)
+        return True
+
+    def _take_over(self, file_paths):
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                self._take_over_submit(file_path)
+            else:
+                self.coordinator.drop_expired(file_path)
+
+    def _release_paths(self, file_paths):
+        """文件改由其他节点负责: 写出缓冲、同步偏移后释放租约"""
+        for file_path in file_paths:
+            self.lock_path(file_path)
+        try:
+            self.save_checkpoints(force=True)
+            for file_path in file_paths:
+                self.coordinator.release(file_path, self.checkpoints.offset(file_path))
+            logger.info(f"Released {len(file_paths)} files to other nodes")
+        except Exception as e:
+            logger.error(f"Error releasing files: {str(e)}")
+        finally:
+            for file_path in file_paths:
+                self.unlock_path(file_path)
+
+    def sync_offsets(self):
+        if self.coordinator is None:
+            return
+        try:
+            self.coordinator.save_offsets(self._held_offsets())
+        except Exception as e:
+            logger.error(f"Error saving offsets to leases: {str(e)}")
+
+    def _held_offsets(self) -> Dict[str, int]:
+        return {file_path: self.checkpoints.offset(file_path) for file_path in self.coordinator.held_paths()}
+
+    def _path_lock(self, file_path: str) -> threading.Lock:
+        lock = self._path_locks.get(file_path)
+        if lock is None:
+            with self._path_locks_guard:
+                lock = self._path_locks.setdefault(file_path, threading.Lock())
+        return lock
+
+    def lock_path(self, file_path: str):
+        """阻塞占用文件, 供补录使用"""
+        self._path_lock(file_path).acquire()
+
+    def try_lock_path(self, file_path: str) -> bool:
+        """实时事件不等待: 文件被占用时登记下来, 由占用方释放后重新提交"""
+        lock = self._path_lock(file_path)
+        with self._path_locks_guard:
+            if lock.acquire(blocking=False):
+                return True
+            self._deferred.add(file_path)
+            return False
+
+    def unlock_path(self, file_path: str):
+        with self._path_locks_guard:
+            self._path_locks[file_path].release()
+            deferred = file_path in self._deferred
+            self._deferred.discard(file_path)
+        if deferred:
+            # 占用期间到达的事件可能对应尚未读到的追加内容
+            self._submit(file_path)
+
+    def _backlog(self, file_path: str) -> int:
+        dispatched = self._dispatched.get(file_path)
+        offset = dispatched[1] if dispatched is not None else self.checkpoints.offset(file_path)
+        return max(os.path.getsize(file_path) - offset, 0)
+
+    def _file_lags(self) -> Dict[str, int]:
+        """每个已登记文件尚未读取的字节数, 只在抓取指标时计算"""
+        lags = {}
+        for file_path in self.checkpoints.paths():
+            try:
+                lags[file_path] = max(os.path.getsize(file_path) - self.checkpoints.offset(file_path), 0)
+            except OSError:
+                continue
+        return lags
+
+    def _pool_usage(self) -> Dict[str, float]:
+        stats = self.db_handler.pool_stats()
+        return {state: stats[state] for state in ("in_use", "idle", "max_size") if state in stats}
+
+    def start_metrics(self):
+        metrics_config = self.config.get("metrics", {})
+        if metrics_config.get("enabled", False) and self.metrics_server is None:
+            self.metrics_server = metrics.start_http_server(
+                metrics_config.get("host", "127.0.0.1"), metrics_config.get("port", 9108)
+            )
+
+    def stop_metrics(self):
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.coalescer.stats() if self.coalescer is not None else {}
+        stats["file_opens"] = self.tail_reader.opens
+        stats["file_reads"] = self.tail_reader.reads
+        if self.retention is not None:
+            stats["retention"] = self.retention.stats()
+        if self.coordinator is not None:
+            stats["sharding"] = self.coordinator.stats()
+        if self.dedup is not None:
+            stats["duplicates_dropped"] = self.dedup.hits
+        if isinstance(self.db_handler, DatabaseHandler):
+            pool_stats = self.db_handler.pool_stats()
+            if pool_stats:
+                stats["pool"] = pool_stats
+        if self.batch_sizer is not None:
+            stats["batch_sizes"] = self.batch_sizer.sizes()
+        if self.aggregators:
+            stats["rows_aggregated"] = sum(aggregator.rows_aggregated for aggregator in self.aggregators)
+            stats["rollups_emitted"] = sum(aggregator.rollups_emitted for aggregator in self.aggregators)
+        return stats
+
+    def resume(self):
+        """启动时从检查点继续读取停机期间追加的内容"""
+        # 运行期间由删除、移动事件清理检查点, 这里只处理停机期间消失的文件
+        self.checkpoints.prune_missing()
+        for file_path in self.checkpoints.paths():
+            if os.path.exists(file_path) and self.match_parsers(file_path):
+                self._process_path(file_path)
+
+    def start(self):
+        # 先加入分片集群, 之后的补读和事件只处理分配给本节点的文件
+        if self.coordinator is not None:
+            self.coordinator.start()
+        if self.pipeline is not None:
+            self.pipeline.start()
+        else:
+            self.batch_writer.start()
+        if self.coalescer is not None:
+            self.coalescer.start()
+        if self.retention is not None:
+            self.retention.start()
+        self.start_metrics()
+
+    @property
+    def parsers(self) -> Dict[str, Dict[str, Any]]:
+        return self.parser_set.parsers
+
+    @property
+    def router(self):
+        return self.parser_set.router
+
+    @property
+    def chunk_parser(self):
+        return self.parser_set.chunk_parser
+
+    @property
+    def aggregators(self):
+        return self.parser_set.aggregators
+
+    def match_parsers(self, file_path: str):
+        return self.router.match(file_path)
+
+    def reload(self, config: Dict[str, Any]):
+        """热加载 log_files 与 parsing: 在调用线程里编译好新的解析状态后一次性替换
+
+        检查点偏移、数据库连接和写库缓冲都不受影响; 正在读取的文件用旧的解析状态读完当前区间。
+        """
+        new_set = ParserSet(config, self.hash_column, self.hash_algorithm, cache_size=ROUTE_CACHE_SIZE)
+        old_set = self.parser_set
+        new_set.adopt_pins(old_set)
+        self.parser_set = new_set
+        self.chunk_lines = new_set.chunk_lines
+        self._formats.clear()
+        self.config = dict(self.config, log_files=config["log_files"], parsing=config.get("parsing", {}))
+        with self._retired_lock:
+            self._retired_sets.append(old_set)
+        old_set.retire()
+        logger.info(f"Reloaded {len(new_set.parsers)} log configurations")
+
+    def _dispatch(self, file_path: str, start_position: int):
+        if not self.match_parsers(file_path):
+            return
+        try:
+            stat_result = os.stat(file_path)
+        except OSError as e:
+            logger.error(f"Error processing file {file_path}: {str(e)}")
+            return
+        start_position = self.unread_offset(file_path, stat_result, start_position)
+        if self.pipeline is None:
+            self._process_file(file_path, start_position, stat_result)
+            return
+
+        end_position = stat_result.st_size
+        if end_position <= start_position:
+            if detect_compression(file_path):
+                # 压缩归档的偏移是解压后的位置, 无法按文件大小切区间, 直接读完
+                self._process_file(file_path, start_position, stat_result)
+                self.batch_writer.flush()
+            return
+        self.mark_read(file_path, stat_result, end_position)
+        # 队列已满时在此阻塞, 把背压传回事件线程
+        self.pipeline.submit(file_path, start_position, end_position)
+
+    def unread_offset(self, file_path: str, stat_result: os.stat_result, start_position: int) -> int:
+        """检查点在写库后才推进, 下一次读取从已读出的位置开始"""
+        dispatched = self._dispatched.get(file_path)
+        if dispatched is None or dispatched[0] != stat_result.st_ino:
+            return start_position
+        if dispatched[1] > stat_result.st_size and detect_compression(file_path) is None:
+            # 检查点落后于已读出的位置, 截断只能在这里发现
+            logger.info(f"Truncation detected for {file_path}")
+            del self._dispatched[file_path]
+            self.checkpoints.update(file_path, 0, reset=True)
+            self.offsets.forget(file_path)
+            return 0
+        return max(start_position, dispatched[1])
+
+    def mark_read(self, file_path: str, stat_result: os.stat_result, position: int):
+        self._dispatched[file_path] = (stat_result.st_ino, position)
+
+    def _read_chunks(self, file_path: str, start_position: int, end_position: Optional[int] = None,
+                     reader: Optional[TailReader] = None):
+        """按行数切块, 产出 (非空行列表, 各行起始偏移, 块末尾偏移); 最后一块可能为空, 只用来报告偏移
+
+        未开启去重时不记录各行起始偏移, 对应位置为 None。
+        """
+        lines = []
+        starts = [] if self.dedup_enabled else None
+        position = start_position
+        reader = reader or self.tail_reader
+        # 读取字节行, JSON 直接从字节解析, 文本格式由解析器解码
+        for line, line_end in reader.read_lines(file_path, start_position, end_position, raw=True):
+            if line.strip():
+                lines.append(line)
+                if starts is not None:
+                    starts.append(position)
+            position = line_end
+            if len(lines) >= self.chunk_lines:
+                yield lines, starts, position
+                lines = []
+                starts = [] if starts is not None else None
+        yield lines, starts, position
+
+    def iter_batches(self, file_path: str, configs, start_position: int, end_position: Optional[int] = None,
+                     reader: Optional[TailReader] = None):
+        """按文件内顺序产出 (解析配置, 行元组列表, 已消费到的偏移)
+
+        开启汇总时, 关闭的窗口以 (汇总表路由, 汇总行, 同一偏移) 的形式紧随其后产出。
+        """
+        if not configs:
+            return
+        # 解析配置和行块解析器必须来自同一份解析状态; 读取期间热加载不会关闭它
+        parser_set = configs[0]["parser_set"]
+        parser_set.acquire()
+        try:
+            yield from self._iter_parsed(file_path, configs, parser_set.chunk_parser,
+                                         start_position, end_position, reader)
+        finally:
+            parser_set.release()
+
+    def _iter_parsed(self, file_path: str, configs, chunk_parser, start_position: int,
+                     end_position: Optional[int], reader: Optional[TailReader]):
+        # 记录哈希以 inode 标识文件, 文件改名后重新读取仍得到相同的哈希
+        file_key = str(os.stat(file_path).st_ino) if self.dedup_enabled else None
+        jobs = (
+            (config["index"], self._file_format(file_path, config, lines), lines,
+             (file_key, starts) if starts is not None else None, (config, position, len(lines)))
+            for lines, starts, position in self._read_chunks(file_path, start_position, end_position, reader)
+            for config in configs
+        )
+        for (config, position, line_count), rows in chunk_parser.imap(jobs):
+            if line_count:
+                metrics.LINES_PARSED.labels(config["table"]).inc(line_count)
+                if len(rows) < line_count:
+                    metrics.PARSE_FAILURES.labels(config["table"]).inc(line_count - len(rows))
+            row_filter = config["filter"]
+            if row_filter is not None and rows:
+                parsed = len(rows)
+                rows = row_filter.apply(rows)
+                if len(rows) < parsed:
+                    metrics.ROWS_FILTERED.labels(config["table"]).inc(parsed - len(rows))
+            if self.dedup is not None and rows:
+                parsed = len(rows)
+                rows = self.dedup.filter(rows)
+                if len(rows) < parsed:
+                    metrics.ROWS_DEDUPLICATED.labels(config["table"]).inc(parsed - len(rows))
+            aggregator = config["aggregator"]
+            if aggregator is None:
+                yield config, rows, position
+                continue
+            aggregator.add(rows)
+            yield config, rows if aggregator.keep_rows else [], position
+            rollups = aggregator.drain()
+            if rollups:
+                yield aggregator.route, rollups, position
+
+    def drain_rollups(self, force: bool = False):
+        """取出已关闭(force 时为全部)的汇总窗口, 产出 (表名, 列, 汇总行)
+
+        被热加载替换的旧解析状态一次写出全部窗口, 不再有读取方后移除。
+        """
+        with self._retired_lock:
+            retired = list(self._retired_sets)
+        for parser_set in retired:
+            # 先确认已关闭再取出, 关闭前最后一个读取方加入的行也会被写出
+            done = parser_set.closed
+            yield from parser_set.drain_rollups(force=True)
+            if done:
+                with self._retired_lock:
+                    self._retired_sets.remove(parser_set)
+        yield from self.parser_set.drain_rollups(force)
+
+    def close_parsers(self):
+        with self._retired_lock:
+            retired, self._retired_sets = self._retired_sets, []
+        for parser_set in retired:
+            parser_set.close()
+        self.parser_set.close()
+
+    def _file_format(self, file_path: str, config, lines) -> str:
+        """每个文件按首批行判断一次格式, 之后固定使用对应的解析函数"""
+        key = (file_path, config["index"])
+        fmt = self._formats.get(key)
+        if fmt is None:
+            if not lines:
+                return "auto"
+            fmt = config["parser"].sniff(lines)
+            if len(self._formats) >= ROUTE_CACHE_SIZE:
+                self._formats.clear()
+            self._formats[key] = fmt
+            logger.debug(f"Detected {fmt} format for {file_path}")
+        return fmt
+
+    def _parse_range(self, file_path: str, start_position: int, end_position: int):
+        # 上一个区间末尾未写完的行从其起点重新读取
+        start_position = min(self._partial_offsets.pop(file_path, start_position), start_position)
+        configs = self.match_parsers(file_path)
+
+        position = start_position
+        for config, rows, position in self.iter_batches(file_path, configs, start_position, end_position):
+            # 没有行的块也要报告偏移, 以便检查点越过空行和被过滤的行
+            yield config["table"], config["columns"], rows, position
+        if position < end_position:
+            self._partial_offsets[file_path] = position
+
+    def _process_file(self, file_path: str, start_position: int, stat_result: Optional[os.stat_result] = None):
+        configs = self.match_parsers(file_path)
+        if not configs:
+            return
+
+        position = start_position
+        try:
+            if stat_result is None:
+                stat_result = os.stat(file_path)
+            for config, rows, position in self.iter_batches(file_path, configs, start_position):
+                # 检查点在所在批次写出后才推进, 下一次读取从 mark_read 记录的位置开始
+                block = self.offsets.mark(file_path, position, 1 if rows else 0)
+                if rows:
+                    self.batch_writer.add_many(config["table"], config["columns"], rows, block)
+        except Exception as e:
+            logger.error(f"Error processing file {file_path}: {str(e)}")
+        finally:
+            if position != start_position:
+                self.mark_read(file_path, stat_result, position)
 
     def cleanup_file_positions(self):
-        for file_path in list(self.file_positions.keys()):
-            if not os.path.exists(file_path):
-                del self.file_positions[file_path]
+        self.tail_reader.evict_idle(self.max_idle_seconds)
+
+    def save_checkpoints(self, force: bool = False):
+        # 没有新数据的窗口不会在读取时关闭, 在这里定期取出
+        rollups = list(self.drain_rollups())
+        for table, columns, rows in rollups:
+            self.batch_writer.add_many(table, columns, rows)
+        if rollups and self.pipeline is not None:
+            # 流水线模式不启动写库线程, 汇总行直接写出
+            self.batch_writer.flush()
+        # 检查点落盘前先写出缓冲, 避免偏移领先于已入库的数据; 流水线模式的偏移由写库线程在写入后推进
+        if force or self.checkpoints.flush_due():
+            if self.pipeline is None:
+                self.batch_writer.flush()
+            self.checkpoints.flush()
+            self.sync_offsets()
+
+    def prune_connections(self) -> int:
+        if isinstance(self.db_handler, DatabaseHandler):
+            return self.db_handler.prune_connections()
+        return 0
+
+    def replay_spill(self) -> int:
+        """数据库恢复后回放数据库中断期间转存到磁盘的批次"""
+        try:
+            return self.db_handler.replay_spill()
+        except Exception as e:
+            logger.error(f"Error replaying spilled rows: {str(e)}")
+            return 0
+
+    def close(self):
+        # 先处理完合并中的事件, 再写出缓冲中的记录, 最后关闭连接池
+        if self.retention is not None:
+            self.retention.close()
+        if self.coalescer is not None:
+            self.coalescer.close()
+        if self.pipeline is not None:
+            self.pipeline.close()
+        for table, columns, rows in self.drain_rollups(force=True):
+            self.batch_writer.add_many(table, columns, rows)
+        self.batch_writer.close()
+        self.close_parsers()
+        self.tail_reader.close()
+        self.checkpoints.flush()
+        if self.coordinator is not None:
+            self.coordinator.close(self._held_offsets())
+        self.stop_metrics()
+        PROFILER.disable()
+        logger.info(f"Ingestion stats: {self.stats()}")
+        self.db_handler.close()
+
+# 分阶段采样分析的目标; 未开启时这些方法保持原样。逐行调用的阶段按比例采样, 其余每次都计时
+PROFILER.register(LogFileHandler, "_submit", "event", sample_every=1)
+PROFILER.register(LogFileHandler, "_read_chunks", "read", kind="iter", sample_every=1)
+PROFILER.register(LogParser, "parse_line", "parse_line")
+PROFILER.register(LogParser, "parse_row", "parse_row")
+# 格式已知的文件直接调用对应格式的解析方法, 不经过 parse_row
+PROFILER.register(LogParser, "_parse_json_row", "parse_json")
+PROFILER.register(LogParser, "_parse_text_row", "parse_text")
+PROFILER.register(LogParser, "_apply_field_mapping", "field_mapping")
+# 时间转换已编译进字段映射计划, 这里统计缓存未命中时的实际解析
+PROFILER.register(DatetimeConverter, "_parse", "conversion", sample_every=1)
+PROFILER.register(DatabaseHandler, "insert_rows", "insert", sample_every=1)
 
-def main():
+def setup_profiling(config: Dict[str, Any]):
+    """按 profiling 配置开启分析; 运行中可发送 SIGUSR1 切换开关"""
+    profiling_config = config.get("profiling", {})
+    PROFILER.configure(profiling_config)
+    PROFILER.install_signal_handler()
+    if profiling_config.get("enabled", False):
+        PROFILER.enable()
+
+def apply_reload(reloader: ConfigReloader, event_handler: LogFileHandler, observer, watch, event_target):
+    """检查配置文件并应用变化, 返回当前的观察者登记
+
+    只有 watch_directory 或 recursive 改变时才重新登记观察者, 先登记新的再注销旧的, 不会漏掉事件。
+    """
+    try:
+        reloaded = reloader.poll()
+    except Exception as e:
+        logger.error(f"Error checking config for changes: {str(e)}")
+        return watch
+    if reloaded is None:
+        return watch
+    config, changed = reloaded
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
+        if changed & RELOADABLE_SECTIONS:
+            event_handler.reload(config)
+        if changed & WATCH_SECTIONS:
+            new_watch = observer.schedule(event_target, config["watch_directory"],
+                                          recursive=config.get("recursive", False))
+            observer.unschedule(watch)
+            event_handler.config = dict(event_handler.config, watch_directory=config["watch_directory"],
+                                        recursive=config.get("recursive", False))
+            logger.info(f"Now watching {config['watch_directory']}")
+            return new_watch
+    except Exception as e:
+        logger.error(f"Error applying reloaded config: {str(e)}")
+    return watch
+
+def create_config_reloader(config_path: str, config: Dict[str, Any]) -> Optional[ConfigReloader]:
+    if not config.get("reload", {}).get("enabled", True):
+        return None
+    return ConfigReloader(config_path, config)
+
+def load_config(config_path: str) -> Optional[Dict[str, Any]]:
+    """读取并校验启动配置, 与热加载使用同一套校验; 无效时返回 None"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
             config = json.load(f)
+        ConfigValidator.validate_config(config)
     except Exception as e:
         logger.error(f"Error loading config: {str(e)}")
+        return None
+    return config
+
+def main(config_path: str = 'config.json', backfill: bool = False):
+    config = load_config(config_path)
+    if config is None:
         return
 
     try:
         event_handler = LogFileHandler(config)
+        setup_profiling(config)
         observer = Observer()
-        observer.schedule(
+        watch = observer.schedule(
             event_handler, 
             config["watch_directory"], 
             recursive=config.get("recursive", False)
         )
+        # 配置文件变化时热加载, 偏移、连接和缓冲中的记录都保留
+        reloader = create_config_reloader(config_path, config)
 
         logger.info(f"Starting file monitoring in {config['watch_directory']}...")
+        event_handler.start()
+        # 在观察者启动前补读, 避免和事件线程同时读取同一文件
+        event_handler.resume()
         observer.start()
+        # 补录在观察者启动后进行, 补录期间产生的实时事件由文件占用机制延后处理
+        backfiller = None
+        if backfill:
+            backfiller = Backfill.from_config(event_handler, config)
+            backfiller.start()
 
         try:
             while True:
                 time.sleep(1)
                 event_handler.cleanup_file_positions()
+                event_handler.save_checkpoints()
+                event_handler.replay_spill()
+                event_handler.prune_connections()
+                if reloader is not None:
+                    watch = apply_reload(reloader, event_handler, observer, watch, event_handler)
         except KeyboardInterrupt:
             logger.info("Stopping file monitoring...")
             observer.stop()
-            event_handler.db_handler.close()
+        if backfiller is not None:
+            backfiller.close()
         observer.join()
+        event_handler.close()
 
     except Exception as e:
         logger.error(f"Error in main loop: {str(e)}")
 
+async def async_main(config_path: str = 'config.json', backfill: bool = False):
+    """asyncio 运行时: 单进程内用协程处理大量文件和并发写库"""
+    from async_ingest import AsyncIngestEngine, create_async_pool
+
+    config = load_config(config_path)
+    if config is None:
+        return
+
+    async_config = config.get("async", {})
+    pool = await create_async_pool(config["database"], async_config.get("driver", "auto"))
+    # 异步模式只复用路由、读取、解析和检查点, 同步写入组件不会启动
+    event_handler = LogFileHandler(config, db_handler=pool)
+    setup_profiling(config)
+    retention = None
+    sync_db_handler = None
+    if config["database"].get("cleanup", {}).get("enabled") or config.get("sharding", {}).get("enabled"):
+        # aiomysql 连接池不提供同步连接, 清理任务和分片协调使用单独的同步连接
+        sync_db_handler = getattr(pool, "db_handler", None) or DatabaseHandler(config["database"])
+        retention = create_retention_worker(config, sync_db_handler)
+    engine = AsyncIngestEngine(
+        event_handler,
+        pool,
+        batch_size=config["database"].get("batch_size", 1000),
+        flush_interval=config["database"].get("flush_interval", 1.0),
+        max_inflight=async_config.get("max_inflight", 16),
+        workers=async_config.get("workers", 8),
+        io_workers=async_config.get("io_workers", 4),
+        read_bytes=async_config.get("read_bytes", 4194304),
+        sizer=event_handler.batch_sizer
+    )
+    observer = Observer()
+    bridge = engine.event_bridge(asyncio.get_running_loop())
+    watch = observer.schedule(
+        bridge,
+        config["watch_directory"],
+        recursive=config.get("recursive", False)
+    )
+    reloader = create_config_reloader(config_path, config)
+
+    loop = asyncio.get_running_loop()
+    event_handler.attach_coordinator(
+        create_shard_coordinator(config, sync_db_handler) if sync_db_handler is not None else None,
+        submit=lambda file_path: loop.call_soon_threadsafe(engine.notify, file_path)
+    )
+
+    logger.info(f"Starting async file monitoring in {config['watch_directory']}...")
+    if event_handler.coordinator is not None:
+        await loop.run_in_executor(None, event_handler.coordinator.start)
+    engine.start()
+    engine.resume()
+    event_handler.start_metrics()
+    observer.start()
+    if backfill:
+        # 异步引擎按文件串行读取, 补录只需把已有文件排入队列
+        for file_path in Backfill.from_config(event_handler, config).scan():
+            engine.notify(file_path)
+    if retention is not None:
+        retention.start()
+    try:
+        while True:
+            await asyncio.sleep(1)
+            event_handler.cleanup_file_positions()
+            await pool.maintain()
+            if reloader is not None:
+                # 编译新的解析状态可能要启动解析进程, 放到线程里执行
+                watch = await loop.run_in_executor(
+                    None, apply_reload, reloader, event_handler, observer, watch, bridge
+                )
+            if event_handler.checkpoints.flush_due():
+                # 等在途批次写完再保存偏移
+                await engine.settle()
+                event_handler.checkpoints.flush()
+                await loop.run_in_executor(None, event_handler.sync_offsets)
+    except asyncio.CancelledError:
+        logger.info("Stopping file monitoring...")
+    finally:
+        if retention is not None:
+            retention.close()
+        observer.stop()
+        observer.join()
+        await engine.close()
+        if event_handler.coordinator is not None:
+            event_handler.coordinator.close(event_handler._held_offsets())
+        event_handler.close_parsers()
+        event_handler.stop_metrics()
+        PROFILER.disable()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Watch log files and load them into a database")
+    parser.add_argument("--config", default="config.json", help="path to config.json")
+    parser.add_argument("--async", dest="async_mode", action="store_true",
+                        help="run the asyncio ingestion engine")
+    parser.add_argument("--backfill", action="store_true",
+                        help="import files already present in watch_directory before tailing")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.async_mode:
+        try:
+            asyncio.run(async_main(args.config, args.backfill))
+        except KeyboardInterrupt:
+            pass
+    else:
+        main(args.config, args.backfill)